@@ -1,8 +1,10 @@
 import streamlit as st
 from datetime import datetime
 from utils.database import insert_feedback
+from utils.metrics import timer
 
 st.set_page_config(page_title="Submit Feedback", layout="centered")
+page_timer = timer("page.Submit Feedback").start()
 st.title("📝 Submit Your Feedback or Grievance")
 
 # Define grievance categories
@@ -48,3 +50,4 @@ with st.form("feedback_form", clear_on_submit=True):
 st.markdown("---")
 st.info("Your feedback is important to us. Thank you for helping Caleb University improve!")
 
+page_timer.stop()
@@ -1,19 +1,31 @@
+import os
+from datetime import date, timedelta
 import streamlit as st
 import pandas as pd
 import plotly.express as px
-import plotly.graph_objects as go
-from wordcloud import WordCloud
-import matplotlib.pyplot as plt
 from utils.advanced_database import (
     get_feedback_analytics, 
-    get_feedback_by_category, 
-    get_feedback_trends,
     get_status_summary,
-    get_priority_distribution
+    get_resolution_sla,
+    get_repeat_submitter_stats,
+    get_distinct_students,
+    get_weekly_distinct_students,
+    get_priority_distribution,
+    get_submission_time_series
 )
+from utils.database import get_latest_change_seq
+from utils.replica import get_replica_staleness, get_replica_refreshed_at, refresh_replica
+from utils.cube import get_feedback_cube, DIMENSIONS
+from utils.data_export import export_rows, export_filename, export_mime_type
+from utils.metrics import timer
 
 st.set_page_config(page_title="Analytics & Insights", layout="wide")
 
+@st.cache_data(max_entries=8, show_spinner="Analyzing feedback...")
+def load_analytics(approximate, use_snapshot, data_version):
+    """Analytics for one version of the data; data_version changes whenever the data does"""
+    return get_feedback_analytics(approximate=approximate, use_replica=use_snapshot)
+
 # Simple authentication
 if 'authenticated' not in st.session_state:
     st.session_state.authenticated = False
@@ -37,6 +49,7 @@ if not st.session_state.authenticated:
     st.stop()
 
 # Analytics Dashboard
+page_timer = timer("page.Analytics & Insights").start()
 st.title("📊 Analytics & Insights")
 
 # Logout button
@@ -44,14 +57,51 @@ if st.button("🚪 Logout", key="logout"):
     st.session_state.authenticated = False
     st.rerun()
 
-# Get analytics data
-analytics = get_feedback_analytics()
+# Data source: long analytical reads go to a snapshot so they don't compete with submissions
+col1, col2 = st.columns([3, 1])
+
+with col1:
+    use_snapshot = st.toggle("Read from analytics snapshot", value=True,
+                             help="Analytics run against a periodically refreshed copy of the database")
+    approximate = st.toggle("Fast approximate results", value=False,
+                            help="Estimate themes, keyword categories and sentiment from a stratified sample "
+                                 "of the feedback instead of analyzing every submission")
+
+with col2:
+    if use_snapshot and st.button("🔄 Refresh Snapshot"):
+        refresh_replica()
+
+snapshot_status = st.empty()
+
+# Get analytics data, rerunning the text analysis only when the snapshot or the change log has moved on
+data_version = get_replica_refreshed_at() if use_snapshot else get_latest_change_seq()
+analytics = load_analytics(approximate, use_snapshot, data_version)
+
+if use_snapshot:
+    staleness = get_replica_staleness()
+    if staleness is not None:
+        snapshot_status.caption(f"Snapshot taken {staleness / 60:.1f} minutes ago")
 
 if not analytics or analytics.get('total_feedback', 0) == 0:
     st.warning("No feedback data available for analysis.")
     st.info("Submit some feedback first to see analytics.")
     st.stop()
 
+# Estimated counts carry 95% intervals, shown next to them
+intervals = analytics.get('confidence_intervals', {})
+if approximate:
+    st.caption(f"Themes, keyword categories and sentiment are estimated from {analytics['sample_size']:,} "
+               f"of {analytics['total_feedback']:,} submissions, sampled by category and month")
+
+# Counts for the charts come from the in-memory cube, kept current from the live database's change log.
+# Its first build classifies every text, so it runs in the background and SQL stands in until it is ready
+cube = get_feedback_cube(wait=False)
+if cube is None:
+    st.caption("The counts cube is being built in the background; the Explore tab is available once it is ready")
+elif use_snapshot:
+    st.caption("Priority by category, the 30-day trends and the Explore tab are counted from the live database, "
+               "so they can be ahead of the snapshot")
+
 # Key Metrics
 st.subheader("📈 Key Metrics")
 
@@ -77,8 +127,69 @@ with col4:
 # Visualizations
 st.subheader("📊 Data Visualizations")
 
+@st.fragment
+def explore_tab():
+    """Explore tab; as a fragment, a filter change reruns only this tab against the cube"""
+    st.markdown("### Explore")
+    st.caption("Filters are answered from the in-memory cube of the live database, so changing one does not "
+               "query the database")
+
+    cube = get_feedback_cube(wait=False)
+    if cube is None:
+        st.info("The counts cube is still being built. Reload the page in a moment.")
+        return
+
+    cube_range = cube.date_range()
+    if cube_range is None:
+        st.info("No submissions to explore yet.")
+    else:
+        col1, col2 = st.columns(2)
+    
+        with col1:
+            explore_start = st.date_input("From", value=cube_range[0], min_value=cube_range[0],
+                                          max_value=cube_range[1], key="explore_start")
+    
+        with col2:
+            explore_end = st.date_input("To", value=cube_range[1], min_value=cube_range[0],
+                                        max_value=cube_range[1], key="explore_end")
+    
+        # A dimension with every value selected is left unfiltered, so unlabelled rows still count
+        explore_filters = {}
+        for column, dimension in zip(st.columns(4), DIMENSIONS[1:]):
+            with column:
+                options = [label for label in cube.labels[dimension] if label is not None]
+                selected = st.multiselect(dimension.title(), options, default=options, key=f"explore_{dimension}")
+                explore_filters[dimension] = selected if len(selected) < len(options) else None
+    
+        col1, col2, col3 = st.columns(3)
+    
+        with col1:
+            breakdown = st.selectbox("Break down by", DIMENSIONS[1:], key="explore_breakdown")
+    
+        with col2:
+            split = st.selectbox("Split by", ["None"] + [dimension for dimension in DIMENSIONS[1:] if dimension != breakdown],
+                                 key="explore_split")
+    
+        with col3:
+            st.metric("Matching Submissions", cube.total(explore_start, explore_end, **explore_filters))
+    
+        breakdown_by = (breakdown,) if split == "None" else (breakdown, split)
+        explore_df = cube.slice(by=breakdown_by, start_date=explore_start, end_date=explore_end, **explore_filters)
+        if not explore_df.empty:
+            with timer("chart.explore_breakdown"):
+                fig_explore = px.bar(explore_df, x=breakdown, y='count', color=None if split == "None" else split,
+                                     title=f"Submissions by {breakdown.title()}")
+                st.plotly_chart(fig_explore, use_container_width=True)
+        
+            daily_df = cube.slice(by=('day',), start_date=explore_start, end_date=explore_end, **explore_filters)
+            with timer("chart.explore_daily"):
+                fig_daily = px.line(daily_df, x='day', y='count', title="Matching Submissions per Day")
+                st.plotly_chart(fig_daily, use_container_width=True)
+        else:
+            st.info("No submissions match these filters.")
+
 # Create tabs for different visualizations
-tab1, tab2, tab3, tab4 = st.tabs(["Category Analysis", "Sentiment Analysis", "Trends", "Word Cloud"])
+tab1, tab2, tab3, tab4, tab5 = st.tabs(["Category Analysis", "Sentiment Analysis", "Trends", "Word Cloud", "Explore"])
 
 with tab1:
     st.markdown("### Feedback Distribution by Category")
@@ -89,36 +200,85 @@ with tab1:
         # Category distribution pie chart
         cat_dist = analytics.get('category_distribution', {})
         if cat_dist:
-            fig_pie = px.pie(
-                values=list(cat_dist.values()), 
-                names=list(cat_dist.keys()),
-                title="Feedback by Category"
-            )
-            st.plotly_chart(fig_pie, use_container_width=True)
+            with timer("chart.category_pie"):
+                fig_pie = px.pie(
+                    values=list(cat_dist.values()), 
+                    names=list(cat_dist.keys()),
+                    title="Feedback by Category"
+                )
+                st.plotly_chart(fig_pie, use_container_width=True)
     
     with col2:
         # Category bar chart
         if cat_dist:
-            fig_bar = px.bar(
-                x=list(cat_dist.keys()), 
-                y=list(cat_dist.values()),
-                title="Category Counts",
-                labels={'x': 'Category', 'y': 'Count'}
-            )
-            st.plotly_chart(fig_bar, use_container_width=True)
+            with timer("chart.category_bar"):
+                fig_bar = px.bar(
+                    x=list(cat_dist.keys()), 
+                    y=list(cat_dist.values()),
+                    title="Category Counts",
+                    labels={'x': 'Category', 'y': 'Count'}
+                )
+                st.plotly_chart(fig_bar, use_container_width=True)
     
     # Priority distribution by category
-    priority_df = get_priority_distribution()
+    if cube is not None:
+        priority_df = cube.slice(by=('priority', 'category'))
+    else:
+        priority_df = get_priority_distribution(use_replica=use_snapshot)
     if not priority_df.empty:
         st.markdown("### Priority Distribution by Category")
-        fig_priority = px.bar(
-            priority_df, 
-            x='category', 
-            y='count', 
-            color='priority',
-            title="Priority Levels by Category"
-        )
-        st.plotly_chart(fig_priority, use_container_width=True)
+        with timer("chart.priority_by_category"):
+            fig_priority = px.bar(
+                priority_df, 
+                x='category', 
+                y='count', 
+                color='priority',
+                title="Priority Levels by Category"
+            )
+            st.plotly_chart(fig_priority, use_container_width=True)
+    
+    # Repeat submitters (named submissions only)
+    repeat_stats = get_repeat_submitter_stats(use_replica=use_snapshot)
+    if repeat_stats['students'] > 0:
+        st.markdown("### Repeat Submitters")
+        col1, col2 = st.columns(2)
+        
+        with col1:
+            st.metric("Students with Named Submissions", repeat_stats['students'])
+            st.metric("Repeat Submitters", repeat_stats['repeat_students'],
+                      f"{repeat_stats['repeat_share'] * 100:.1f}% of students", delta_color="off")
+        
+        with col2:
+            with timer("chart.repeat_submitters"):
+                fig_repeat = px.bar(
+                    repeat_stats['distribution'],
+                    x='submissions',
+                    y='students',
+                    title="Students by Number of Submissions"
+                )
+                st.plotly_chart(fig_repeat, use_container_width=True)
+    
+    # Distinct students per category per week, estimated from the HyperLogLog sketches
+    weeks_start = date.today() - timedelta(weeks=12)
+    weekly_students = get_weekly_distinct_students(start_date=weeks_start, use_replica=use_snapshot)
+    if not weekly_students.empty:
+        st.markdown("### Unique Students Complaining per Category per Week")
+        distinct = get_distinct_students(start_date=weeks_start, use_replica=use_snapshot)
+        if distinct:
+            st.metric("Unique Students, Last 12 Weeks", f"{distinct['students']:,}",
+                      f"±{(distinct['high'] - distinct['low']) / 2:,.0f} (95%)", delta_color="off")
+        with timer("chart.weekly_distinct_students"):
+            fig_students = px.line(
+                weekly_students,
+                x='week',
+                y='students',
+                color='category',
+                error_y='margin',
+                markers=True,
+                title="Unique Students per Category per Week (approximate)",
+                labels={'week': 'Week Starting', 'students': 'Students'}
+            )
+            st.plotly_chart(fig_students, use_container_width=True)
 
 with tab2:
     st.markdown("### Sentiment Analysis")
@@ -130,14 +290,15 @@ with tab2:
         with col1:
             # Sentiment pie chart
             colors = {'Positive': '#2E8B57', 'Negative': '#DC143C', 'Neutral': '#FFD700'}
-            fig_sentiment = px.pie(
-                values=list(sentiment_dist.values()),
-                names=list(sentiment_dist.keys()),
-                title="Sentiment Distribution",
-                color=list(sentiment_dist.keys()),
-                color_discrete_map=colors
-            )
-            st.plotly_chart(fig_sentiment, use_container_width=True)
+            with timer("chart.sentiment_pie"):
+                fig_sentiment = px.pie(
+                    values=list(sentiment_dist.values()),
+                    names=list(sentiment_dist.keys()),
+                    title="Sentiment Distribution",
+                    color=list(sentiment_dist.keys()),
+                    color_discrete_map=colors
+                )
+                st.plotly_chart(fig_sentiment, use_container_width=True)
         
         with col2:
             # Sentiment metrics
@@ -150,51 +311,77 @@ with tab2:
                 st.metric("Positive Feedback", f"{positive_pct:.1f}%")
                 st.metric("Negative Feedback", f"{negative_pct:.1f}%")
                 st.metric("Neutral Feedback", f"{neutral_pct:.1f}%")
+        
+        if intervals:
+            sentiment_df = pd.DataFrame([
+                {'Sentiment': sentiment, 'Estimate': count, 'Low (95%)': intervals['sentiment'][sentiment][0],
+                 'High (95%)': intervals['sentiment'][sentiment][1]}
+                for sentiment, count in sentiment_dist.items()
+            ])
+            st.dataframe(sentiment_df, use_container_width=True, hide_index=True)
 
 with tab3:
     st.markdown("### Submission Trends")
     
-    # Get trends data
-    trends_df = get_feedback_trends()
+    # Daily counts for the last 30 days, with the High priority share from the same cube
+    trends_start = date.today() - timedelta(days=29)
+    if cube is not None:
+        trends_df = cube.slice(by=('day',), start_date=trends_start).rename(columns={'day': 'date', 'count': 'submissions'})
+        high_priority_df = cube.slice(by=('day',), start_date=trends_start, priority='High')
+        trends_df = trends_df.merge(high_priority_df.rename(columns={'day': 'date', 'count': 'high_priority'}),
+                                    on='date', how='left').fillna({'high_priority': 0})
+    else:
+        trends_df = get_submission_time_series('day', start_date=trends_start, use_replica=use_snapshot)
+        trends_df = trends_df.rename(columns={'period': 'date'})
     
     if not trends_df.empty:
         # Daily submissions trend
-        fig_trends = px.line(
-            trends_df, 
-            x='date', 
-            y='submissions',
-            title="Daily Submissions (Last 30 Days)",
-            markers=True
-        )
-        st.plotly_chart(fig_trends, use_container_width=True)
-        
-        # High priority trends
-        if 'high_priority' in trends_df.columns:
-            fig_priority_trend = px.bar(
+        with timer("chart.daily_trend"):
+            fig_trends = px.line(
                 trends_df, 
                 x='date', 
-                y='high_priority',
-                title="High Priority Submissions Over Time"
+                y='submissions',
+                title="Daily Submissions (Last 30 Days)",
+                markers=True
             )
-            st.plotly_chart(fig_priority_trend, use_container_width=True)
+            st.plotly_chart(fig_trends, use_container_width=True)
+        
+        # High priority trends
+        if 'high_priority' in trends_df.columns:
+            with timer("chart.high_priority_trend"):
+                fig_priority_trend = px.bar(
+                    trends_df, 
+                    x='date', 
+                    y='high_priority',
+                    title="High Priority Submissions Over Time"
+                )
+                st.plotly_chart(fig_priority_trend, use_container_width=True)
     
     # Status summary
-    status_df = get_status_summary()
+    status_df = get_status_summary(use_replica=use_snapshot)
     if not status_df.empty:
         st.markdown("### Status Summary")
         col1, col2 = st.columns(2)
         
         with col1:
-            fig_status = px.bar(
-                status_df, 
-                x='status', 
-                y='count',
-                title="Feedback by Status"
-            )
-            st.plotly_chart(fig_status, use_container_width=True)
+            with timer("chart.status_bar"):
+                fig_status = px.bar(
+                    status_df, 
+                    x='status', 
+                    y='count',
+                    title="Feedback by Status"
+                )
+                st.plotly_chart(fig_status, use_container_width=True)
         
         with col2:
             st.dataframe(status_df, use_container_width=True)
+    
+    # Resolution SLA
+    sla_df = get_resolution_sla(use_replica=use_snapshot)
+    if not sla_df.empty:
+        st.markdown("### Resolution SLA")
+        st.caption("Median and 90th percentile hours to first response and to resolution")
+        st.dataframe(sla_df.round(1), use_container_width=True)
 
 with tab4:
     st.markdown("### Word Cloud - Common Themes")
@@ -205,25 +392,36 @@ with tab4:
         word_freq = dict(themes[:50])  # Top 50 words
         
         if word_freq:
-            wordcloud = WordCloud(
-                width=800, 
-                height=400, 
-                background_color='white',
-                colormap='viridis'
-            ).generate_from_frequencies(word_freq)
-            
-            fig, ax = plt.subplots(figsize=(10, 5))
-            ax.imshow(wordcloud, interpolation='bilinear')
-            ax.axis('off')
-            st.pyplot(fig)
+            with timer("chart.word_cloud"):
+                # Word cloud rendering pulls in wordcloud and matplotlib, so they load only here
+                from wordcloud import WordCloud
+                import matplotlib.pyplot as plt
+                
+                wordcloud = WordCloud(
+                    width=800, 
+                    height=400, 
+                    background_color='white',
+                    colormap='viridis'
+                ).generate_from_frequencies(word_freq)
+                
+                fig, ax = plt.subplots(figsize=(10, 5))
+                ax.imshow(wordcloud, interpolation='bilinear')
+                ax.axis('off')
+                st.pyplot(fig)
         
         # Top themes table
         st.markdown("### Top Themes")
         themes_df = pd.DataFrame(themes[:20], columns=['Theme', 'Frequency'])
+        if intervals:
+            themes_df['95% Interval'] = [f"{low:,} – {high:,}" for low, high in
+                                         (intervals['themes'][theme] for theme in themes_df['Theme'])]
         st.dataframe(themes_df, use_container_width=True)
     else:
         st.info("No themes data available. Submit more feedback to generate word cloud.")
 
+with tab5:
+    explore_tab()
+
 # Recommendations
 st.subheader("💡 Automated Recommendations")
 
@@ -260,55 +458,45 @@ if analytics:
 # Export options
 st.subheader("📤 Export Analytics")
 
+def render_export_download(label, prefix, columns, rows):
+    """Write rows through the export engine and offer the file for download"""
+    export_path, _ = export_rows(columns, [rows])
+    with open(export_path, 'rb') as export_file:
+        st.download_button(
+            label=label,
+            data=export_file,
+            file_name=export_filename(prefix),
+            mime=export_mime_type()
+        )
+    os.remove(export_path)
+
 col1, col2, col3 = st.columns(3)
 
 with col1:
     if st.button("Export Summary Report"):
         # Create summary report
-        summary_data = {
-            'Metric': ['Total Feedback', 'Avg Daily Submissions', 'Anonymous %', 'Top Category'],
-            'Value': [
-                analytics.get('total_feedback', 0),
-                f"{analytics.get('avg_submissions_per_day', 0):.1f}",
-                f"{analytics.get('anonymous_percentage', 0):.1f}%",
-                max(cat_dist.items(), key=lambda x: x[1])[0] if cat_dist else "N/A"
-            ]
-        }
-        summary_df = pd.DataFrame(summary_data)
-        
-        csv = summary_df.to_csv(index=False)
-        st.download_button(
-            label="📥 Download Summary",
-            data=csv,
-            file_name=f"analytics_summary_{pd.Timestamp.now().strftime('%Y%m%d_%H%M%S')}.csv",
-            mime="text/csv"
-        )
+        summary_rows = [
+            ('Total Feedback', analytics.get('total_feedback', 0)),
+            ('Avg Daily Submissions', f"{analytics.get('avg_submissions_per_day', 0):.1f}"),
+            ('Anonymous %', f"{analytics.get('anonymous_percentage', 0):.1f}%"),
+            ('Top Category', max(cat_dist.items(), key=lambda x: x[1])[0] if cat_dist else "N/A")
+        ]
+        render_export_download("📥 Download Summary", "analytics_summary", ['Metric', 'Value'], summary_rows)
 
 with col2:
     if st.button("Export Themes Data"):
         if themes:
-            themes_df = pd.DataFrame(themes, columns=['Theme', 'Frequency'])
-            csv = themes_df.to_csv(index=False)
-            st.download_button(
-                label="📥 Download Themes",
-                data=csv,
-                file_name=f"themes_data_{pd.Timestamp.now().strftime('%Y%m%d_%H%M%S')}.csv",
-                mime="text/csv"
-            )
+            render_export_download("📥 Download Themes", "themes_data", ['Theme', 'Frequency'], themes)
 
 with col3:
     if st.button("Export Category Data"):
         if cat_dist:
-            cat_df = pd.DataFrame(list(cat_dist.items()), columns=['Category', 'Count'])
-            csv = cat_df.to_csv(index=False)
-            st.download_button(
-                label="📥 Download Categories",
-                data=csv,
-                file_name=f"category_data_{pd.Timestamp.now().strftime('%Y%m%d_%H%M%S')}.csv",
-                mime="text/csv"
-            )
+            render_export_download("📥 Download Categories", "category_data", ['Category', 'Count'],
+                                   list(cat_dist.items()))
 
 # Footer
 st.markdown("---")
 st.markdown("*Analytics powered by advanced text analysis and data visualization*")
 
+page_timer.stop()
+
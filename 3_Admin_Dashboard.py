@@ -1,7 +1,28 @@
+import os
+import sqlite3
 import streamlit as st
-import pandas as pd
 import plotly.express as px
-from utils.database import get_all_feedback, update_feedback_status
+from utils.database import (
+    try_update_feedback_status,
+    bulk_update_feedback_status,
+    count_changes_since,
+    get_latest_change_seq,
+    get_status_history
+)
+from utils.data_export import EXPORT_FORMATS, export_feedback, export_filename, export_mime_type
+from utils.advanced_database import (
+    query_feedback,
+    count_feedback,
+    get_filter_options,
+    get_dashboard_kpis,
+    get_status_breakdown,
+    get_category_breakdown,
+    get_triage_queue,
+    get_student_history,
+    get_student_summary
+)
+from utils.cube import get_feedback_cube
+from utils.metrics import timer
 
 st.set_page_config(page_title="Admin Dashboard", layout="wide")
 
@@ -28,6 +49,7 @@ if not st.session_state.authenticated:
     st.stop()
 
 # Admin Dashboard
+page_timer = timer("page.Admin Dashboard").start()
 st.title("📊 Admin Dashboard")
 
 # Logout button
@@ -35,10 +57,35 @@ if st.button("🚪 Logout", key="logout"):
     st.session_state.authenticated = False
     st.rerun()
 
-# Load feedback data
-df = get_all_feedback()
+# New activity since this session last acknowledged the change log
+latest_change_seq = get_latest_change_seq()
+last_seen_change_seq = st.session_state.setdefault('last_seen_change_seq', latest_change_seq)
 
-if df.empty:
+if latest_change_seq > last_seen_change_seq:
+    new_changes = count_changes_since(last_seen_change_seq, latest_change_seq)
+    new_submissions = new_changes.get('insert', 0)
+    new_updates = new_changes.get('update', 0)
+    col1, col2 = st.columns([4, 1])
+    with col1:
+        st.info(f"🔔 {new_submissions} new submissions and {new_updates} updates since you last checked")
+    with col2:
+        if st.button("Mark as Seen"):
+            st.session_state.last_seen_change_seq = latest_change_seq
+            st.rerun()
+
+# Header metrics and charts come from the shared counts cube once its background build is done, SQL until then
+cube = get_feedback_cube(wait=False)
+if cube is not None:
+    kpis = {
+        'total': cube.total(),
+        'pending': cube.total(status='Pending'),
+        'resolved': cube.total(status='Resolved'),
+        'high_priority': cube.total(priority='High')
+    }
+else:
+    kpis = get_dashboard_kpis()
+
+if kpis['total'] == 0:
     st.warning("No feedback submissions found.")
     st.stop()
 
@@ -46,66 +93,117 @@ if df.empty:
 col1, col2, col3, col4 = st.columns(4)
 
 with col1:
-    total_submissions = len(df)
-    st.metric("Total Submissions", total_submissions)
+    st.metric("Total Submissions", kpis['total'])
 
 with col2:
-    pending_count = len(df[df['status'] == 'Pending'])
-    st.metric("Pending", pending_count)
+    st.metric("Pending", kpis['pending'])
 
 with col3:
-    resolved_count = len(df[df['status'] == 'Resolved'])
-    st.metric("Resolved", resolved_count)
+    st.metric("Resolved", kpis['resolved'])
 
 with col4:
-    high_priority = len(df[df['priority'] == 'High'])
-    st.metric("High Priority", high_priority)
+    st.metric("High Priority", kpis['high_priority'])
 
 # Charts
 col1, col2 = st.columns(2)
 
 with col1:
     # Status distribution
-    status_counts = df['status'].value_counts()
-    fig_status = px.pie(values=status_counts.values, names=status_counts.index, 
-                       title="Submission Status Distribution")
-    st.plotly_chart(fig_status, use_container_width=True)
+    if cube is not None:
+        status_counts = cube.slice(by=('status',)).sort_values('count', ascending=False)
+    else:
+        status_counts = get_status_breakdown()
+    with timer("chart.admin_status_pie"):
+        fig_status = px.pie(values=status_counts['count'], names=status_counts['status'], 
+                           title="Submission Status Distribution")
+        st.plotly_chart(fig_status, use_container_width=True)
 
 with col2:
     # Category distribution
-    category_counts = df['category'].value_counts()
-    fig_category = px.bar(x=category_counts.index, y=category_counts.values,
-                         title="Feedback by Category")
-    st.plotly_chart(fig_category, use_container_width=True)
+    if cube is not None:
+        category_counts = cube.slice(by=('category',)).sort_values('count', ascending=False)
+    else:
+        category_counts = get_category_breakdown()
+    with timer("chart.admin_category_bar"):
+        fig_category = px.bar(x=category_counts['category'], y=category_counts['count'],
+                             title="Feedback by Category")
+        st.plotly_chart(fig_category, use_container_width=True)
+
+# Work queue
+st.subheader("🧭 Work Queue")
+st.caption("Pending items ranked by priority and age: a High item ranks level with a Low item three days older")
+
+queue_size = st.slider("Items in queue", min_value=5, max_value=100, value=20, step=5)
+work_queue = get_triage_queue(queue_size)
+
+if work_queue.empty:
+    st.success("✅ No pending items")
+else:
+    st.dataframe(work_queue.round({'age_hours': 1, 'triage_hours': 1}), use_container_width=True, hide_index=True)
+    
+    col1, col2 = st.columns([3, 1])
+    
+    with col1:
+        queue_item = st.selectbox("Queue item", work_queue['id'].tolist(),
+                                  format_func=lambda item_id: f"#{item_id}")
+    
+    with col2:
+        if st.button("▶️ Start Work"):
+            queue_version = int(work_queue.loc[work_queue['id'] == queue_item, 'version'].iloc[0])
+            result = try_update_feedback_status(queue_item, "In Progress", expected_version=queue_version)
+            if result['outcome'] == 'conflict':
+                st.warning(f"⚠️ Feedback {queue_item} was already picked up (now {result['status']}).")
+            else:
+                st.rerun()
 
 # Feedback management
 st.subheader("📋 Manage Feedback Submissions")
 
 # Filter options
+filter_options = get_filter_options()
+
 col1, col2, col3 = st.columns(3)
 
 with col1:
-    status_filter = st.selectbox("Filter by Status", ["All"] + list(df['status'].unique()))
+    status_filter = st.selectbox("Filter by Status", ["All"] + filter_options['status'])
 
 with col2:
-    category_filter = st.selectbox("Filter by Category", ["All"] + list(df['category'].unique()))
+    category_filter = st.selectbox("Filter by Category", ["All"] + filter_options['category'])
 
 with col3:
-    priority_filter = st.selectbox("Filter by Priority", ["All"] + list(df['priority'].unique()))
+    priority_filter = st.selectbox("Filter by Priority", ["All"] + filter_options['priority'])
+
+# Apply filters in the database and load only the requested page
+filters = {
+    'status': None if status_filter == "All" else status_filter,
+    'category': None if category_filter == "All" else category_filter,
+    'priority': None if priority_filter == "All" else priority_filter
+}
+
+col1, col2, col3 = st.columns(3)
 
-# Apply filters
-filtered_df = df.copy()
+with col1:
+    sort_column = st.selectbox("Sort by", ["submission_date", "id", "priority", "category", "status"])
+
+with col2:
+    page_size = st.selectbox("Rows per page", [25, 50, 100, 250], index=1)
 
-if status_filter != "All":
-    filtered_df = filtered_df[filtered_df['status'] == status_filter]
+matching_count = count_feedback(**filters)
+page_count = max(1, -(-matching_count // page_size))
 
-if category_filter != "All":
-    filtered_df = filtered_df[filtered_df['category'] == category_filter]
+with col3:
+    page_number = st.number_input("Page", min_value=1, max_value=page_count, value=1, step=1)
 
-if priority_filter != "All":
-    filtered_df = filtered_df[filtered_df['priority'] == priority_filter]
+filtered_df = query_feedback(
+    **filters,
+    order_by=sort_column,
+    descending=True,
+    limit=page_size,
+    offset=(page_number - 1) * page_size
+)
 
 # Display filtered data
+st.caption(f"Showing page {page_number} of {page_count} ({matching_count} matching submissions)")
 st.dataframe(filtered_df, use_container_width=True)
 
 # Update feedback status
@@ -114,6 +212,20 @@ st.subheader("🔄 Update Feedback Status")
 if not filtered_df.empty:
     selected_id = st.selectbox("Select Feedback ID", filtered_df['id'].tolist())
     
+    status_history = get_status_history(selected_id)
+    if not status_history.empty:
+        with st.expander(f"Status history ({len(status_history)} changes)"):
+            st.dataframe(status_history, use_container_width=True)
+    
+    # Student context is only shown for named submissions
+    selected_row = filtered_df.loc[filtered_df['id'] == selected_id].iloc[0]
+    if not selected_row['is_anonymous']:
+        student_summary = get_student_summary(selected_row['student_id'])
+        if student_summary and student_summary['named_count'] > 1:
+            with st.expander(f"Student {selected_row['student_id']}: {student_summary['named_count']} submissions "
+                             f"since {student_summary['first_submission']}"):
+                st.dataframe(get_student_history(selected_row['student_id']), use_container_width=True)
+    
     col1, col2 = st.columns(2)
     
     with col1:
@@ -122,22 +234,97 @@ if not filtered_df.empty:
     with col2:
         admin_notes = st.text_area("Admin Notes", height=100)
     
+    # The version shown on this page; the update is rejected if another admin changed the row since
+    selected_version = int(filtered_df.loc[filtered_df['id'] == selected_id, 'version'].iloc[0])
+    
     if st.button("Update Status"):
-        if update_feedback_status(selected_id, new_status, admin_notes):
+        result = try_update_feedback_status(selected_id, new_status, admin_notes, expected_version=selected_version)
+        if result['outcome'] in ('updated', 'unchanged'):
+            st.session_state.pop('status_conflict', None)
             st.success(f"✅ Feedback {selected_id} status updated to {new_status}")
             st.rerun()
+        elif result['outcome'] == 'conflict':
+            # Kept in the session so the reload button below survives the rerun its own click triggers
+            st.session_state.status_conflict = {'id': selected_id, **result}
         else:
             st.error("❌ Failed to update status")
+    
+    status_conflict = st.session_state.get('status_conflict')
+    if status_conflict and status_conflict['id'] == selected_id:
+        st.warning(
+            f"⚠️ Feedback {selected_id} was changed by another admin while you were editing. "
+            f"It is now **{status_conflict['status']}** with notes: {status_conflict['admin_notes'] or '(none)'}. "
+            "Review the latest version and try again."
+        )
+        if st.button("Reload latest version"):
+            del st.session_state.status_conflict
+            st.rerun()
+
+# Bulk update
+st.subheader("🗂️ Bulk Update")
+
+# Outcome of the previous bulk update, kept across the rerun that refreshes the table
+if 'bulk_update_outcome' in st.session_state:
+    bulk_outcome = st.session_state.pop('bulk_update_outcome')
+    outcome_counts = bulk_outcome['outcome'].value_counts().to_dict()
+    st.success("✅ Bulk update finished: " + ", ".join(f"{count} {outcome}" for outcome, count in outcome_counts.items()))
+    with st.expander("Per-item outcomes"):
+        st.dataframe(bulk_outcome, use_container_width=True)
+
+bulk_scope = st.radio(
+    "Apply to",
+    ["Selected submissions", f"All {matching_count} submissions matching the current filters"],
+    horizontal=True
+)
+
+if bulk_scope == "Selected submissions":
+    bulk_ids = st.multiselect("Select Feedback IDs", filtered_df['id'].tolist() if not filtered_df.empty else [])
+else:
+    bulk_ids = None
+
+col1, col2 = st.columns(2)
+
+with col1:
+    bulk_status = st.selectbox("New Status", ["Pending", "In Progress", "Resolved", "Closed"], key="bulk_status")
+
+with col2:
+    bulk_notes = st.text_area("Admin Notes", height=100, key="bulk_notes")
+
+if st.button("Apply Bulk Update", disabled=bulk_ids is not None and not bulk_ids):
+    st.session_state.bulk_update_outcome = bulk_update_feedback_status(
+        bulk_status,
+        bulk_notes,
+        feedback_ids=bulk_ids,
+        filters=filters if bulk_ids is None else None,
+        expected_versions=dict(zip(filtered_df['id'], filtered_df['version'])) if bulk_ids is not None else None
+    )
+    st.rerun()
 
 # Export data
 st.subheader("📤 Export Data")
 
-if st.button("Download CSV"):
-    csv = df.to_csv(index=False)
-    st.download_button(
-        label="📥 Download Feedback Data",
-        data=csv,
-        file_name=f"feedback_data_{pd.Timestamp.now().strftime('%Y%m%d_%H%M%S')}.csv",
-        mime="text/csv"
-    )
+col1, col2 = st.columns(2)
+
+with col1:
+    export_format = st.selectbox("Export Format", EXPORT_FORMATS, format_func=str.upper)
+
+with col2:
+    export_compressed = st.checkbox("Compress (gzip)", value=False)
+
+if st.button("Prepare Export"):
+    try:
+        with st.spinner("Exporting feedback..."):
+            export_path, row_count = export_feedback(export_format, export_compressed)
+
+        with open(export_path, 'rb') as export_file:
+            st.download_button(
+                label=f"📥 Download Feedback Data ({row_count} rows)",
+                data=export_file,
+                file_name=export_filename('feedback_data', export_format, export_compressed),
+                mime=export_mime_type(export_format, export_compressed)
+            )
+        os.remove(export_path)
+    except (sqlite3.Error, OSError) as e:
+        st.error(f"❌ Export failed: {e}")
 
+page_timer.stop()
@@ -1,10 +1,51 @@
+import os
 import streamlit as st
 import pandas as pd
 import sqlite3
-from utils.database import get_all_feedback, create_connection
+from utils.database import create_connection
+from utils.advanced_database import (
+    get_dashboard_kpis,
+    get_feedback_by_date_range,
+    query_feedback,
+    count_feedback
+)
+from utils.db_maintenance import get_storage_stats
+from utils.backup import create_backup, list_backups, verify_backup, restore_backup
+from utils.archive import ARCHIVE_AFTER_DAYS, archive_resolved_feedback, get_archive_stats
+from utils.data_export import export_feedback, export_filename, export_mime_type
+from utils.sql_sandbox import (
+    DEFAULT_ROW_LIMIT,
+    DEFAULT_TIME_BUDGET,
+    validate_query,
+    explain_query,
+    run_readonly_query
+)
+from utils.metrics import timer
 
 st.set_page_config(page_title="Database Manager", layout="wide")
 
+def show_feedback_page(key, **filters):
+    """Show one page of the feedback matching filters, newest first, reading only that page"""
+    matching_count = count_feedback(**filters)
+    if matching_count == 0:
+        st.info("No matching submissions.")
+        return
+
+    col1, col2 = st.columns(2)
+
+    with col1:
+        page_size = st.selectbox("Rows per page", [25, 50, 100, 250], index=1, key=f"{key}_page_size")
+
+    page_count = max(1, -(-matching_count // page_size))
+
+    with col2:
+        page_number = st.number_input("Page", min_value=1, max_value=page_count, value=1, step=1,
+                                      key=f"{key}_page")
+
+    page_df = query_feedback(**filters, order_by='id', limit=page_size, offset=(page_number - 1) * page_size)
+    st.dataframe(page_df, use_container_width=True)
+    st.caption(f"Showing page {page_number} of {page_count} ({matching_count} submissions)")
+
 # Simple authentication
 if 'authenticated' not in st.session_state:
     st.session_state.authenticated = False
@@ -28,6 +69,7 @@ if not st.session_state.authenticated:
     st.stop()
 
 # Database Manager
+page_timer = timer("page.Database Manager").start()
 st.title("🗄️ Database Manager")
 
 # Logout button
@@ -38,60 +80,93 @@ if st.button("🚪 Logout", key="logout"):
 # Database statistics
 st.subheader("📊 Database Statistics")
 
-df = get_all_feedback()
+kpis = get_dashboard_kpis()
+storage_stats = get_storage_stats()
 
-if not df.empty:
+if kpis['total'] > 0:
     col1, col2, col3, col4 = st.columns(4)
     
     with col1:
-        st.metric("Total Records", len(df))
+        st.metric("Total Records", kpis['total'])
     
     with col2:
-        st.metric("Database Size", f"{len(df) * 0.001:.2f} KB")
+        database_size = storage_stats.get('database_size_bytes', 0)
+        st.metric("Database Size", f"{database_size / 1024:.2f} KB")
     
     with col3:
-        earliest_date = df['submission_date'].min()
+        earliest_date = kpis['earliest_submission']
         st.metric("Earliest Submission", earliest_date[:10] if earliest_date else "N/A")
     
     with col4:
-        latest_date = df['submission_date'].max()
+        latest_date = kpis['latest_submission']
         st.metric("Latest Submission", latest_date[:10] if latest_date else "N/A")
 
+# Storage statistics
+if storage_stats:
+    with st.expander("💾 Storage Statistics"):
+        col1, col2, col3, col4 = st.columns(4)
+
+        with col1:
+            st.metric("Pages", f"{storage_stats['page_count']} x {storage_stats['page_size']} B")
+
+        with col2:
+            st.metric("Free Pages", storage_stats['freelist_count'],
+                      f"{storage_stats['freelist_ratio'] * 100:.1f}% of file", delta_color="off")
+
+        with col3:
+            st.metric("WAL Size", f"{storage_stats['wal_size_bytes'] / 1024:.2f} KB")
+
+        with col4:
+            st.metric("Journal Mode", storage_stats['journal_mode'])
+
+        st.markdown("**Row Counts**")
+        st.dataframe(pd.DataFrame(list(storage_stats['row_counts'].items()), columns=['Table', 'Rows']))
+
+        st.markdown("**Table and Index Sizes**")
+        if storage_stats['object_sizes'] is not None:
+            st.dataframe(storage_stats['object_sizes'], use_container_width=True)
+        else:
+            st.info("Per-object sizes require SQLite built with the dbstat virtual table.")
+
+        for recommendation in storage_stats['recommendations']:
+            st.warning(recommendation)
+        if not storage_stats['recommendations']:
+            st.success("✅ No maintenance needed right now.")
+
 # Raw data view
 st.subheader("📋 Raw Data View")
 
-if not df.empty:
-    st.dataframe(df, use_container_width=True)
+if kpis['total'] > 0:
+    show_feedback_page("raw_data")
     
     # Data export options
     st.subheader("📤 Export Options")
     
     col1, col2, col3 = st.columns(3)
     
-    with col1:
-        if st.button("Export as CSV"):
-            csv = df.to_csv(index=False)
-            st.download_button(
-                label="📥 Download CSV",
-                data=csv,
-                file_name=f"feedback_export_{pd.Timestamp.now().strftime('%Y%m%d_%H%M%S')}.csv",
-                mime="text/csv"
-            )
-    
-    with col2:
-        if st.button("Export as JSON"):
-            json_data = df.to_json(orient='records', indent=2)
-            st.download_button(
-                label="📥 Download JSON",
-                data=json_data,
-                file_name=f"feedback_export_{pd.Timestamp.now().strftime('%Y%m%d_%H%M%S')}.json",
-                mime="application/json"
-            )
+    export_options = [
+        ("Export as CSV", 'csv', False),
+        ("Export as NDJSON", 'ndjson', False),
+        ("Export as NDJSON (gzip)", 'ndjson', True)
+    ]
     
-    with col3:
-        if st.button("Export as Excel"):
-            # Note: This would require openpyxl package
-            st.info("Excel export requires additional package installation")
+    for column, (label, export_format, export_compressed) in zip([col1, col2, col3], export_options):
+        with column:
+            if st.button(label):
+                try:
+                    export_path, row_count = export_feedback(export_format, export_compressed)
+                    with open(export_path, 'rb') as export_file:
+                        st.download_button(
+                            label=f"📥 Download ({row_count} rows)",
+                            data=export_file,
+                            file_name=export_filename('feedback_export', export_format, export_compressed),
+                            mime=export_mime_type(export_format, export_compressed)
+                        )
+                    os.remove(export_path)
+                except (sqlite3.Error, OSError) as e:
+                    st.error(f"❌ Export failed: {e}")
+else:
+    st.info("No feedback submissions found in the database.")
 
 # Database maintenance
 st.subheader("🔧 Database Maintenance")
@@ -100,15 +175,56 @@ col1, col2 = st.columns(2)
 
 with col1:
     st.markdown("**Backup Database**")
+    compress_backup = st.checkbox("Compress backup (gzip)", value=True)
     if st.button("Create Backup"):
-        # Simple backup by exporting all data
-        csv_backup = df.to_csv(index=False)
-        st.download_button(
-            label="📥 Download Backup",
-            data=csv_backup,
-            file_name=f"feedback_backup_{pd.Timestamp.now().strftime('%Y%m%d_%H%M%S')}.csv",
-            mime="text/csv"
-        )
+        try:
+            with st.spinner("Backing up database..."):
+                backup_result = create_backup(compress=compress_backup)
+            st.success(
+                f"✅ Backup verified and saved to {backup_result['path']} "
+                f"({backup_result['size_bytes'] / 1024:.1f} KB)"
+            )
+            st.caption(
+                f"{backup_result['pages']} pages in {backup_result['duration']:.2f}s "
+                f"({backup_result['throughput_bytes_per_sec'] / (1024 * 1024):.1f} MB/s)"
+            )
+            with open(backup_result['path'], 'rb') as backup_file:
+                st.download_button(
+                    label="📥 Download Backup",
+                    data=backup_file,
+                    file_name=os.path.basename(backup_result['path']),
+                    mime="application/gzip" if compress_backup else "application/vnd.sqlite3"
+                )
+        except (sqlite3.Error, OSError) as e:
+            st.error(f"❌ Backup failed: {e}")
+
+    backups = list_backups()
+    if backups:
+        with st.expander(f"🗂️ Saved Backups ({len(backups)})"):
+            st.dataframe(
+                pd.DataFrame(backups)[['name', 'created_at', 'size_bytes']],
+                use_container_width=True
+            )
+            selected_backup = st.selectbox("Backup", [backup['path'] for backup in backups],
+                                           format_func=os.path.basename)
+
+            if st.button("Verify Backup"):
+                messages = verify_backup(selected_backup)
+                if messages == ['ok']:
+                    st.success("✅ Integrity check passed")
+                else:
+                    st.error("❌ Integrity check failed: " + "; ".join(messages[:5]))
+
+            confirm_restore = st.checkbox("I understand restoring replaces all current data")
+            if st.button("Restore Backup", disabled=not confirm_restore):
+                try:
+                    restore_result = restore_backup(selected_backup)
+                    st.success(
+                        f"✅ Restored in {restore_result['duration']:.2f}s. "
+                        f"Previous data saved to {restore_result['safety_backup']}"
+                    )
+                except (sqlite3.Error, OSError) as e:
+                    st.error(f"❌ Restore failed: {e}")
 
 with col2:
     st.markdown("**Database Info**")
@@ -122,6 +238,30 @@ with col2:
             st.dataframe(schema_df)
             conn.close()
 
+# Archival
+st.markdown("**Archive Resolved Feedback**")
+
+archive_stats = get_archive_stats()
+st.caption(
+    f"{archive_stats['archived_rows']} submissions archived "
+    f"({archive_stats['archive_size_bytes'] / 1024:.1f} KB)"
+)
+
+col1, col2, col3 = st.columns(3)
+
+with col1:
+    archive_after_days = st.number_input("Archive items older than (days)", min_value=1,
+                                         value=ARCHIVE_AFTER_DAYS, step=30)
+
+with col2:
+    compress_archive = st.checkbox("Compress archived feedback text", value=True)
+
+with col3:
+    if st.button("Run Archival"):
+        with st.spinner("Archiving resolved and closed feedback..."):
+            moved_count = archive_resolved_feedback(archive_after_days, compress_archive)
+        st.success(f"✅ Archived {moved_count} submissions")
+
 # Advanced queries
 st.subheader("🔍 Advanced Queries")
 
@@ -133,21 +273,51 @@ query_type = st.selectbox("Select Query Type", [
 ])
 
 if query_type == "Custom SQL Query":
-    st.warning("⚠️ Use with caution. Only SELECT queries are recommended.")
+    st.warning("⚠️ Queries run on a read-only connection with a row limit and a time budget.")
     custom_query = st.text_area("Enter SQL Query", height=100, 
                                 placeholder="SELECT * FROM feedback_submissions WHERE...")
     
-    if st.button("Execute Query"):
-        if custom_query.strip().upper().startswith('SELECT'):
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        row_limit = st.number_input("Row Limit", min_value=1, max_value=100000, value=DEFAULT_ROW_LIMIT, step=100)
+    
+    with col2:
+        time_budget = st.number_input("Time Budget (seconds)", min_value=0.5, max_value=60.0,
+                                      value=DEFAULT_TIME_BUDGET, step=0.5)
+    
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        explain_clicked = st.button("Explain Query Plan")
+    
+    with col2:
+        execute_clicked = st.button("Execute Query")
+    
+    if explain_clicked or execute_clicked:
+        validation_error = validate_query(custom_query)
+        if validation_error:
+            st.error(validation_error)
+        else:
             try:
-                conn = create_connection()
-                result_df = pd.read_sql_query(custom_query, conn)
-                st.dataframe(result_df)
-                conn.close()
-            except Exception as e:
+                plan_df, plan_warnings = explain_query(custom_query)
+                with st.expander("Query Plan", expanded=explain_clicked):
+                    st.dataframe(plan_df, use_container_width=True)
+                for warning in plan_warnings:
+                    st.warning(f"⚠️ {warning}")
+            except sqlite3.Error as e:
                 st.error(f"Query error: {e}")
+                execute_clicked = False
+    
+    if execute_clicked and not validate_query(custom_query):
+        result = run_readonly_query(custom_query, row_limit=row_limit, time_budget=time_budget)
+        if result['error']:
+            st.error(result['error'])
         else:
-            st.error("Only SELECT queries are allowed for security reasons.")
+            st.dataframe(result['data'])
+            st.caption(f"{len(result['data'])} rows in {result['elapsed'] * 1000:.1f} ms")
+            if result['truncated']:
+                st.info(f"Results truncated to the first {row_limit} rows.")
 
 elif query_type == "Submissions by Date Range":
     col1, col2 = st.columns(2)
@@ -155,28 +325,20 @@ elif query_type == "Submissions by Date Range":
         start_date = st.date_input("Start Date")
     with col2:
         end_date = st.date_input("End Date")
+    include_archived = st.checkbox("Include archived submissions", value=False)
     
     if st.button("Filter by Date Range"):
-        filtered_df = df[
-            (pd.to_datetime(df['submission_date']).dt.date >= start_date) &
-            (pd.to_datetime(df['submission_date']).dt.date <= end_date)
-        ]
+        filtered_df = get_feedback_by_date_range(start_date, end_date, include_archived=include_archived)
         st.dataframe(filtered_df)
 
 elif query_type == "High Priority Items":
-    if st.button("Show High Priority Items"):
-        high_priority_df = df[df['priority'] == 'High']
-        st.dataframe(high_priority_df)
+    show_feedback_page("high_priority", priority='High')
 
 elif query_type == "Anonymous Submissions":
-    if st.button("Show Anonymous Submissions"):
-        anonymous_df = df[df['is_anonymous'] == 1]
-        st.dataframe(anonymous_df)
-
-else:
-    st.info("No feedback submissions found in the database.")
+    show_feedback_page("anonymous", is_anonymous=True)
 
 # Footer
 st.markdown("---")
 st.markdown("*Database Manager - Handle with care*")
 
+page_timer.stop()
@@ -0,0 +1,190 @@
+import streamlit as st
+import pandas as pd
+import plotly.express as px
+from utils.metrics import (
+    METRICS_FILE,
+    metrics_enabled,
+    set_metrics_enabled,
+    get_metrics_summary,
+    get_slowest_calls,
+    read_metrics_file,
+    reset_metrics,
+    timer
+)
+from utils.query_log import (
+    SLOW_QUERY_LOG,
+    get_slow_query_threshold,
+    set_slow_query_threshold,
+    get_slow_query_report
+)
+from utils.advanced_database import get_feedback_analytics, ANALYTICS_MEMORY_BUDGET_MB
+
+st.set_page_config(page_title="Performance", layout="wide")
+
+# Simple authentication
+if 'authenticated' not in st.session_state:
+    st.session_state.authenticated = False
+
+if not st.session_state.authenticated:
+    st.title("🔐 Admin Authentication")
+
+    with st.form("auth_form"):
+        admin_code = st.text_input("Admin Code", type="password", help="Enter the admin access code")
+        login_button = st.form_submit_button("Login")
+
+        if login_button:
+            if admin_code == "admin123":  # Simple authentication - change in production
+                st.session_state.authenticated = True
+                st.success("✅ Authentication successful!")
+                st.rerun()
+            else:
+                st.error("❌ Invalid admin code. Please try again.")
+
+    st.info("💡 Default admin code: admin123 (Change this in production)")
+    st.stop()
+
+# Performance
+page_timer = timer("page.Performance").start()
+st.title("⏱️ Performance")
+
+# Logout button
+if st.button("🚪 Logout", key="logout"):
+    st.session_state.authenticated = False
+    st.rerun()
+
+col1, col2 = st.columns([3, 1])
+
+with col1:
+    enabled = st.toggle("Collect timings", value=metrics_enabled(),
+                        help="Timings cover database calls, text analysis, charts and page renders")
+    set_metrics_enabled(enabled)
+
+with col2:
+    if st.button("🧹 Reset Timings"):
+        reset_metrics()
+
+# Slow queries, grouped by statement shape
+st.subheader("🧾 Slow Queries")
+
+col1, col2 = st.columns([3, 1])
+
+with col1:
+    threshold = get_slow_query_threshold()
+    log_enabled = st.toggle("Log slow queries", value=threshold is not None)
+    threshold_ms = st.number_input("Threshold (ms)", min_value=0, value=100 if threshold is None else int(threshold), step=10,
+                                   disabled=not log_enabled)
+    set_slow_query_threshold(threshold_ms if log_enabled else None)
+
+slow_report = get_slow_query_report()
+
+if slow_report:
+    scans = sum(1 for group in slow_report if group['table_scan'])
+    with col2:
+        st.metric("Statements Logged", len(slow_report))
+        st.metric("With Table Scans", scans)
+
+    report_df = pd.DataFrame(slow_report)[
+        ['sql', 'count', 'total_ms', 'mean_ms', 'max_ms', 'max_rows', 'table_scan', 'parameters']
+    ]
+    st.dataframe(report_df.round(2), use_container_width=True, hide_index=True)
+
+    for group in slow_report[:10]:
+        label = ("⚠️ " if group['table_scan'] else "") + group['sql'][:100]
+        with st.expander(label):
+            st.code(group['sql'], language='sql')
+            st.text("\n".join(group['plan']) or "No plan captured")
+else:
+    st.info(f"No slow queries in {SLOW_QUERY_LOG} yet.")
+
+# Analytics memory budget and per-stage profile
+st.subheader("🧠 Analytics Memory")
+
+col1, col2 = st.columns([3, 1])
+
+with col1:
+    budget_mb = st.number_input("Memory budget (MB)", min_value=16, value=ANALYTICS_MEMORY_BUDGET_MB, step=16,
+                                help="Larger datasets are analyzed in chunks instead of loaded whole")
+
+with col2:
+    run_profile = st.button("Profile Analytics",
+                            help="Traces every allocation with tracemalloc, which makes the run about ten times "
+                                 "slower than a normal one (over half a minute at 50k rows) and holds this "
+                                 "server process while it runs")
+
+if run_profile:
+    with st.spinner("Profiling analytics (tracing allocations, about ten times slower than a normal run)..."):
+        profiled = get_feedback_analytics(profile=True, memory_budget_mb=budget_mb)
+    if profiled:
+        memory_profile = profiled['memory_profile']
+        st.caption(f"Ran in {profiled['execution_mode'].replace('_', '-')} mode, "
+                   f"peak {memory_profile['peak_mb']:.1f} MB against a {budget_mb} MB budget")
+        stages_df = pd.DataFrame(memory_profile['stages'])
+        fig_memory = px.bar(stages_df, x='stage', y=['peak_mb', 'retained_mb'], barmode='group',
+                            title="Memory by Stage (MB)", labels={'stage': 'Stage', 'value': 'MB'})
+        st.plotly_chart(fig_memory, use_container_width=True)
+        for stage in memory_profile['stages']:
+            with st.expander(f"{stage['stage']}: top allocations"):
+                st.text("\n".join(stage['top_allocations']) or "No allocations recorded")
+    else:
+        st.info("No feedback data to profile.")
+
+summary_df = pd.DataFrame(get_metrics_summary())
+
+if summary_df.empty:
+    st.info("No timings recorded yet. Use the other pages and come back here.")
+    st.stop()
+
+st.caption("Rolling statistics for this server process since it started or was last reset")
+
+# Page render times
+st.subheader("📄 Page Render Time")
+pages_df = summary_df[summary_df['name'].str.startswith('page.')].copy()
+if not pages_df.empty:
+    pages_df['name'] = pages_df['name'].str[len('page.'):]
+    fig_pages = px.bar(pages_df, x='name', y=['p50_ms', 'p95_ms'], barmode='group',
+                       title="Page Render Time (ms)", labels={'name': 'Page', 'value': 'ms'})
+    st.plotly_chart(fig_pages, use_container_width=True)
+else:
+    st.info("No page renders recorded yet.")
+
+# Slowest operations by p95
+st.subheader("🐢 Slowest Operations")
+calls_df = summary_df[~summary_df['name'].str.startswith('page.')]
+st.dataframe(calls_df.round(2), use_container_width=True, hide_index=True)
+
+col1, col2 = st.columns(2)
+
+with col1:
+    top_calls = calls_df.sort_values('calls', ascending=False).head(15)
+    fig_calls = px.bar(top_calls, x='calls', y='name', orientation='h', title="Call Counts",
+                       labels={'name': '', 'calls': 'Calls'})
+    fig_calls.update_layout(yaxis={'categoryorder': 'total ascending'})
+    st.plotly_chart(fig_calls, use_container_width=True)
+
+with col2:
+    top_time = calls_df.sort_values('total_s', ascending=False).head(15)
+    fig_time = px.bar(top_time, x='total_s', y='name', orientation='h', title="Total Time (s)",
+                      labels={'name': '', 'total_s': 'Seconds'})
+    fig_time.update_layout(yaxis={'categoryorder': 'total ascending'})
+    st.plotly_chart(fig_time, use_container_width=True)
+
+# Individual slow calls
+st.subheader("🔎 Slowest Individual Calls")
+st.dataframe(pd.DataFrame(get_slowest_calls()).round(2), use_container_width=True, hide_index=True)
+
+# History across processes from the metrics file
+with st.expander(f"📜 History from {METRICS_FILE}"):
+    history_df = pd.DataFrame(read_metrics_file())
+    if history_df.empty:
+        st.info("The metrics file is empty.")
+    else:
+        history_df['time'] = pd.to_datetime(history_df['ts'], unit='s')
+        history = history_df.groupby('name')['ms'].describe(percentiles=[0.5, 0.95])
+        st.dataframe(history.sort_values('95%', ascending=False).round(2), use_container_width=True)
+
+        selected = st.selectbox("Timeline for", sorted(history_df['name'].unique()))
+        fig_history = px.scatter(history_df[history_df['name'] == selected], x='time', y='ms',
+                                 title=f"{selected} Duration (ms)")
+        st.plotly_chart(fig_history, use_container_width=True)
+
+page_timer.stop()
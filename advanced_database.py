@@ -1,45 +1,257 @@
+import calendar
+import itertools
+import math
+import os
 import pandas as pd
 import sqlite3
-from utils.database import create_connection
+from datetime import date, datetime, timedelta
+from utils.database import (
+    create_connection,
+    build_id_filter_clause,
+    apply_lookup_categories,
+    LOOKUP_TABLES,
+    PENDING_STATUS_ID
+)
+from utils.replica import create_replica_connection
+from utils.archive import create_historical_connection, HISTORICAL_VIEW
 from utils.text_analysis import TextAnalyzer
+from utils.memory_profile import MemoryProfiler, stage_context
+from utils.metrics import timed
+from utils.hll import HyperLogLog
+from utils.sampling import DEFAULT_SAMPLE_ROWS, MIN_STRATUM_ROWS, sample_fraction
 
-def get_feedback_analytics():
-    """Get comprehensive analytics from feedback data"""
-    conn = create_connection()
+# Peak memory allowed for get_feedback_analytics before it switches to chunked execution
+ANALYTICS_MEMORY_BUDGET_MB = int(os.environ.get('FEEDBACK_ANALYTICS_MEMORY_MB', 256))
+ANALYTICS_CHUNK_ROWS = 5000
+# Rough peak cost of the in-memory path: DataFrame row overhead plus the
+# text list, three cleaned copies and the joined theme string
+IN_MEMORY_BYTES_PER_ROW = 2048
+IN_MEMORY_TEXT_EXPANSION = 8
+# Rows whose texts are analyzed by get_feedback_analytics(approximate=True)
+ANALYTICS_SAMPLE_ROWS = int(os.environ.get('FEEDBACK_ANALYTICS_SAMPLE_ROWS', DEFAULT_SAMPLE_ROWS))
+
+@timed()
+def create_analytics_connection(use_replica=False):
+    """Create a connection for analytics reads, from the snapshot replica when use_replica is set
+
+    The data source is chosen per call rather than per process, so one
+    session reading the snapshot does not switch it for the others.
+    """
+    if use_replica:
+        conn = create_replica_connection()
+        if conn:
+            return conn
+    return create_connection()
+
+SECONDS_PER_DAY = 86400
+# 1970-01-05 was the first Monday after the epoch, so weeks start on Monday
+WEEK_ORIGIN = 4 * SECONDS_PER_DAY
+
+# SQL expressions mapping submitted_ts to the start of its bucket
+TIME_BUCKETS = {
+    'day': f"(submitted_ts / {SECONDS_PER_DAY}) * {SECONDS_PER_DAY}",
+    'week': f"((submitted_ts - {WEEK_ORIGIN}) / {7 * SECONDS_PER_DAY}) * {7 * SECONDS_PER_DAY} + {WEEK_ORIGIN}",
+    'month': "CAST(strftime('%s', submitted_ts, 'unixepoch', 'start of month') AS INTEGER)"
+}
+BUCKET_LABELS = {
+    'day': "date(bucket_start, 'unixepoch')",
+    'week': "date(bucket_start, 'unixepoch')",
+    'month': "strftime('%Y-%m', bucket_start, 'unixepoch')"
+}
+
+def _to_epoch(day):
+    """Convert a date to submitted_ts seconds at the start of that day"""
+    return calendar.timegm(day.timetuple()[:3] + (0, 0, 0))
+
+def _build_date_range_clause(start_date=None, end_date=None):
+    """Build a WHERE clause on submitted_ts for an inclusive date range"""
+    clause = " WHERE submitted_ts IS NOT NULL"
+    params = []
+
+    if start_date:
+        clause += " AND submitted_ts >= ?"
+        params.append(_to_epoch(start_date))
+
+    if end_date:
+        clause += " AND submitted_ts < ?"
+        params.append(_to_epoch(end_date + timedelta(days=1)))
+
+    return clause, params
+
+def _estimate_in_memory_bytes(rows, text_bytes):
+    """Estimate the peak memory of the in-memory analytics path"""
+    return rows * IN_MEMORY_BYTES_PER_ROW + text_bytes * IN_MEMORY_TEXT_EXPANSION
+
+def _iter_text_chunks(conn, chunk_size=ANALYTICS_CHUNK_ROWS):
+    """Yield lists of feedback_text values, chunk_size rows at a time"""
+    cursor = conn.cursor()
+    cursor.execute("SELECT feedback_text FROM feedback_submissions")
+    while True:
+        rows = cursor.fetchmany(chunk_size)
+        if not rows:
+            break
+        yield [row[0] for row in rows]
+
+def _count_by(conn, column):
+    """Count rows per value of a lookup column, most common first, as value_counts() would"""
+    cursor = conn.cursor()
+    cursor.execute(f"""
+        SELECT l.name, counts.count
+        FROM (
+            SELECT {column}_id, COUNT(*) as count FROM feedback_submissions_base
+            WHERE {column}_id IS NOT NULL
+            GROUP BY {column}_id
+        ) counts
+        JOIN {LOOKUP_TABLES[column]} l ON l.id = counts.{column}_id
+        ORDER BY counts.count DESC
+    """)
+    return dict(cursor.fetchall())
+
+def _stream_feedback_analytics(conn, analyzer, profiler=None):
+    """Analytics without loading the table: texts in chunks, distributions grouped in SQL"""
+    with stage_context(profiler, 'texts_streamed'):
+        analytics = analyzer.analyze_text_chunks(_iter_text_chunks(conn))
+
+    with stage_context(profiler, 'distributions'):
+        analytics.update({
+            'category_distribution': _count_by(conn, 'category'),
+            'priority_distribution': _count_by(conn, 'priority'),
+            'status_distribution': _count_by(conn, 'status')
+        })
+    return analytics
+
+def _iter_text_sample(conn, fraction):
+    """Yield ((category_id, month), population, feedback_text) for a sample stratified by category and month
+
+    Rows are numbered in random order within each stratum and each stratum
+    keeps fraction of its rows, at least MIN_STRATUM_ROWS, as
+    utils.sampling.stratum_sample_size would; texts are read only for the
+    rows kept.
+    """
+    cursor = conn.cursor()
+    cursor.execute(f"""
+        WITH ranked AS (
+            SELECT id, category_id, strftime('%Y-%m', submitted_ts, 'unixepoch') as month,
+                   ROW_NUMBER() OVER strata as draw,
+                   COUNT(*) OVER (PARTITION BY category_id, strftime('%Y-%m', submitted_ts, 'unixepoch')) as population
+            FROM feedback_submissions_base
+            WINDOW strata AS (PARTITION BY category_id, strftime('%Y-%m', submitted_ts, 'unixepoch') ORDER BY random())
+        )
+        SELECT r.category_id, r.month, r.population, f.feedback_text
+        FROM ranked r
+        JOIN feedback_submissions_base f ON f.id = r.id
+        WHERE r.draw - 1 < r.population * ? OR r.draw <= {MIN_STRATUM_ROWS}
+    """, (fraction,))
+    while True:
+        rows = cursor.fetchmany(ANALYTICS_CHUNK_ROWS)
+        if not rows:
+            break
+        for category_id, month, population, text in rows:
+            yield (category_id, month), population, text
+
+def _sample_feedback_analytics(conn, analyzer, fraction, profiler=None):
+    """Analytics from a stratified sample of texts, with the distributions still exact from SQL"""
+    with stage_context(profiler, 'texts_sampled'):
+        population_sizes = {}
+        samples = []
+        for stratum, population, text in _iter_text_sample(conn, fraction):
+            population_sizes[stratum] = population
+            samples.append((stratum, text))
+        analytics = analyzer.analyze_text_sample(samples, population_sizes)
+
+    with stage_context(profiler, 'distributions'):
+        analytics.update({
+            'category_distribution': _count_by(conn, 'category'),
+            'priority_distribution': _count_by(conn, 'priority'),
+            'status_distribution': _count_by(conn, 'status')
+        })
+    return analytics
+
+@timed()
+def get_feedback_analytics(profile=False, memory_budget_mb=None, approximate=False, sample_size=None,
+                           use_replica=False):
+    """Get comprehensive analytics from feedback data
+
+    The full table is loaded into a DataFrame only when its estimated peak
+    memory fits the budget (memory_budget_mb, or ANALYTICS_MEMORY_BUDGET_MB
+    when not given). Otherwise, or when profiling shows the load itself went over
+    budget, the texts are analyzed in chunks and the distributions are
+    grouped in SQL. With profile=True the result includes 'memory_profile',
+    the peak memory of each stage from tracemalloc; tracing makes the run
+    roughly ten times slower.
+
+    With approximate=True the themes, keyword categories and sentiment are
+    estimated from a sample of sample_size texts (ANALYTICS_SAMPLE_ROWS by
+    default) stratified by category and month, scaled to the full table,
+    with 95% intervals in 'confidence_intervals'. Each call draws a new sample.
+    """
+    budget_mb = memory_budget_mb if memory_budget_mb is not None else ANALYTICS_MEMORY_BUDGET_MB
+    budget_bytes = budget_mb * 1024 * 1024
+    profiler = MemoryProfiler().start() if profile else None
+
+    conn = create_analytics_connection(use_replica)
     if not conn:
+        if profiler:
+            profiler.stop()
         return {}
     
     try:
-        # Get all feedback data
-        df = pd.read_sql_query("SELECT * FROM feedback_submissions", conn)
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT COUNT(*), COALESCE(SUM(is_anonymous), 0), COALESCE(SUM(LENGTH(feedback_text)), 0),
+                   MIN(submitted_ts), MAX(submitted_ts)
+            FROM feedback_submissions
+        """)
+        total_rows, anonymous_rows, text_bytes, first_ts, last_ts = cursor.fetchone()
         
-        if df.empty:
+        if total_rows == 0:
             return {}
         
         # Initialize text analyzer
         analyzer = TextAnalyzer()
         
-        # Perform analysis
-        analytics = analyzer.analyze_feedback_data(df)
+        streaming = not approximate and _estimate_in_memory_bytes(total_rows, text_bytes) > budget_bytes
+        if approximate:
+            fraction = sample_fraction(total_rows, sample_size or ANALYTICS_SAMPLE_ROWS)
+            analytics = _sample_feedback_analytics(conn, analyzer, fraction, profiler)
+        elif not streaming:
+            # Get all feedback data
+            with stage_context(profiler, 'load'):
+                df = apply_lookup_categories(pd.read_sql_query("SELECT * FROM feedback_submissions", conn), conn)
+            
+            if profiler and profiler.peak_bytes > budget_bytes:
+                del df
+                streaming = True
+            else:
+                # Perform analysis
+                analytics = analyzer.analyze_feedback_data(df, profiler=profiler)
+                del df
         
-        # Add time-based analytics
-        df['submission_date'] = pd.to_datetime(df['submission_date'])
+        if streaming:
+            analytics = _stream_feedback_analytics(conn, analyzer, profiler)
         
-        # Monthly submission trends
-        monthly_trends = df.groupby(df['submission_date'].dt.to_period('M')).size().to_dict()
-        monthly_trends = {str(k): v for k, v in monthly_trends.items()}
+        # Add time-based analytics, grouped in SQL on the indexed submitted_ts column
+        with stage_context(profiler, 'time_series'):
+            monthly_df = get_submission_time_series('month', use_replica=use_replica)
+            monthly_trends = dict(zip(monthly_df['period'], monthly_df['submissions']))
+            
+            # Daily submission trends (last 30 days)
+            daily_df = get_submission_time_series('day', start_date=date.today() - timedelta(days=30),
+                                                  use_replica=use_replica)
+            daily_trends = dict(zip(daily_df['period'], daily_df['submissions']))
         
-        # Daily submission trends (last 30 days)
-        recent_df = df[df['submission_date'] >= (pd.Timestamp.now() - pd.Timedelta(days=30))]
-        daily_trends = recent_df.groupby(recent_df['submission_date'].dt.date).size().to_dict()
-        daily_trends = {str(k): v for k, v in daily_trends.items()}
+        days_covered = (last_ts - first_ts) // SECONDS_PER_DAY if first_ts is not None else 0
         
         analytics.update({
+            'total_feedback': total_rows,
             'monthly_trends': monthly_trends,
             'daily_trends': daily_trends,
-            'avg_submissions_per_day': len(df) / max(1, (df['submission_date'].max() - df['submission_date'].min()).days),
-            'anonymous_percentage': (df['is_anonymous'].sum() / len(df)) * 100 if len(df) > 0 else 0
+            'avg_submissions_per_day': total_rows / max(1, days_covered),
+            'anonymous_percentage': (anonymous_rows / total_rows) * 100,
+            'execution_mode': 'approximate' if approximate else 'streaming' if streaming else 'in_memory'
         })
+        if profiler:
+            analytics['memory_profile'] = profiler.report()
         
         return analytics
         
@@ -48,21 +260,82 @@ def get_feedback_analytics():
         return {}
     finally:
         conn.close()
+        if profiler:
+            profiler.stop()
+
+@timed()
+def get_feedback_by_date_range(start_date=None, end_date=None, limit=None, include_archived=False):
+    """Get feedback submitted between two dates (inclusive) using the submitted_ts index"""
+    conn = create_historical_connection() if include_archived else create_connection()
+    if not conn:
+        return pd.DataFrame()
+    
+    try:
+        source = HISTORICAL_VIEW if include_archived else "feedback_submissions"
+        where, params = _build_date_range_clause(start_date, end_date)
+        query = f"SELECT * FROM {source}{where} ORDER BY submitted_ts"
+        if limit:
+            query += " LIMIT ?"
+            params.append(int(limit))
+        
+        df = pd.read_sql_query(query, conn, params=params)
+        return apply_lookup_categories(df, conn)
+    except Exception as e:
+        print(f"Error getting feedback by date range: {e}")
+        return pd.DataFrame()
+    finally:
+        conn.close()
+
+@timed()
+def get_submission_time_series(bucket='day', start_date=None, end_date=None, use_replica=False):
+    """Get submission counts per day, week or month, grouped in SQL"""
+    conn = create_analytics_connection(use_replica)
+    if not conn:
+        return pd.DataFrame(columns=['period', 'submissions'])
+    
+    try:
+        if bucket not in TIME_BUCKETS:
+            raise ValueError(f"Unknown time bucket: {bucket}")
+        
+        where, params = _build_date_range_clause(start_date, end_date)
+        query = f"""
+        SELECT {BUCKET_LABELS[bucket]} as period, submissions
+        FROM (
+            SELECT {TIME_BUCKETS[bucket]} as bucket_start, COUNT(*) as submissions
+            FROM feedback_submissions{where}
+            GROUP BY bucket_start
+        )
+        ORDER BY bucket_start
+        """
+        df = pd.read_sql_query(query, conn, params=params)
+        return df
+    except Exception as e:
+        print(f"Error getting submission time series: {e}")
+        return pd.DataFrame(columns=['period', 'submissions'])
+    finally:
+        conn.close()
 
-def get_feedback_by_category():
+@timed()
+def get_feedback_by_category(use_replica=False):
     """Get feedback grouped by category"""
-    conn = create_connection()
+    conn = create_analytics_connection(use_replica)
     if not conn:
         return pd.DataFrame()
     
     try:
+        # Counted per (category, priority) from the covering index, then weighted by
+        # priority_rank; rows without a priority score 1, as Low does
         query = """
-        SELECT category, COUNT(*) as count, 
-               AVG(CASE WHEN priority = 'High' THEN 3 
-                        WHEN priority = 'Medium' THEN 2 
-                        ELSE 1 END) as avg_priority_score
-        FROM feedback_submissions 
-        GROUP BY category
+        SELECT c.name as category, SUM(counts.count) as count,
+               SUM(counts.count * COALESCE(p.priority_rank, 1)) * 1.0 / SUM(counts.count) as avg_priority_score
+        FROM (
+            SELECT category_id, priority_id, COUNT(*) as count
+            FROM feedback_submissions_base
+            GROUP BY category_id, priority_id
+        ) counts
+        JOIN feedback_categories c ON c.id = counts.category_id
+        LEFT JOIN feedback_priorities p ON p.id = counts.priority_id
+        GROUP BY counts.category_id
         ORDER BY count DESC
         """
         df = pd.read_sql_query(query, conn)
@@ -73,9 +346,10 @@ def get_feedback_by_category():
     finally:
         conn.close()
 
-def get_feedback_trends():
+@timed()
+def get_feedback_trends(use_replica=False):
     """Get feedback submission trends over time"""
-    conn = create_connection()
+    conn = create_analytics_connection(use_replica)
     if not conn:
         return pd.DataFrame()
     
@@ -83,8 +357,8 @@ def get_feedback_trends():
         query = """
         SELECT DATE(submission_date) as date, 
                COUNT(*) as submissions,
-               SUM(CASE WHEN priority = 'High' THEN 1 ELSE 0 END) as high_priority
-        FROM feedback_submissions 
+               SUM(priority_id = (SELECT id FROM feedback_priorities WHERE name = 'High')) as high_priority
+        FROM feedback_submissions_base
         GROUP BY DATE(submission_date)
         ORDER BY date DESC
         LIMIT 30
@@ -97,20 +371,30 @@ def get_feedback_trends():
     finally:
         conn.close()
 
-def get_status_summary():
+@timed()
+def get_status_summary(use_replica=False):
     """Get summary of feedback status"""
-    conn = create_connection()
+    conn = create_analytics_connection(use_replica)
     if not conn:
         return pd.DataFrame()
     
     try:
-        query = """
-        SELECT status, COUNT(*) as count,
-               AVG(julianday('now') - julianday(submission_date)) as avg_days_open
-        FROM feedback_submissions 
-        GROUP BY status
+        # Only open items have a meaningful age; the (status_id, submitted_ts) index covers the
+        # grouping, and names are joined onto the handful of grouped rows
+        now_ts = calendar.timegm(datetime.now().timetuple())
+        query = f"""
+        SELECT s.name as status, summary.count, summary.avg_days_open
+        FROM (
+            SELECT status_id, COUNT(*) as count,
+                   AVG(CASE WHEN status_id NOT IN (SELECT id FROM feedback_statuses WHERE is_resolved)
+                            THEN ? - submitted_ts END) / {SECONDS_PER_DAY}.0 as avg_days_open
+            FROM feedback_submissions_base
+            GROUP BY status_id
+        ) summary
+        LEFT JOIN feedback_statuses s ON s.id = summary.status_id
+        ORDER BY status
         """
-        df = pd.read_sql_query(query, conn)
+        df = pd.read_sql_query(query, conn, params=(now_ts,))
         return df
     except Exception as e:
         print(f"Error getting status summary: {e}")
@@ -118,14 +402,152 @@ def get_status_summary():
     finally:
         conn.close()
 
-def search_feedback(search_term, category=None, status=None, priority=None):
-    """Search feedback with filters"""
+def _percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    rank = max(1, math.ceil(fraction * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+def _lookup_names(cursor, column):
+    """Map the ids of a lookup column to their names"""
+    cursor.execute(f"SELECT id, name FROM {LOOKUP_TABLES[column]}")
+    return dict(cursor.fetchall())
+
+def _grouped_percentiles(cursor, column):
+    """Read (category, priority, value) rows in index order and summarize each group"""
+    category_names = _lookup_names(cursor, 'category')
+    priority_names = _lookup_names(cursor, 'priority')
+    cursor.execute(f"""
+        SELECT category_id, priority_id, {column}
+        FROM feedback_submissions_base
+        WHERE {column} IS NOT NULL
+        ORDER BY category_id, priority_id, {column}
+    """)
+
+    summary = {}
+    for (category_id, priority_id), rows in itertools.groupby(cursor, key=lambda row: (row[0], row[1])):
+        values = [row[2] for row in rows]
+        summary[(category_names.get(category_id), priority_names.get(priority_id))] = {
+            'count': len(values),
+            'median_hours': _percentile(values, 0.5) / 3600,
+            'p90_hours': _percentile(values, 0.9) / 3600
+        }
+    return summary
+
+@timed()
+def get_resolution_sla(use_replica=False):
+    """Get median and p90 time to first response and to resolution per category and priority"""
+    columns = ['category', 'priority', 'resolved_count', 'median_resolution_hours', 'p90_resolution_hours',
+               'responded_count', 'median_first_response_hours', 'p90_first_response_hours']
+    conn = create_analytics_connection(use_replica)
+    if not conn:
+        return pd.DataFrame(columns=columns)
+    
+    try:
+        cursor = conn.cursor()
+        # Both scans are served in order from partial indexes on the *_seconds columns
+        resolution = _grouped_percentiles(cursor, 'resolution_seconds')
+        first_response = _grouped_percentiles(cursor, 'first_response_seconds')
+        
+        rows = []
+        for category, priority in sorted(set(resolution) | set(first_response), key=lambda key: (str(key[0]), str(key[1]))):
+            resolved = resolution.get((category, priority), {})
+            responded = first_response.get((category, priority), {})
+            rows.append((
+                category, priority,
+                resolved.get('count', 0), resolved.get('median_hours'), resolved.get('p90_hours'),
+                responded.get('count', 0), responded.get('median_hours'), responded.get('p90_hours')
+            ))
+        return pd.DataFrame(rows, columns=columns)
+    except Exception as e:
+        print(f"Error getting resolution SLA: {e}")
+        return pd.DataFrame(columns=columns)
+    finally:
+        conn.close()
+
+@timed()
+def get_dashboard_kpis():
+    """Get the dashboard header metrics in a single aggregate query"""
+    empty_kpis = {
+        'total': 0,
+        'pending': 0,
+        'resolved': 0,
+        'high_priority': 0,
+        'earliest_submission': None,
+        'latest_submission': None
+    }
+
+    conn = create_connection()
+    if not conn:
+        return empty_kpis
+
+    try:
+        # Each scalar subquery is answered from an index rather than a table scan
+        query = """
+        SELECT (SELECT COUNT(*) FROM feedback_submissions_base) as total,
+               (SELECT COUNT(*) FROM feedback_submissions_base
+                WHERE status_id = (SELECT id FROM feedback_statuses WHERE name = 'Pending')) as pending,
+               (SELECT COUNT(*) FROM feedback_submissions_base
+                WHERE status_id = (SELECT id FROM feedback_statuses WHERE name = 'Resolved')) as resolved,
+               (SELECT COUNT(*) FROM feedback_submissions_base
+                WHERE priority_id = (SELECT id FROM feedback_priorities WHERE name = 'High')) as high_priority,
+               (SELECT MIN(submission_date) FROM feedback_submissions_base) as earliest_submission,
+               (SELECT MAX(submission_date) FROM feedback_submissions_base) as latest_submission
+        """
+        cursor = conn.cursor()
+        cursor.execute(query)
+        row = cursor.fetchone()
+        return dict(zip(empty_kpis.keys(), row))
+    except Exception as e:
+        print(f"Error getting dashboard KPIs: {e}")
+        return empty_kpis
+    finally:
+        conn.close()
+
+def _get_breakdown(column):
+    """Count feedback grouped by a lookup column, grouping on its indexed integer key"""
     conn = create_connection()
+    if not conn:
+        return pd.DataFrame(columns=[column, 'count'])
+
+    try:
+        query = f"""
+        SELECT l.name as {column}, counts.count
+        FROM (
+            SELECT {column}_id, COUNT(*) as count
+            FROM feedback_submissions_base
+            GROUP BY {column}_id
+        ) counts
+        LEFT JOIN {LOOKUP_TABLES[column]} l ON l.id = counts.{column}_id
+        ORDER BY counts.count DESC
+        """
+        df = pd.read_sql_query(query, conn)
+        return df
+    except Exception as e:
+        print(f"Error getting {column} breakdown: {e}")
+        return pd.DataFrame(columns=[column, 'count'])
+    finally:
+        conn.close()
+
+@timed()
+def get_status_breakdown():
+    """Get the number of submissions per status"""
+    return _get_breakdown('status')
+
+@timed()
+def get_category_breakdown():
+    """Get the number of submissions per category"""
+    return _get_breakdown('category')
+
+@timed()
+def search_feedback(search_term, category=None, status=None, priority=None, include_archived=False):
+    """Search feedback with filters, optionally including archived submissions"""
+    conn = create_historical_connection() if include_archived else create_connection()
     if not conn:
         return pd.DataFrame()
     
     try:
-        query = "SELECT * FROM feedback_submissions WHERE 1=1"
+        source = HISTORICAL_VIEW if include_archived else "feedback_submissions"
+        query = f"SELECT * FROM {source} WHERE 1=1"
         params = []
         
         if search_term:
@@ -148,24 +570,268 @@ def search_feedback(search_term, category=None, status=None, priority=None):
         query += " ORDER BY submission_date DESC"
         
         df = pd.read_sql_query(query, conn, params=params)
-        return df
+        return apply_lookup_categories(df, conn)
     except Exception as e:
         print(f"Error searching feedback: {e}")
         return pd.DataFrame()
     finally:
         conn.close()
 
-def get_priority_distribution():
-    """Get distribution of feedback by priority"""
+@timed()
+def get_triage_queue(limit=20):
+    """Get the next pending items ranked by priority boost plus age
+
+    Served in order from the partial triage_key index, so only `limit` rows are
+    read however many items are pending. triage_hours is the item's age plus
+    its priority head start.
+    """
     conn = create_connection()
     if not conn:
         return pd.DataFrame()
+
+    try:
+        now_ts = calendar.timegm(datetime.now().timetuple())
+        # The view cannot carry INDEXED BY, so the base table is read and the names joined in
+        query = f"""
+        SELECT feedback_submissions_base.id as id, p.name as priority, c.name as category, subject,
+               submission_date, version,
+               (? - submitted_ts) / 3600.0 as age_hours,
+               (? - triage_key) / 3600.0 as triage_hours
+        FROM feedback_submissions_base INDEXED BY idx_feedback_triage
+        LEFT JOIN feedback_priorities p ON p.id = priority_id
+        LEFT JOIN feedback_categories c ON c.id = category_id
+        WHERE status_id = {PENDING_STATUS_ID}
+        ORDER BY triage_key, feedback_submissions_base.id
+        LIMIT ?
+        """
+        df = pd.read_sql_query(query, conn, params=(now_ts, now_ts, int(limit)))
+        return apply_lookup_categories(df, conn)
+    except Exception as e:
+        print(f"Error getting triage queue: {e}")
+        return pd.DataFrame()
+    finally:
+        conn.close()
+
+@timed()
+def get_student_history(student_id, include_anonymous=False, include_archived=False, limit=100):
+    """Get a student's past submissions, newest first, from the student_id index
+
+    Anonymous submissions are left out unless include_anonymous is set, so an
+    anonymous grievance is not linked to the student's other submissions.
+    """
+    conn = create_historical_connection() if include_archived else create_connection()
+    if not conn:
+        return pd.DataFrame()
+
+    try:
+        source = HISTORICAL_VIEW if include_archived else "feedback_submissions"
+        query = f"""
+        SELECT id, submission_date, category, subject, priority, status, is_anonymous
+        FROM {source}
+        WHERE student_id = ?
+        """
+        if not include_anonymous:
+            query += " AND NOT is_anonymous"
+        query += " ORDER BY submitted_ts DESC LIMIT ?"
+
+        df = pd.read_sql_query(query, conn, params=(student_id, int(limit)))
+        return apply_lookup_categories(df, conn)
+    except Exception as e:
+        print(f"Error getting student history: {e}")
+        return pd.DataFrame()
+    finally:
+        conn.close()
+
+@timed()
+def get_student_summary(student_id):
+    """Get a student's submission counters, or None if the student has never submitted"""
+    conn = create_connection()
+    if not conn:
+        return None
+
+    try:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT named_count, anonymous_count,
+                   date(first_submitted_ts, 'unixepoch'), date(last_submitted_ts, 'unixepoch')
+            FROM student_submission_stats
+            WHERE student_id = ?
+        """, (student_id,))
+        row = cursor.fetchone()
+        if row is None:
+            return None
+        return dict(zip(['named_count', 'anonymous_count', 'first_submission', 'last_submission'], row))
+    except Exception as e:
+        print(f"Error getting student summary: {e}")
+        return None
+    finally:
+        conn.close()
+
+@timed()
+def get_repeat_submitter_stats(top_n=10, use_replica=False):
+    """Get aggregate repeat-submitter statistics from the per-student counters
+
+    Only named (non-anonymous) submissions count towards repeat submissions.
+    """
+    empty_stats = {'students': 0, 'repeat_students': 0, 'repeat_share': 0.0,
+                   'distribution': pd.DataFrame(columns=['submissions', 'students']),
+                   'top_submitters': pd.DataFrame(columns=['student_id', 'named_count', 'last_submission'])}
+    conn = create_analytics_connection(use_replica)
+    if not conn:
+        return empty_stats
+
+    try:
+        distribution = pd.read_sql_query("""
+            SELECT CASE WHEN named_count = 1 THEN '1'
+                        WHEN named_count = 2 THEN '2'
+                        WHEN named_count <= 5 THEN '3-5'
+                        ELSE '6+' END as submissions,
+                   COUNT(*) as students
+            FROM student_submission_stats
+            WHERE named_count > 0
+            GROUP BY submissions
+            ORDER BY MIN(named_count)
+        """, conn)
+        top_submitters = pd.read_sql_query("""
+            SELECT student_id, named_count, date(last_submitted_ts, 'unixepoch') as last_submission
+            FROM student_submission_stats
+            WHERE named_count > 1
+            ORDER BY named_count DESC
+            LIMIT ?
+        """, conn, params=(int(top_n),))
+
+        students = int(distribution['students'].sum())
+        repeat_students = int(distribution.loc[distribution['submissions'] != '1', 'students'].sum())
+        return {
+            'students': students,
+            'repeat_students': repeat_students,
+            'repeat_share': repeat_students / students if students else 0.0,
+            'distribution': distribution,
+            'top_submitters': top_submitters
+        }
+    except Exception as e:
+        print(f"Error getting repeat submitter stats: {e}")
+        return empty_stats
+    finally:
+        conn.close()
+
+# Sort keys on feedback_submissions_base, each the leading columns of an index so a page
+# is read in order rather than sorting every row. Priority ids are assigned in
+# priority_rank order, so sorting by priority_id sorts by rank.
+SORT_KEYS = {
+    'id': ('id',),
+    'submission_date': ('submission_date', 'id'),
+    'category': ('category_id', 'submission_date', 'id'),
+    'priority': ('priority_id', 'submission_date', 'id'),
+    'status': ('status_id', 'submission_date', 'id'),
+}
+SORTABLE_COLUMNS = list(SORT_KEYS)
+FILTER_COLUMNS = ['status', 'category', 'priority']
+
+def _build_feedback_filter_clause(status=None, category=None, priority=None, is_anonymous=None):
+    """Build build_id_filter_clause's filters plus an optional is_anonymous filter"""
+    where, params = build_id_filter_clause(status, category, priority)
+    if is_anonymous is not None:
+        where += " AND is_anonymous = ?"
+        params.append(int(is_anonymous))
+    return where, params
+
+@timed()
+def query_feedback(status=None, category=None, priority=None, order_by='submission_date',
+                   descending=True, limit=50, offset=0, is_anonymous=None):
+    """Get one page of feedback with filters and ordering applied in SQL"""
+    conn = create_connection()
+    if not conn:
+        return pd.DataFrame()
+
+    try:
+        if order_by not in SORT_KEYS:
+            raise ValueError(f"Cannot order by {order_by}")
+
+        # Pick the page on the base table's integer keys, then join only its rows to their names
+        where, params = _build_feedback_filter_clause(status, category, priority, is_anonymous)
+        direction = "DESC" if descending else "ASC"
+        keys = SORT_KEYS[order_by]
+        page_order = ", ".join(f"{key} {direction}" for key in keys)
+        query = (f"SELECT f.* FROM (SELECT {', '.join(keys)} FROM feedback_submissions_base{where} "
+                 f"ORDER BY {page_order} LIMIT ? OFFSET ?) page "
+                 f"JOIN feedback_submissions f ON f.id = page.id "
+                 f"ORDER BY {', '.join(f'page.{key} {direction}' for key in keys)}")
+        params.extend([int(limit), int(offset)])
+
+        df = pd.read_sql_query(query, conn, params=params)
+        return apply_lookup_categories(df, conn)
+    except Exception as e:
+        print(f"Error querying feedback: {e}")
+        return pd.DataFrame()
+    finally:
+        conn.close()
+
+@timed()
+def count_feedback(status=None, category=None, priority=None, is_anonymous=None):
+    """Count feedback matching the dashboard filters"""
+    conn = create_connection()
+    if not conn:
+        return 0
+
+    try:
+        # Counted on the base table, where an unfiltered count reads only the smallest index
+        where, params = _build_feedback_filter_clause(status, category, priority, is_anonymous)
+        cursor = conn.cursor()
+        cursor.execute(f"SELECT COUNT(*) FROM feedback_submissions_base{where}", params)
+        return cursor.fetchone()[0]
+    except Exception as e:
+        print(f"Error counting feedback: {e}")
+        return 0
+    finally:
+        conn.close()
+
+@timed()
+def get_filter_options():
+    """Get the status, category and priority values in use, for filter dropdowns
+
+    Priorities are listed by rank; each value is checked with one probe of its index.
+    """
+    conn = create_connection()
+    if not conn:
+        return {column: [] for column in FILTER_COLUMNS}
+
+    try:
+        cursor = conn.cursor()
+        options = {}
+        for column in FILTER_COLUMNS:
+            table = LOOKUP_TABLES[column]
+            order = "priority_rank, name" if column == 'priority' else "name"
+            cursor.execute(f"""
+                SELECT name FROM {table}
+                WHERE EXISTS (SELECT 1 FROM feedback_submissions_base WHERE {column}_id = {table}.id)
+                ORDER BY {order}
+            """)
+            options[column] = [row[0] for row in cursor.fetchall()]
+        return options
+    except Exception as e:
+        print(f"Error getting filter options: {e}")
+        return {column: [] for column in FILTER_COLUMNS}
+    finally:
+        conn.close()
+
+@timed()
+def get_priority_distribution(use_replica=False):
+    """Get distribution of feedback by priority"""
+    conn = create_analytics_connection(use_replica)
+    if not conn:
+        return pd.DataFrame()
     
     try:
         query = """
-        SELECT priority, category, COUNT(*) as count
-        FROM feedback_submissions 
-        GROUP BY priority, category
+        SELECT p.name as priority, c.name as category, counts.count
+        FROM (
+            SELECT category_id, priority_id, COUNT(*) as count
+            FROM feedback_submissions_base
+            GROUP BY category_id, priority_id
+        ) counts
+        LEFT JOIN feedback_priorities p ON p.id = counts.priority_id
+        LEFT JOIN feedback_categories c ON c.id = counts.category_id
         ORDER BY priority, count DESC
         """
         df = pd.read_sql_query(query, conn)
@@ -176,6 +842,103 @@ def get_priority_distribution():
     finally:
         conn.close()
 
+# Standard errors either side of a distinct-student estimate, for a 95% interval
+DISTINCT_CONFIDENCE_Z = 1.96
+
+def _read_student_sketches(conn, start_date=None, end_date=None, categories=None):
+    """Get (category, day, registers) rows of the student sketches in an inclusive date range"""
+    query = """
+        SELECT c.name, s.day, s.registers
+        FROM student_sketches s
+        JOIN feedback_categories c ON c.id = s.category_id
+        WHERE 1=1
+    """
+    params = []
+
+    if start_date:
+        query += " AND s.day >= ?"
+        params.append(_to_epoch(start_date) // SECONDS_PER_DAY)
+
+    if end_date:
+        query += " AND s.day <= ?"
+        params.append(_to_epoch(end_date) // SECONDS_PER_DAY)
+
+    if categories:
+        query += f" AND c.name IN ({', '.join('?' for _ in categories)})"
+        params.extend(categories)
+
+    return conn.execute(query, params).fetchall()
+
+def _distinct_margin(sketch):
+    """Estimate of a sketch and the half-width of its 95% interval"""
+    estimate = sketch.estimate()
+    return estimate, DISTINCT_CONFIDENCE_Z * sketch.relative_error * estimate
+
+@timed()
+def get_distinct_students(start_date=None, end_date=None, categories=None, use_replica=False):
+    """Estimate the distinct students who submitted feedback in a date range and set of categories
+
+    Merges the per-day, per-category HyperLogLog sketches instead of running
+    COUNT(DISTINCT student_id), so any window costs one small read per
+    sketch. Archived submissions stay counted. Returns the estimate with its
+    relative standard error and 95% bounds.
+    """
+    conn = create_analytics_connection(use_replica)
+    if not conn:
+        return {}
+
+    try:
+        sketch = HyperLogLog()
+        for _, _, registers in _read_student_sketches(conn, start_date, end_date, categories):
+            sketch.merge(HyperLogLog.from_blob(registers))
+
+        estimate, margin = _distinct_margin(sketch)
+        return {
+            'students': round(estimate),
+            'relative_error': sketch.relative_error,
+            'low': max(0, math.floor(estimate - margin)),
+            'high': math.ceil(estimate + margin)
+        }
+    except Exception as e:
+        print(f"Error estimating distinct students: {e}")
+        return {}
+    finally:
+        conn.close()
+
+@timed()
+def get_weekly_distinct_students(start_date=None, end_date=None, categories=None, use_replica=False):
+    """Estimate the distinct students complaining per category per week, weeks starting on Monday
+
+    Returns one row per category and week with the estimate and the
+    half-width of its 95% interval as margin.
+    """
+    conn = create_analytics_connection(use_replica)
+    if not conn:
+        return pd.DataFrame()
+
+    try:
+        weekly = {}
+        for category, day, registers in _read_student_sketches(conn, start_date, end_date, categories):
+            week = (day * SECONDS_PER_DAY - WEEK_ORIGIN) // (7 * SECONDS_PER_DAY) * 7 + WEEK_ORIGIN // SECONDS_PER_DAY
+            sketch = weekly.setdefault((category, week), HyperLogLog())
+            sketch.merge(HyperLogLog.from_blob(registers))
+
+        rows = []
+        for (category, week), sketch in sorted(weekly.items(), key=lambda item: (item[0][1], item[0][0])):
+            estimate, margin = _distinct_margin(sketch)
+            rows.append({
+                'week': (date(1970, 1, 1) + timedelta(days=week)).isoformat(),
+                'category': category,
+                'students': round(estimate),
+                'margin': round(margin, 1)
+            })
+        return pd.DataFrame(rows, columns=['week', 'category', 'students', 'margin'])
+    except Exception as e:
+        print(f"Error estimating weekly distinct students: {e}")
+        return pd.DataFrame()
+    finally:
+        conn.close()
+
 if __name__ == '__main__':
     # Test the functions
     analytics = get_feedback_analytics()
@@ -57,6 +57,7 @@ Use the sidebar navigation to:
 - **📝 Submit Feedback**: Submit your feedback or grievances securely
 - **📊 Admin Dashboard**: Administrative interface for managing submissions (Admin access required)
 - **🗄️ Database Manager**: Advanced database management tools (Admin access required)
+- **⏱️ Performance**: Timings for database calls, charts and page renders (Admin access required)
 
 ### 📋 Features
 
@@ -1,11 +1,5 @@
 import streamlit as st
 import pandas as pd
-import numpy as np
-import matplotlib.pyplot as plt
-import seaborn as sns
-import plotly.express as px
-import plotly.graph_objects as go
-from wordcloud import WordCloud
 import os
 from datetime import datetime
 
@@ -50,6 +44,9 @@ def load_analysis_data():
 def create_wordcloud(themes_df):
     """Create word cloud from themes data"""
     if not themes_df.empty:
+        from wordcloud import WordCloud
+        import matplotlib.pyplot as plt
+        
         word_freq = dict(zip(themes_df['Theme'], themes_df['Count']))
         wordcloud = WordCloud(width=800, height=400, background_color='white').generate_from_frequencies(word_freq)
         
@@ -62,6 +59,7 @@ def create_wordcloud(themes_df):
 def create_category_chart(categories_df):
     """Create category distribution chart"""
     if not categories_df.empty:
+        import plotly.express as px
         fig = px.bar(categories_df, x='Category', y='Count', 
                     title='Feedback Distribution by Category',
                     color='Count',
@@ -73,6 +71,7 @@ def create_category_chart(categories_df):
 def create_sentiment_chart(sentiment_df):
     """Create sentiment distribution pie chart"""
     if not sentiment_df.empty:
+        import plotly.express as px
         fig = px.pie(sentiment_df, values='Count', names='Sentiment',
                     title='Sentiment Distribution',
                     color_discrete_map={'Positive': '#2E8B57', 'Negative': '#DC143C', 'Neutral': '#FFD700'})
@@ -82,6 +81,7 @@ def create_sentiment_chart(sentiment_df):
 def create_themes_chart(themes_df):
     """Create top themes horizontal bar chart"""
     if not themes_df.empty:
+        import plotly.express as px
         top_10 = themes_df.head(10)
         fig = px.bar(top_10, x='Count', y='Theme', orientation='h',
                     title='Top 10 Common Themes',
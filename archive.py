@@ -0,0 +1,210 @@
+import argparse
+import calendar
+import os
+import sqlite3
+import time
+import zlib
+from urllib.request import pathname2url
+from utils import database
+from utils.database import create_connection, RESOLVED_STATUSES
+from utils.metrics import timed
+
+# The archive sits next to the live database, named after it: feedback_system.db -> feedback_system_archive.db
+ARCHIVE_SUFFIX = '_archive'
+ARCHIVE_SCHEMA = 'archive'
+ARCHIVE_TABLE = 'feedback_submissions_archive'
+ARCHIVE_AFTER_DAYS = 180
+ARCHIVE_BATCH_SIZE = 1000
+# Temporary view over the hot and archived rows, available on historical connections
+HISTORICAL_VIEW = 'all_feedback'
+
+def get_archive_path():
+    """Get the archive database path for the current live database"""
+    base, extension = os.path.splitext(os.path.abspath(database.DATABASE_NAME))
+    return f"{base}{ARCHIVE_SUFFIX}{extension}"
+
+def _zlib_compress(text):
+    """SQL function compressing feedback text for the archive"""
+    if text is None:
+        return None
+    return zlib.compress(str(text).encode('utf-8'))
+
+def _zlib_decompress(blob):
+    """SQL function restoring compressed archive feedback text"""
+    if blob is None:
+        return None
+    return zlib.decompress(blob).decode('utf-8')
+
+def _table_columns(conn, schema, table):
+    """Get the column names and declared types of a table"""
+    return [(row[1], row[2]) for row in conn.execute(f'PRAGMA {schema}.table_info("{table}")').fetchall()]
+
+def _is_attached(conn):
+    """Check whether the archive is attached to a connection"""
+    return ARCHIVE_SCHEMA in [row[1] for row in conn.execute("PRAGMA database_list").fetchall()]
+
+def attach_archive(conn):
+    """Attach the archive database to a connection and keep its schema in step with the hot table
+
+    Creates the archive file when there is none yet; for reads, use attach_archive_readonly.
+    """
+    if not _is_attached(conn):
+        conn.execute("ATTACH DATABASE ? AS archive", (get_archive_path(),))
+
+    conn.create_function('zlib_compress', 1, _zlib_compress, deterministic=True)
+    conn.create_function('zlib_decompress', 1, _zlib_decompress, deterministic=True)
+
+    hot_columns = _table_columns(conn, 'main', 'feedback_submissions')
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {ARCHIVE_SCHEMA}.{ARCHIVE_TABLE} (
+            id INTEGER PRIMARY KEY,
+            archived_at TEXT NOT NULL,
+            feedback_text_compressed INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+
+    # Columns added to the hot table by later migrations are added to the archive too
+    archive_columns = dict(_table_columns(conn, ARCHIVE_SCHEMA, ARCHIVE_TABLE))
+    for name, declared_type in hot_columns:
+        if name not in archive_columns:
+            conn.execute(f'ALTER TABLE {ARCHIVE_SCHEMA}.{ARCHIVE_TABLE} ADD COLUMN "{name}" {declared_type}')
+    conn.execute(f"CREATE INDEX IF NOT EXISTS {ARCHIVE_SCHEMA}.idx_archive_submitted_ts ON {ARCHIVE_TABLE} (submitted_ts)")
+    conn.commit()
+
+    return [name for name, _ in hot_columns]
+
+def attach_archive_readonly(conn):
+    """Attach an existing archive read-only and get its column names
+
+    Returns None, attaching nothing, when no archive has been written yet.
+    """
+    archive_path = get_archive_path()
+    if not os.path.exists(archive_path):
+        return None
+    if not _is_attached(conn):
+        conn.execute("ATTACH DATABASE ? AS archive", (f"file:{pathname2url(archive_path)}?mode=ro",))
+    conn.create_function('zlib_decompress', 1, _zlib_decompress, deterministic=True)
+    return [name for name, _ in _table_columns(conn, ARCHIVE_SCHEMA, ARCHIVE_TABLE)] or None
+
+def create_historical_connection():
+    """Create a connection whose all_feedback view spans hot and archived feedback
+
+    The archive is only read: it is attached read-only, and left out when there is none yet.
+    """
+    conn = create_connection()
+    if not conn:
+        return None
+
+    columns = [name for name, _ in _table_columns(conn, 'main', 'feedback_submissions')]
+    archive_columns = attach_archive_readonly(conn)
+    hot_select = ", ".join(f'"{name}"' for name in columns)
+    query = f"SELECT {hot_select} FROM main.feedback_submissions"
+    if archive_columns:
+        # Columns added to the hot table since the last archival run read as NULL
+        archive_select = ", ".join(
+            'CASE WHEN feedback_text_compressed THEN zlib_decompress(feedback_text) ELSE feedback_text END'
+            if name == 'feedback_text' else f'"{name}"' if name in archive_columns else f'NULL AS "{name}"'
+            for name in columns
+        )
+        query += f" UNION ALL SELECT {archive_select} FROM {ARCHIVE_SCHEMA}.{ARCHIVE_TABLE}"
+    conn.execute(f"DROP VIEW IF EXISTS temp.{HISTORICAL_VIEW}")
+    conn.execute(f"CREATE TEMP VIEW {HISTORICAL_VIEW} AS {query}")
+    return conn
+
+@timed()
+def archive_resolved_feedback(older_than_days=ARCHIVE_AFTER_DAYS, compress=False, batch_size=ARCHIVE_BATCH_SIZE):
+    """Move resolved and closed feedback older than older_than_days into the archive
+
+    Rows are moved in batches, each in its own transaction, so submissions are
+    only blocked for the duration of one batch. Returns the number of rows moved.
+    """
+    conn = create_connection()
+    if not conn:
+        return 0
+
+    try:
+        columns = attach_archive(conn)
+        column_list = ", ".join(f'"{name}"' for name in columns)
+        select_list = ", ".join(
+            'zlib_compress(feedback_text)' if (compress and name == 'feedback_text') else f'"{name}"'
+            for name in columns
+        )
+        status_placeholders = ", ".join("?" for _ in RESOLVED_STATUSES)
+        # submitted_ts holds local wall-clock time read as UTC
+        cutoff = calendar.timegm(time.localtime()) - older_than_days * 86400
+        archived_at = time.strftime('%Y-%m-%d %H:%M:%S')
+
+        moved = 0
+        while True:
+            cursor = conn.cursor()
+            # Pick the batch under the write lock, so a row reopened after selection cannot be moved
+            cursor.execute("BEGIN IMMEDIATE")
+            try:
+                cursor.execute(f"""
+                    SELECT id FROM feedback_submissions
+                    WHERE status IN ({status_placeholders}) AND submitted_ts < ?
+                    ORDER BY id LIMIT ?
+                """, (*RESOLVED_STATUSES, cutoff, batch_size))
+                ids = [row[0] for row in cursor.fetchall()]
+                if not ids:
+                    conn.rollback()
+                    break
+
+                id_placeholders = ", ".join("?" for _ in ids)
+                cursor.execute(f"""
+                    INSERT OR REPLACE INTO {ARCHIVE_SCHEMA}.{ARCHIVE_TABLE}
+                        ({column_list}, archived_at, feedback_text_compressed)
+                    SELECT {select_list}, ?, ?
+                    FROM main.feedback_submissions WHERE id IN ({id_placeholders})
+                """, (archived_at, 1 if compress else 0, *ids))
+                cursor.execute(f"DELETE FROM main.feedback_submissions WHERE id IN ({id_placeholders})", ids)
+                conn.commit()
+            except sqlite3.Error:
+                conn.rollback()
+                raise
+            moved += len(ids)
+
+        return moved
+    except sqlite3.Error as e:
+        print(f"Error archiving feedback: {e}")
+        return 0
+    finally:
+        conn.close()
+
+def get_archive_stats():
+    """Get the number of archived rows and the archive file size"""
+    archive_path = get_archive_path()
+    if not os.path.exists(archive_path):
+        return {'archived_rows': 0, 'archive_size_bytes': 0}
+
+    conn = create_connection()
+    if not conn:
+        return {'archived_rows': 0, 'archive_size_bytes': 0}
+
+    try:
+        archived_rows = 0
+        if attach_archive_readonly(conn):
+            archived_rows = conn.execute(f"SELECT COUNT(*) FROM {ARCHIVE_SCHEMA}.{ARCHIVE_TABLE}").fetchone()[0]
+        return {
+            'archived_rows': archived_rows,
+            'archive_size_bytes': os.path.getsize(archive_path)
+        }
+    except sqlite3.Error as e:
+        print(f"Error getting archive stats: {e}")
+        return {'archived_rows': 0, 'archive_size_bytes': 0}
+    finally:
+        conn.close()
+
+def main():
+    """Command line entry point for the archival job"""
+    parser = argparse.ArgumentParser(description="Move old resolved and closed feedback to the archive database")
+    parser.add_argument('--older-than', type=int, default=ARCHIVE_AFTER_DAYS, help="Minimum age in days")
+    parser.add_argument('--compress', action='store_true', help="Store archived feedback_text zlib-compressed")
+    parser.add_argument('--batch-size', type=int, default=ARCHIVE_BATCH_SIZE, help="Rows moved per transaction")
+    args = parser.parse_args()
+
+    moved = archive_resolved_feedback(args.older_than, args.compress, args.batch_size)
+    print(f"Archived {moved} submissions to {get_archive_path()}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,274 @@
+import argparse
+import gzip
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+from datetime import datetime
+from utils import database
+from utils.database import create_connection
+from utils.metrics import timed
+
+BACKUP_DIR = 'backups'
+BACKUP_PREFIX = 'feedback_backup_'
+BACKUP_TIMESTAMP_FORMAT = '%Y%m%d_%H%M%S_%f'
+# Number of backups kept by rotation
+BACKUP_RETENTION = 7
+# Pages copied per backup step; writers can take the lock between steps
+BACKUP_PAGES = 256
+BACKUP_SLEEP = 0.005
+
+def copy_database(target_path, pages=BACKUP_PAGES, sleep=BACKUP_SLEEP):
+    """Copy the live database to target_path with the online backup API
+
+    Returns a dict with the number of pages copied, the page size and the
+    duration in seconds.
+    """
+    source = create_connection()
+    if not source:
+        raise sqlite3.OperationalError("Could not connect to the database")
+
+    progress = {'pages': 0}
+
+    def record_progress(status, remaining, total):
+        progress['pages'] = total
+
+    started = time.perf_counter()
+    try:
+        target = sqlite3.connect(target_path)
+        try:
+            source.backup(target, pages=pages, progress=record_progress, sleep=sleep)
+            page_size = target.execute("PRAGMA page_size").fetchone()[0]
+        finally:
+            target.close()
+    finally:
+        source.close()
+
+    return {
+        'pages': progress['pages'],
+        'page_size': page_size,
+        'duration': time.perf_counter() - started
+    }
+
+def check_integrity(database_path):
+    """Run PRAGMA integrity_check on a database file and return its messages"""
+    conn = sqlite3.connect(f"file:{os.path.abspath(database_path)}?mode=ro", uri=True)
+    try:
+        return [row[0] for row in conn.execute("PRAGMA integrity_check").fetchall()]
+    finally:
+        conn.close()
+
+def _compress_file(source_path, target_path):
+    """Gzip a file in fixed-size blocks"""
+    with open(source_path, 'rb') as source, gzip.open(target_path, 'wb') as target:
+        shutil.copyfileobj(source, target)
+
+def _decompress_to_temp(backup_path):
+    """Decompress a gzipped backup to a temporary file and return its path"""
+    fd, temp_path = tempfile.mkstemp(prefix='feedback_restore_', suffix='.db')
+    with os.fdopen(fd, 'wb') as target, gzip.open(backup_path, 'rb') as source:
+        shutil.copyfileobj(source, target)
+    return temp_path
+
+def _backup_timestamp(file_name):
+    """Parse the creation time out of a backup file name"""
+    stamp = file_name[len(BACKUP_PREFIX):].split('.')[0]
+    return datetime.strptime(stamp, BACKUP_TIMESTAMP_FORMAT)
+
+def list_backups(directory=BACKUP_DIR):
+    """List backups in a directory, newest first"""
+    if not os.path.isdir(directory):
+        return []
+
+    backups = []
+    for file_name in os.listdir(directory):
+        if not file_name.startswith(BACKUP_PREFIX) or file_name.endswith('.partial'):
+            continue
+        try:
+            created_at = _backup_timestamp(file_name)
+        except ValueError:
+            continue
+        path = os.path.join(directory, file_name)
+        backups.append({
+            'name': file_name,
+            'path': path,
+            'created_at': created_at,
+            'size_bytes': os.path.getsize(path),
+            'compressed': file_name.endswith('.gz')
+        })
+
+    return sorted(backups, key=lambda backup: backup['created_at'], reverse=True)
+
+def rotate_backups(keep=BACKUP_RETENTION, directory=BACKUP_DIR):
+    """Delete all but the newest `keep` backups and return the removed paths"""
+    removed = []
+    for backup in list_backups(directory)[keep:]:
+        os.remove(backup['path'])
+        removed.append(backup['path'])
+    return removed
+
+@timed()
+def create_backup(compress=True, directory=BACKUP_DIR, keep=BACKUP_RETENTION,
+                  pages=BACKUP_PAGES, sleep=BACKUP_SLEEP):
+    """Create a verified, optionally compressed backup of the live database
+
+    Old backups beyond the newest `keep` are rotated out unless keep is None.
+    Returns a dict describing the backup, including its path, size, integrity
+    check result, duration and throughput in bytes per second.
+    """
+    os.makedirs(directory, exist_ok=True)
+    timestamp = datetime.now().strftime(BACKUP_TIMESTAMP_FORMAT)
+    final_path = os.path.join(directory, f"{BACKUP_PREFIX}{timestamp}.db" + (".gz" if compress else ""))
+    partial_path = os.path.join(directory, f"{BACKUP_PREFIX}{timestamp}.db.partial")
+
+    started = time.perf_counter()
+    try:
+        copy_stats = copy_database(partial_path, pages, sleep)
+        integrity = check_integrity(partial_path)
+        if integrity != ['ok']:
+            raise sqlite3.DatabaseError(f"Backup failed integrity check: {integrity[:5]}")
+
+        if compress:
+            _compress_file(partial_path, f"{final_path}.partial")
+            os.remove(partial_path)
+            os.replace(f"{final_path}.partial", final_path)
+        else:
+            os.replace(partial_path, final_path)
+    finally:
+        for leftover in (partial_path, f"{final_path}.partial"):
+            if os.path.exists(leftover):
+                os.remove(leftover)
+
+    duration = time.perf_counter() - started
+    database_bytes = copy_stats['pages'] * copy_stats['page_size']
+
+    return {
+        'path': final_path,
+        'size_bytes': os.path.getsize(final_path),
+        'database_bytes': database_bytes,
+        'pages': copy_stats['pages'],
+        'integrity': 'ok',
+        'copy_duration': copy_stats['duration'],
+        'duration': duration,
+        'throughput_bytes_per_sec': database_bytes / duration if duration > 0 else 0,
+        'rotated': rotate_backups(keep, directory) if keep else []
+    }
+
+def verify_backup(backup_path):
+    """Run an integrity check against a backup file and return its messages"""
+    if backup_path.endswith('.gz'):
+        temp_path = _decompress_to_temp(backup_path)
+        try:
+            return check_integrity(temp_path)
+        finally:
+            os.remove(temp_path)
+    return check_integrity(backup_path)
+
+def find_backup_before(moment, directory=BACKUP_DIR):
+    """Get the newest backup taken at or before moment, or None
+
+    Backups are full snapshots and no change log is replayed on top, so
+    restoring it loses every change made between the backup and moment.
+    """
+    for backup in list_backups(directory):
+        if backup['created_at'] <= moment:
+            return backup
+    return None
+
+@timed()
+def restore_backup(backup_path, pages=BACKUP_PAGES, sleep=BACKUP_SLEEP, safety_backup=True):
+    """Restore the live database from a backup file
+
+    The backup is integrity-checked first, and unless disabled a backup of the
+    current database is taken so the restore itself can be undone. The pages
+    are copied into the live database with the backup API, so open
+    connections see the restored contents on their next transaction. A
+    backup taken before later schema migrations is migrated forward in
+    place. Returns a dict with the safety backup path and the restore duration.
+    """
+    source_path = _decompress_to_temp(backup_path) if backup_path.endswith('.gz') else backup_path
+    try:
+        integrity = check_integrity(source_path)
+        if integrity != ['ok']:
+            raise sqlite3.DatabaseError(f"Backup failed integrity check: {integrity[:5]}")
+
+        # Skip rotation so the backup being restored cannot be rotated out
+        safety_path = create_backup(keep=None)['path'] if safety_backup else None
+
+        started = time.perf_counter()
+        source = sqlite3.connect(f"file:{os.path.abspath(source_path)}?mode=ro", uri=True)
+        target = create_connection()
+        try:
+            source.backup(target, pages=pages, sleep=sleep)
+        finally:
+            target.close()
+            source.close()
+
+        # The restored file may be at an older user_version than this process last migrated
+        database.set_database_path(database.DATABASE_NAME)
+        migrated = create_connection()
+        if migrated:
+            migrated.close()
+
+        return {'safety_backup': safety_path, 'duration': time.perf_counter() - started}
+    finally:
+        if source_path != backup_path:
+            os.remove(source_path)
+
+def main():
+    """Command line entry point for creating, verifying and restoring backups"""
+    parser = argparse.ArgumentParser(description="Online backup and restore of the feedback database")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    create_parser = subparsers.add_parser('create', help="Create a backup")
+    create_parser.add_argument('--no-compress', action='store_true', help="Store the backup uncompressed")
+    create_parser.add_argument('--keep', type=int, default=BACKUP_RETENTION, help="Number of backups to keep")
+    create_parser.add_argument('--dir', default=BACKUP_DIR, help="Backup directory")
+
+    list_parser = subparsers.add_parser('list', help="List backups")
+    list_parser.add_argument('--dir', default=BACKUP_DIR, help="Backup directory")
+
+    verify_parser = subparsers.add_parser('verify', help="Integrity-check a backup")
+    verify_parser.add_argument('path', help="Backup file")
+
+    restore_parser = subparsers.add_parser('restore', help="Restore the database from a backup")
+    restore_parser.add_argument('path', nargs='?', help="Backup file")
+    restore_parser.add_argument('--latest-before', metavar='TIME',
+                                help="Restore the newest backup taken at or before 'YYYY-MM-DD HH:MM:SS'; "
+                                     "changes made after that backup are lost")
+    restore_parser.add_argument('--dir', default=BACKUP_DIR, help="Backup directory")
+
+    args = parser.parse_args()
+
+    if args.command == 'create':
+        result = create_backup(not args.no_compress, args.dir, args.keep)
+        print(f"Backup written to {result['path']} ({result['size_bytes'] / 1024:.1f} KB) in "
+              f"{result['duration']:.2f}s, {result['throughput_bytes_per_sec'] / (1024 * 1024):.1f} MB/s")
+        for path in result['rotated']:
+            print(f"Rotated out {path}")
+
+    elif args.command == 'list':
+        for backup in list_backups(args.dir):
+            print(f"{backup['created_at']}  {backup['size_bytes'] / 1024:10.1f} KB  {backup['path']}")
+
+    elif args.command == 'verify':
+        messages = verify_backup(args.path)
+        print("ok" if messages == ['ok'] else "\n".join(messages))
+
+    elif args.command == 'restore':
+        backup_path = args.path
+        if args.latest_before:
+            backup = find_backup_before(datetime.strptime(args.latest_before, '%Y-%m-%d %H:%M:%S'), args.dir)
+            if backup is None:
+                parser.error(f"No backup found at or before {args.latest_before}")
+            backup_path = backup['path']
+        if not backup_path:
+            parser.error("Give a backup path or --latest-before")
+
+        result = restore_backup(backup_path)
+        print(f"Restored {backup_path} in {result['duration']:.2f}s "
+              f"(previous database saved to {result['safety_backup']})")
+
+if __name__ == '__main__':
+    main()
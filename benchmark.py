@@ -0,0 +1,266 @@
+import argparse
+import csv
+import json
+import math
+import os
+import platform
+import random
+import re
+import statistics
+import tempfile
+import time
+import tracemalloc
+from collections import Counter
+from datetime import datetime, timedelta
+from utils import database
+from utils.database import (
+    set_database_path,
+    create_connection,
+    insert_feedback,
+    get_all_feedback,
+    rebuild_student_sketches
+)
+from utils.advanced_database import search_feedback, get_feedback_analytics
+from utils.text_analysis import TextAnalyzer
+from utils.metrics import metrics_enabled, set_metrics_enabled
+from utils.query_log import get_slow_query_threshold, set_slow_query_threshold
+
+VOCABULARY_FILE = 'RMP_sample_data.csv'
+DEFAULT_SIZES = [10000, 100000, 1000000, 5000000]
+DEFAULT_RESULTS_FILE = 'benchmark_results.json'
+DEFAULT_BASELINE_FILE = 'benchmark_baseline.json'
+# A result is a regression when it is this much slower than the baseline
+REGRESSION_TOLERANCE = 0.20
+# Operations that load every row into pandas are skipped above this size
+MAX_IN_MEMORY_ROWS = 1000000
+INSERT_SAMPLE_CALLS = 1000
+LOAD_BATCH_SIZE = 10000
+
+CATEGORIES = ["Academic Issues", "Administrative Issues", "Facilities", "Student Welfare"]
+PRIORITIES = ["Low", "Medium", "High"]
+STATUSES = ["Pending", "In Progress", "Resolved", "Closed"]
+SEARCH_TERMS = ["exam", "professor", "registration", "library"]
+
+class FeedbackGenerator:
+    """Generate synthetic feedback using the vocabulary of the RMP sample comments"""
+
+    def __init__(self, vocabulary_file=VOCABULARY_FILE, seed=42):
+        self.random = random.Random(seed)
+        word_counts = Counter()
+        with open(vocabulary_file, encoding='utf-8', errors='replace') as handle:
+            for row in csv.DictReader(handle):
+                word_counts.update(re.findall(r"[a-z]+", (row.get('comments') or '').lower()))
+        self.words = list(word_counts.keys())
+        self.weights = list(word_counts.values())
+
+    def text(self, min_words, max_words):
+        """Generate a run of words with the sample's word frequencies"""
+        length = self.random.randint(min_words, max_words)
+        return ' '.join(self.random.choices(self.words, weights=self.weights, k=length))
+
+    def row(self, start_date, span_days):
+        """Generate one feedback_submissions row"""
+        submitted = start_date + timedelta(seconds=self.random.randrange(span_days * 86400))
+        student_number = self.random.randint(1, 50000)
+        return (
+            f"CU{student_number:06d}",
+            f"Student {student_number}",
+            f"student{student_number}@calebuniversity.edu.ng",
+            self.random.choice(CATEGORIES),
+            self.text(3, 8),
+            self.text(15, 80),
+            self.random.choices(PRIORITIES, weights=[5, 3, 2])[0],
+            1 if self.random.random() < 0.3 else 0,
+            submitted.strftime('%Y-%m-%d %H:%M:%S'),
+            self.random.choices(STATUSES, weights=[4, 2, 3, 1])[0]
+        )
+
+    def populate(self, rows, span_days=730):
+        """Bulk-load rows into the current database in batches
+
+        The rows go through the view rather than insert_feedback, so the
+        distinct-student sketches are rebuilt once the load is done.
+        """
+        start_date = datetime.now() - timedelta(days=span_days)
+        conn = create_connection()
+        try:
+            for offset in range(0, rows, LOAD_BATCH_SIZE):
+                batch = [self.row(start_date, span_days) for _ in range(min(LOAD_BATCH_SIZE, rows - offset))]
+                conn.executemany("""
+                    INSERT INTO feedback_submissions (
+                        student_id, student_name, email, category, subject, feedback_text,
+                        priority, is_anonymous, submission_date, status
+                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """, batch)
+                conn.commit()
+        finally:
+            conn.close()
+        rebuild_student_sketches()
+
+def _percentile(values, fraction):
+    """Nearest-rank percentile"""
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+def measure(operation, repeats, items=1):
+    """Time an operation and measure its peak traced memory
+
+    Timings are taken without tracemalloc, which slows allocation-heavy code;
+    a separate traced run records the peak memory.
+    """
+    latencies = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        operation()
+        latencies.append(time.perf_counter() - started)
+
+    tracemalloc.start()
+    operation()
+    _, peak_bytes = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    total = sum(latencies)
+    return {
+        'repeats': repeats,
+        'p50_ms': _percentile(latencies, 0.50) * 1000,
+        'p99_ms': _percentile(latencies, 0.99) * 1000,
+        'mean_ms': statistics.mean(latencies) * 1000,
+        'throughput_per_sec': items * repeats / total if total > 0 else 0,
+        'peak_memory_mb': peak_bytes / (1024 * 1024)
+    }
+
+def measure_inserts(generator, calls):
+    """Time individual insert_feedback calls, each with its own connection and commit"""
+    start_date = datetime.now() - timedelta(days=30)
+    rows = [generator.row(start_date, 30) for _ in range(calls)]
+    latencies = []
+    for row in rows:
+        started = time.perf_counter()
+        insert_feedback(*row[:8])
+        latencies.append(time.perf_counter() - started)
+
+    total = sum(latencies)
+    return {
+        'repeats': calls,
+        'p50_ms': _percentile(latencies, 0.50) * 1000,
+        'p99_ms': _percentile(latencies, 0.99) * 1000,
+        'mean_ms': statistics.mean(latencies) * 1000,
+        'throughput_per_sec': calls / total if total > 0 else 0,
+        'peak_memory_mb': None
+    }
+
+def run_size(size, generator, repeats, work_dir):
+    """Build a database of `size` rows and benchmark every operation against it"""
+    set_database_path(os.path.join(work_dir, f"benchmark_{size}.db"))
+    load_started = time.perf_counter()
+    generator.populate(size)
+    results = {'load_seconds': time.perf_counter() - load_started, 'operations': {}}
+    operations = results['operations']
+
+    operations['insert_feedback'] = measure_inserts(generator, INSERT_SAMPLE_CALLS)
+    operations['search_feedback'] = measure(
+        lambda: [search_feedback(term) for term in SEARCH_TERMS], repeats, items=len(SEARCH_TERMS)
+    )
+
+    if size <= MAX_IN_MEMORY_ROWS:
+        operations['get_all_feedback'] = measure(get_all_feedback, repeats, items=size)
+        operations['get_feedback_analytics'] = measure(get_feedback_analytics, repeats, items=size)
+        feedback_df = get_all_feedback()
+        analyzer = TextAnalyzer()
+        operations['analyze_feedback_data'] = measure(
+            lambda: analyzer.analyze_feedback_data(feedback_df), repeats, items=size
+        )
+        del feedback_df
+    else:
+        for name in ('get_all_feedback', 'get_feedback_analytics', 'analyze_feedback_data'):
+            operations[name] = {'skipped': f"loads every row; above {MAX_IN_MEMORY_ROWS} rows"}
+
+    os.remove(database.DATABASE_NAME)
+    return results
+
+def compare_to_baseline(results, baseline, tolerance=REGRESSION_TOLERANCE):
+    """List operations whose p50 latency regressed beyond tolerance"""
+    regressions = []
+    for size, size_results in results['sizes'].items():
+        baseline_operations = baseline.get('sizes', {}).get(size, {}).get('operations', {})
+        for name, metrics in size_results['operations'].items():
+            previous = baseline_operations.get(name, {})
+            if 'p50_ms' not in metrics or not previous.get('p50_ms'):
+                continue
+            change = metrics['p50_ms'] / previous['p50_ms'] - 1
+            if change > tolerance:
+                regressions.append(
+                    f"{name} @ {size} rows: p50 {previous['p50_ms']:.1f} ms -> {metrics['p50_ms']:.1f} ms "
+                    f"(+{change * 100:.0f}%)"
+                )
+    return regressions
+
+def main():
+    """Command line entry point for the benchmark suite"""
+    parser = argparse.ArgumentParser(description="Benchmark the storage and analytics paths on synthetic data")
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES, help="Row counts to benchmark")
+    parser.add_argument('--repeats', type=int, default=5, help="Timed runs per operation")
+    parser.add_argument('--seed', type=int, default=42, help="Random seed for the generator")
+    parser.add_argument('--output', default=DEFAULT_RESULTS_FILE, help="Results JSON file")
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE_FILE, help="Baseline JSON file to compare against")
+    parser.add_argument('--save-baseline', action='store_true', help="Store these results as the new baseline")
+    parser.add_argument('--check', action='store_true',
+                        help="Fail when there is no baseline to compare against, as well as on regressions")
+    parser.add_argument('--work-dir', default=tempfile.gettempdir(), help="Directory for the benchmark databases")
+    args = parser.parse_args()
+
+    # Baselines are machine-specific, so none ships with the repo; fail before the slow runs
+    if args.check and not args.save_baseline and not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --save-baseline on this machine first.")
+        raise SystemExit(1)
+
+    generator = FeedbackGenerator(seed=args.seed)
+    results = {
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'seed': args.seed,
+        'sizes': {}
+    }
+
+    # Timing every call and logging slow statements would add their own overhead to the measurements
+    collect_metrics = metrics_enabled()
+    slow_query_threshold = get_slow_query_threshold()
+    set_metrics_enabled(False)
+    set_slow_query_threshold(None)
+    try:
+        for size in args.sizes:
+            print(f"Benchmarking {size} rows...")
+            results['sizes'][str(size)] = run_size(size, generator, args.repeats, args.work_dir)
+            for name, metrics in results['sizes'][str(size)]['operations'].items():
+                if 'skipped' in metrics:
+                    print(f"  {name:24s} skipped ({metrics['skipped']})")
+                else:
+                    print(f"  {name:24s} p50 {metrics['p50_ms']:9.2f} ms  p99 {metrics['p99_ms']:9.2f} ms  "
+                          f"{metrics['throughput_per_sec']:12.1f}/s")
+    finally:
+        set_metrics_enabled(collect_metrics)
+        set_slow_query_threshold(slow_query_threshold)
+
+    with open(args.output, 'w') as handle:
+        json.dump(results, handle, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as handle:
+            json.dump(results, handle, indent=2)
+        print(f"Baseline saved to {args.baseline}")
+    elif os.path.exists(args.baseline):
+        with open(args.baseline) as handle:
+            regressions = compare_to_baseline(results, json.load(handle))
+        if regressions:
+            print("Regressions against baseline:")
+            for regression in regressions:
+                print(f"  {regression}")
+            raise SystemExit(1)
+        print("No regressions against baseline.")
+    else:
+        print(f"No baseline at {args.baseline}, nothing compared; run with --save-baseline to create one.")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,341 @@
+import threading
+import time
+from datetime import date, timedelta
+import numpy as np
+import pandas as pd
+from utils import database
+from utils.database import create_connection, get_lookup_values, changes_since, get_latest_change_seq
+from utils.text_analysis import TextAnalyzer, SENTIMENTS
+from utils.metrics import timed
+
+SECONDS_PER_DAY = 86400
+# Axes of the count array, in order
+DIMENSIONS = ('day', 'category', 'status', 'priority', 'sentiment')
+BUILD_CHUNK_ROWS = 5000
+CHANGE_BATCH_SIZE = 1000
+EPOCH = date(1970, 1, 1)
+
+def _to_day(day):
+    """Convert a date to days since the epoch, the unit of the day axis"""
+    return (day - EPOCH).days
+
+class FeedbackCube:
+    """Submission counts over day x category x status x priority x sentiment
+
+    The cube is built once from a scan of feedback_submissions, classifying
+    each text's sentiment, and then kept current from the change log: inserts
+    add a cell, status updates move one and deletes remove one. Any
+    combination of filters and roll-ups is then a slice and a sum over a
+    small NumPy array, with no query and no DataFrame filter.
+
+    Category and priority changes are not in the change log; an item keeps
+    the cell it had when it was inserted until the cube is rebuilt.
+    """
+
+    def __init__(self):
+        self.counts = np.zeros((0, 0, 0, 0, len(SENTIMENTS)), dtype=np.int32)
+        self.first_day = 0
+        self.labels = {'category': [], 'status': [], 'priority': [], 'sentiment': list(SENTIMENTS)}
+        self.seq = 0
+        self.database_name = None
+        self.built_at = None
+        # Day and sentiment of every counted row, ordered by id, so updates and deletes find their cell
+        self._ids = np.zeros(0, dtype=np.int64)
+        self._days = np.zeros(0, dtype=np.int32)
+        self._sentiments = np.zeros(0, dtype=np.int8)
+        self._analyzer = None
+
+    def _position(self, dimension, name):
+        """Axis position of a label, growing the axis for labels not seen before"""
+        labels = self.labels[dimension]
+        if name not in labels:
+            labels.append(name)
+            axis = DIMENSIONS.index(dimension)
+            padding = [(0, 0)] * len(DIMENSIONS)
+            padding[axis] = (0, len(labels) - self.counts.shape[axis])
+            self.counts = np.pad(self.counts, padding)
+        return labels.index(name)
+
+    def _day_position(self, day):
+        """Position of a day on the day axis, growing the axis to cover it"""
+        days = self.counts.shape[0]
+        if days == 0:
+            self.first_day = day
+        if day < self.first_day or day >= self.first_day + days:
+            before = max(0, self.first_day - day) if days else 0
+            after = max(0, day - (self.first_day + days) + 1) if days else 1
+            self.counts = np.pad(self.counts, [(before, after)] + [(0, 0)] * (len(DIMENSIONS) - 1))
+            self.first_day -= before
+        return day - self.first_day
+
+    def _cell(self, day, category, status, priority, sentiment):
+        return (self._day_position(day), self._position('category', category), self._position('status', status),
+                self._position('priority', priority), sentiment)
+
+    @timed()
+    def build(self):
+        """Count every submission, classifying sentiment in chunks of BUILD_CHUNK_ROWS texts"""
+        self._analyzer = self._analyzer or TextAnalyzer()
+        conn = create_connection()
+        if not conn:
+            return self
+
+        try:
+            lookup_values = get_lookup_values(conn)
+            for dimension in ('category', 'status', 'priority'):
+                self.labels[dimension] = list(lookup_values[dimension])
+            self.counts = np.zeros((0,) + tuple(len(self.labels[dimension]) for dimension in DIMENSIONS[1:]),
+                                   dtype=np.int32)
+
+            cursor = conn.cursor()
+            # One read transaction, so the rows and the change log position agree
+            cursor.execute("BEGIN")
+            cursor.execute("SELECT COALESCE(MAX(seq), 0) FROM feedback_changes")
+            seq = cursor.fetchone()[0]
+            cursor.execute(f"""
+                SELECT id, submitted_ts / {SECONDS_PER_DAY}, category, status, priority, feedback_text
+                FROM feedback_submissions
+                WHERE submitted_ts IS NOT NULL
+                ORDER BY id
+            """)
+            ids, cells = [], []
+            while True:
+                rows = cursor.fetchmany(BUILD_CHUNK_ROWS)
+                if not rows:
+                    break
+                for feedback_id, day, category, status, priority, text in rows:
+                    sentiment = SENTIMENTS.index(self._analyzer.classify_sentiment(text))
+                    ids.append(feedback_id)
+                    cells.append((day, self._position('category', category), self._position('status', status),
+                                  self._position('priority', priority), sentiment))
+            conn.commit()
+        finally:
+            conn.close()
+
+        cells = np.array(cells, dtype=np.int64).reshape(-1, len(DIMENSIONS))
+        self.first_day = int(cells[:, 0].min()) if len(cells) else _to_day(date.today())
+        days = int(cells[:, 0].max()) - self.first_day + 1 if len(cells) else 1
+        cells[:, 0] -= self.first_day
+        shape = (days,) + tuple(len(self.labels[dimension]) for dimension in DIMENSIONS[1:])
+        flat = np.ravel_multi_index(cells.T, shape) if len(cells) else np.zeros(0, dtype=np.int64)
+        self.counts = np.bincount(flat, minlength=int(np.prod(shape))).astype(np.int32).reshape(shape)
+
+        self._ids = np.array(ids, dtype=np.int64)
+        self._days = (cells[:, 0] + self.first_day).astype(np.int32)
+        self._sentiments = cells[:, 4].astype(np.int8)
+        self.seq = seq
+        self.database_name = database.DATABASE_NAME
+        self.built_at = time.time()
+        return self
+
+    def _row_index(self, feedback_id):
+        """Index of a counted row in the per-row arrays, or None"""
+        index = np.searchsorted(self._ids, feedback_id)
+        if index < len(self._ids) and self._ids[index] == feedback_id and self._sentiments[index] >= 0:
+            return index
+        return None
+
+    def _fetch_new_rows(self, feedback_ids):
+        """Get the day and sentiment of newly inserted rows that still exist"""
+        if not feedback_ids:
+            return {}
+        conn = create_connection()
+        if not conn:
+            return {}
+        try:
+            placeholders = ", ".join("?" for _ in feedback_ids)
+            rows = conn.execute(f"""
+                SELECT id, submitted_ts / {SECONDS_PER_DAY}, feedback_text
+                FROM feedback_submissions
+                WHERE id IN ({placeholders}) AND submitted_ts IS NOT NULL
+            """, feedback_ids).fetchall()
+        finally:
+            conn.close()
+        return {feedback_id: (day, SENTIMENTS.index(self._analyzer.classify_sentiment(text)))
+                for feedback_id, day, text in rows}
+
+    @timed()
+    def refresh(self):
+        """Apply change log entries made since the cube was built or last refreshed
+
+        Rebuilds instead when the log has been pruned past the cube's position
+        or the process has switched databases. Returns the number of entries applied.
+        """
+        if self.database_name != database.DATABASE_NAME:
+            self.build()
+            return 0
+
+        applied = 0
+        while True:
+            changes = changes_since(self.seq, CHANGE_BATCH_SIZE)
+            if changes.empty:
+                if self.seq > get_latest_change_seq():
+                    # The change log was reset underneath us
+                    self.build()
+                return applied
+            if changes['seq'].iloc[0] != self.seq + 1:
+                self.build()
+                return applied
+
+            # Missing names come back from pandas as NaN; the cube labels them None
+            changes = changes.astype(object).where(changes.notna(), None)
+            inserted = changes.loc[changes['change_type'] == 'insert', 'feedback_id'].tolist()
+            new_rows = self._fetch_new_rows([int(feedback_id) for feedback_id in inserted])
+            appended_ids, appended_days, appended_sentiments = [], [], []
+            for change in changes.itertuples(index=False):
+                if change.change_type == 'insert':
+                    if change.feedback_id not in new_rows:
+                        continue
+                    day, sentiment = new_rows[change.feedback_id]
+                    # The cell is located first because locating it may grow the array
+                    cell = self._cell(day, change.category, change.new_status, change.priority, sentiment)
+                    self.counts[cell] += 1
+                    appended_ids.append(change.feedback_id)
+                    appended_days.append(day)
+                    appended_sentiments.append(sentiment)
+                    continue
+
+                # Rows inserted earlier in this batch are not in the per-row arrays yet
+                if appended_ids:
+                    self._append_rows(appended_ids, appended_days, appended_sentiments)
+                    appended_ids, appended_days, appended_sentiments = [], [], []
+                index = self._row_index(change.feedback_id)
+                if index is None:
+                    continue
+                day, sentiment = int(self._days[index]), int(self._sentiments[index])
+                cell = self._cell(day, change.category, change.old_status, change.priority, sentiment)
+                self.counts[cell] -= 1
+                if change.change_type == 'delete':
+                    # Marked rather than removed, so the arrays stay sorted by id without copying
+                    self._sentiments[index] = -1
+                else:
+                    cell = self._cell(day, change.category, change.new_status, change.priority, sentiment)
+                    self.counts[cell] += 1
+
+            if appended_ids:
+                self._append_rows(appended_ids, appended_days, appended_sentiments)
+            self.seq = int(changes['seq'].iloc[-1])
+            applied += len(changes)
+
+    def _append_rows(self, ids, days, sentiments):
+        self._ids = np.concatenate([self._ids, np.array(ids, dtype=np.int64)])
+        self._days = np.concatenate([self._days, np.array(days, dtype=np.int32)])
+        self._sentiments = np.concatenate([self._sentiments, np.array(sentiments, dtype=np.int8)])
+
+    def _select(self, start_date=None, end_date=None, **filters):
+        """Cut the count array down to a date range and the filtered labels
+
+        Filters are category, status, priority and sentiment, each a name or a
+        list of names. Returns the sub-array and the position of its first day.
+        """
+        unknown = set(filters) - set(DIMENSIONS[1:])
+        if unknown:
+            raise ValueError(f"Unknown cube dimensions: {', '.join(sorted(unknown))}")
+
+        days = self.counts.shape[0]
+        first = 0 if start_date is None else min(days, max(0, _to_day(start_date) - self.first_day))
+        last = days if end_date is None else min(days, max(first, _to_day(end_date) - self.first_day + 1))
+        counts = self.counts[first:last]
+
+        for dimension, value in filters.items():
+            if value is None:
+                continue
+            names = [value] if isinstance(value, str) else list(value)
+            labels = self.labels[dimension]
+            positions = [labels.index(name) for name in names if name in labels]
+            counts = counts.take(positions, axis=DIMENSIONS.index(dimension))
+        return counts, first
+
+    @timed()
+    def total(self, start_date=None, end_date=None, **filters):
+        """Count the submissions matching a date range and filters"""
+        counts, _ = self._select(start_date, end_date, **filters)
+        return int(counts.sum())
+
+    @timed()
+    def slice(self, by=(), start_date=None, end_date=None, **filters):
+        """Counts matching the filters, rolled up to the dimensions in by
+
+        Returns a DataFrame with one column per dimension in by, in that
+        order, plus 'count', leaving out empty combinations. Days are
+        'YYYY-MM-DD' strings. Filters are as for total().
+        """
+        unknown = set(by) - set(DIMENSIONS)
+        if unknown:
+            raise ValueError(f"Unknown cube dimensions: {', '.join(sorted(unknown))}")
+
+        counts, first = self._select(start_date, end_date, **filters)
+        if not by:
+            return pd.DataFrame({'count': [int(counts.sum())]})
+
+        kept = [dimension for dimension in DIMENSIONS if dimension in by]
+        rolled = counts.sum(axis=tuple(axis for axis, dimension in enumerate(DIMENSIONS) if dimension not in by))
+        positions = np.nonzero(rolled)
+
+        columns = {}
+        for dimension, position in zip(kept, positions):
+            if dimension == 'day':
+                days = (position + self.first_day + first).astype('datetime64[D]')
+                columns[dimension] = np.datetime_as_string(days)
+            else:
+                labels = self._selected_labels(dimension, filters.get(dimension))
+                columns[dimension] = [labels[index] for index in position]
+        columns['count'] = rolled[positions]
+        return pd.DataFrame(columns)[list(by) + ['count']]
+
+    def _selected_labels(self, dimension, value):
+        """Labels of a dimension in the order _select left them"""
+        if value is None:
+            return self.labels[dimension]
+        names = [value] if isinstance(value, str) else list(value)
+        return [name for name in names if name in self.labels[dimension]]
+
+    def date_range(self):
+        """First and last day on the day axis as dates, or None when the cube is empty"""
+        if not self.counts.shape[0]:
+            return None
+        return (EPOCH + timedelta(days=self.first_day),
+                EPOCH + timedelta(days=self.first_day + self.counts.shape[0] - 1))
+
+_cube = None
+_cube_lock = threading.Lock()
+_build_thread = None
+
+def _build_in_background():
+    global _cube
+    cube = FeedbackCube().build()
+    with _cube_lock:
+        _cube = cube
+
+@timed()
+def get_feedback_cube(wait=True):
+    """Get the process-wide cube, built on first use and brought up to date from the change log
+
+    The first build classifies every text and takes seconds on large
+    tables. With wait=False it runs on a background thread instead and
+    None is returned until the cube is ready, so pages can fall back to SQL.
+    """
+    global _cube, _build_thread
+    while True:
+        with _cube_lock:
+            if _cube is not None:
+                _cube.refresh()
+                return _cube
+            building = _build_thread is not None and _build_thread.is_alive()
+            if not building and not wait:
+                _build_thread = threading.Thread(target=_build_in_background, name='cube-build', daemon=True)
+                _build_thread.start()
+                return None
+            if not building:
+                _cube = FeedbackCube().build()
+                return _cube
+            if not wait:
+                return None
+            thread = _build_thread
+        thread.join()
+
+def reset_feedback_cube():
+    """Drop the process-wide cube so the next get_feedback_cube() rebuilds it"""
+    global _cube
+    with _cube_lock:
+        _cube = None
@@ -6,9 +6,8 @@ import nltk
 from nltk.corpus import stopwords
 from nltk.tokenize import word_tokenize
 from nltk.stem import WordNetLemmatizer
-import matplotlib.pyplot as plt
-import seaborn as sns
-from wordcloud import WordCloud
+from utils.sampling import DEFAULT_SAMPLE_ROWS, stratified_sample
+from utils.text_analysis import TextAnalyzer
 
 # Download required NLTK data
 try:
@@ -36,6 +35,8 @@ class FeedbackAnalyzer:
         self.df = pd.read_csv(dataset_path)
         self.stop_words = set(stopwords.words('english'))
         self.lemmatizer = WordNetLemmatizer()
+        # Categories, sentiment and sampled estimates use the word lists of the app's own text analysis
+        self.text_analyzer = TextAnalyzer()
         
     def clean_text(self, text):
         """Clean and preprocess text data"""
@@ -73,52 +74,48 @@ class FeedbackAnalyzer:
     
     def categorize_feedback(self):
         """Categorize feedback into predefined categories"""
-        categories = {
-            'Academic Issues': ['grade', 'grading', 'exam', 'test', 'assignment', 'homework', 'difficult', 'hard', 'easy', 'content', 'material', 'lecture', 'teaching', 'explain', 'understand'],
-            'Administrative Issues': ['registration', 'enroll', 'schedule', 'office', 'hour', 'response', 'email', 'communication', 'policy', 'requirement'],
-            'Facilities': ['classroom', 'room', 'building', 'equipment', 'technology', 'computer', 'projector', 'space', 'environment'],
-            'Student Welfare': ['help', 'support', 'care', 'concern', 'stress', 'mental', 'health', 'safety', 'harassment', 'discrimination']
-        }
-        
-        # Initialize category counts
-        category_counts = {cat: 0 for cat in categories.keys()}
-        
-        # Analyze each comment
-        for comment in self.df['comments'].dropna():
-            cleaned_comment = self.clean_text(comment)
-            comment_words = cleaned_comment.split()
-            
-            for category, keywords in categories.items():
-                if any(keyword in comment_words for keyword in keywords):
-                    category_counts[category] += 1
-        
-        return category_counts
+        return self.text_analyzer.categorize_feedback(self.df['comments'])
     
     def sentiment_analysis_simple(self):
         """Simple sentiment analysis based on positive/negative words"""
-        positive_words = ['good', 'great', 'excellent', 'amazing', 'awesome', 'love', 'best', 'fantastic', 'wonderful', 'helpful', 'easy', 'clear', 'interesting', 'fun', 'recommend']
-        negative_words = ['bad', 'terrible', 'awful', 'hate', 'worst', 'boring', 'difficult', 'hard', 'confusing', 'unclear', 'unhelpful', 'rude', 'unfair', 'poor']
-        
-        sentiments = []
-        
-        for comment in self.df['comments'].dropna():
-            cleaned_comment = self.clean_text(comment)
-            words = cleaned_comment.split()
-            
-            positive_count = sum(1 for word in words if word in positive_words)
-            negative_count = sum(1 for word in words if word in negative_words)
-            
-            if positive_count > negative_count:
-                sentiments.append('Positive')
-            elif negative_count > positive_count:
-                sentiments.append('Negative')
-            else:
-                sentiments.append('Neutral')
-        
-        return Counter(sentiments)
+        return self.text_analyzer.sentiment_analysis_simple(self.df['comments'].dropna())
+    
+    def estimate_text_insights(self, sample_size=DEFAULT_SAMPLE_ROWS, strata=None, seed=None, top_n=20):
+        """Estimate themes, categories and sentiment from a stratified sample of the comments
+        
+        strata lists the columns to stratify by; the whole dataset is one
+        stratum when not given. Reviews without a comment are left out, as
+        the exact analysis leaves them out. Counts are scaled up to the full
+        dataset and 'confidence_intervals' holds a 95% (low, high) interval
+        for each.
+        """
+        commented = self.df[self.df['comments'].notna()]
+        sample, population_sizes = stratified_sample(commented, sample_size, strata, seed)
+        estimates = self.text_analyzer.analyze_text_sample(
+            zip(sample['stratum'], sample['comments']), population_sizes, top_n=top_n
+        )
+        intervals = estimates['confidence_intervals']
+        
+        return {
+            'top_themes': estimates['themes'],
+            'category_distribution': estimates['categories'],
+            'sentiment_distribution': estimates['sentiment'],
+            'confidence_intervals': {
+                'top_themes': intervals['themes'],
+                'category_distribution': intervals['categories'],
+                'sentiment_distribution': intervals['sentiment']
+            },
+            'sample_size': estimates['sample_size']
+        }
     
-    def generate_insights(self):
-        """Generate comprehensive insights from the data"""
+    def generate_insights(self, approximate=False, sample_size=DEFAULT_SAMPLE_ROWS, strata=None, seed=None):
+        """Generate comprehensive insights from the data
+        
+        With approximate=True the themes, categories and sentiment are
+        estimated from a stratified sample (see estimate_text_insights)
+        instead of every comment; the statistics and rating distribution
+        stay exact.
+        """
         insights = {}
         
         # Basic statistics
@@ -126,14 +123,18 @@ class FeedbackAnalyzer:
         insights['avg_rating'] = self.df['star_rating'].mean()
         insights['avg_difficulty'] = self.df['diff_index'].mean()
         
-        # Theme analysis
-        insights['top_themes'] = self.extract_themes()
-        
-        # Category analysis
-        insights['category_distribution'] = self.categorize_feedback()
-        
-        # Sentiment analysis
-        insights['sentiment_distribution'] = self.sentiment_analysis_simple()
+        if approximate:
+            # Themes, categories and sentiment from a sample
+            insights.update(self.estimate_text_insights(sample_size, strata, seed))
+        else:
+            # Theme analysis
+            insights['top_themes'] = self.extract_themes()
+            
+            # Category analysis
+            insights['category_distribution'] = self.categorize_feedback()
+            
+            # Sentiment analysis
+            insights['sentiment_distribution'] = self.sentiment_analysis_simple()
         
         # Rating distribution
         insights['rating_distribution'] = self.df['star_rating'].value_counts().to_dict()
@@ -0,0 +1,135 @@
+import argparse
+import csv
+import gzip
+import io
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
+from datetime import datetime
+from utils.database import create_connection
+from utils.metrics import timed
+
+EXPORT_FORMATS = ['csv', 'ndjson']
+EXPORT_CHUNK_SIZE = 5000
+EXPORT_MIME_TYPES = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+    'gzip': 'application/gzip'
+}
+
+def export_filename(prefix, fmt='csv', compress=False):
+    """Build a timestamped file name for an export"""
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    extension = f".{fmt}.gz" if compress else f".{fmt}"
+    return f"{prefix}_{timestamp}{extension}"
+
+def export_mime_type(fmt='csv', compress=False):
+    """Get the MIME type for an export"""
+    return EXPORT_MIME_TYPES['gzip'] if compress else EXPORT_MIME_TYPES[fmt]
+
+def iter_query_chunks(conn, query, params=(), chunk_size=EXPORT_CHUNK_SIZE):
+    """Yield the column names followed by chunks of rows read from a cursor"""
+    cursor = conn.cursor()
+    cursor.execute(query, params)
+    yield [column[0] for column in cursor.description]
+
+    while True:
+        rows = cursor.fetchmany(chunk_size)
+        if not rows:
+            break
+        yield rows
+
+def _write_csv(handle, columns, row_chunks):
+    """Write row chunks as CSV"""
+    writer = csv.writer(handle)
+    writer.writerow(columns)
+    row_count = 0
+    for rows in row_chunks:
+        writer.writerows(rows)
+        row_count += len(rows)
+    return row_count
+
+def _write_ndjson(handle, columns, row_chunks):
+    """Write row chunks as newline-delimited JSON"""
+    row_count = 0
+    for rows in row_chunks:
+        handle.writelines(json.dumps(dict(zip(columns, row)), default=str) + '\n' for row in rows)
+        row_count += len(rows)
+    return row_count
+
+def _open_output(output_path, compress):
+    """Open an export file for text writing, gzip-compressed if requested"""
+    if compress:
+        return io.TextIOWrapper(gzip.open(output_path, 'wb'), encoding='utf-8', newline='')
+    return open(output_path, 'w', encoding='utf-8', newline='')
+
+def export_rows(columns, row_chunks, fmt='csv', compress=False, output_path=None):
+    """Write chunks of rows to an export file and return (path, row_count)
+
+    When no output path is given the export is written to a temporary file,
+    which the caller is responsible for removing.
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unsupported export format: {fmt}")
+
+    if output_path is None:
+        suffix = f".{fmt}.gz" if compress else f".{fmt}"
+        fd, output_path = tempfile.mkstemp(prefix='feedback_export_', suffix=suffix)
+        os.close(fd)
+
+    writer = _write_csv if fmt == 'csv' else _write_ndjson
+    with _open_output(output_path, compress) as handle:
+        row_count = writer(handle, columns, row_chunks)
+
+    return output_path, row_count
+
+@timed()
+def export_query(query, params=(), fmt='csv', compress=False, output_path=None, chunk_size=EXPORT_CHUNK_SIZE):
+    """Stream the results of a query to an export file and return (path, row_count)
+
+    Raises sqlite3.Error when the database cannot be opened or the query fails.
+    """
+    conn = create_connection()
+    if not conn:
+        raise sqlite3.OperationalError("Could not open the feedback database")
+
+    try:
+        chunks = iter_query_chunks(conn, query, params, chunk_size)
+        columns = next(chunks)
+        return export_rows(columns, chunks, fmt, compress, output_path)
+    finally:
+        conn.close()
+
+def export_feedback(fmt='csv', compress=False, output_path=None, chunk_size=EXPORT_CHUNK_SIZE):
+    """Stream every feedback submission to an export file and return (path, row_count)"""
+    return export_query("SELECT * FROM feedback_submissions ORDER BY id", (),
+                        fmt, compress, output_path, chunk_size)
+
+def main():
+    """Command line entry point for scheduled dumps"""
+    parser = argparse.ArgumentParser(description="Export feedback submissions in bounded memory")
+    parser.add_argument('--format', choices=EXPORT_FORMATS, default='csv', help="Output format")
+    parser.add_argument('--gzip', action='store_true', help="Compress the output with gzip")
+    parser.add_argument('--output', help="Output file or directory (defaults to the current directory)")
+    parser.add_argument('--query', help="Custom SELECT to export instead of the full feedback table")
+    parser.add_argument('--chunk-size', type=int, default=EXPORT_CHUNK_SIZE, help="Rows fetched per chunk")
+    args = parser.parse_args()
+
+    output_path = args.output or '.'
+    if os.path.isdir(output_path):
+        output_path = os.path.join(output_path, export_filename('feedback_export', args.format, args.gzip))
+
+    # Write next to the target first so readers never see a partial dump
+    partial_path = f"{output_path}.partial"
+    if args.query:
+        _, row_count = export_query(args.query, (), args.format, args.gzip, partial_path, args.chunk_size)
+    else:
+        _, row_count = export_feedback(args.format, args.gzip, partial_path, args.chunk_size)
+    shutil.move(partial_path, output_path)
+
+    print(f"Exported {row_count} rows to {output_path}")
+
+if __name__ == '__main__':
+    main()
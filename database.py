@@ -1,78 +1,666 @@
+import calendar
 import sqlite3
 import pandas as pd
 from datetime import datetime
+from utils.metrics import timed
+from utils.query_log import LoggedConnection
+from utils.hll import HyperLogLog
 
 DATABASE_NAME = 'feedback_system.db'
+RESOLVED_STATUSES = ('Resolved', 'Closed')
+# Head start each priority gets in the triage queue: a High item ranks level with
+# a Low item submitted three days earlier
+PRIORITY_BOOST_SECONDS = {'High': 3 * 86400, 'Medium': 86400, 'Low': 0}
 
+# feedback_submissions is a view over this table, which stores category, status
+# and priority as small integer keys into the lookup tables
+SUBMISSIONS_TABLE = 'feedback_submissions_base'
+LOOKUP_TABLES = {
+    'category': 'feedback_categories',
+    'status': 'feedback_statuses',
+    'priority': 'feedback_priorities'
+}
+# Seeded lookup values; priorities are listed lowest rank first
+CATEGORIES = ['Academic Issues', 'Administrative Issues', 'Facilities', 'Student Welfare']
+STATUSES = ['Pending', 'In Progress', 'Resolved', 'Closed']
+PRIORITIES = ['Low', 'Medium', 'High']
+PENDING_STATUS_ID = 1
+
+# Set once the schema has been created and migrated in this process
+_schema_initialized = False
+
+def set_database_path(path):
+    """Point this process at a different database file, e.g. for benchmarks and load tests"""
+    global DATABASE_NAME, _schema_initialized
+    DATABASE_NAME = path
+    _schema_initialized = False
+
+@timed()
 def create_connection():
     """Create a database connection to the SQLite database"""
+    global _schema_initialized
     conn = None
     try:
-        conn = sqlite3.connect(DATABASE_NAME)
+        conn = sqlite3.connect(DATABASE_NAME, factory=LoggedConnection)
+        if not _schema_initialized:
+            initialize_schema(conn)
+            _schema_initialized = True
         return conn
     except sqlite3.Error as e:
         print(e)
     return conn
 
+def _migrate_submitted_ts(cursor):
+    """Store the submission time as sortable integer seconds"""
+    # submission_date holds local wall-clock time, so submitted_ts is that time
+    # read as UTC; date(submitted_ts, 'unixepoch') gives back the local date
+    cursor.execute("ALTER TABLE feedback_submissions ADD COLUMN submitted_ts INTEGER")
+    cursor.execute("UPDATE feedback_submissions SET submitted_ts = CAST(strftime('%s', submission_date) AS INTEGER)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_feedback_submitted_ts ON feedback_submissions (submitted_ts)")
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_feedback_submitted_ts
+        AFTER INSERT ON feedback_submissions
+        WHEN NEW.submitted_ts IS NULL
+        BEGIN
+            UPDATE feedback_submissions
+            SET submitted_ts = CAST(strftime('%s', NEW.submission_date) AS INTEGER)
+            WHERE id = NEW.id;
+        END
+    """)
+
+def _migrate_change_log(cursor):
+    """Record inserts and status/notes updates in a trigger-fed change log"""
+    # AUTOINCREMENT guarantees seq never goes backwards, even after pruning
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS feedback_changes (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            feedback_id INTEGER NOT NULL,
+            change_type TEXT NOT NULL,
+            old_status TEXT,
+            new_status TEXT,
+            category TEXT,
+            priority TEXT,
+            changed_at TEXT NOT NULL DEFAULT (datetime('now', 'localtime'))
+        )
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_feedback_changes_insert
+        AFTER INSERT ON feedback_submissions
+        BEGIN
+            INSERT INTO feedback_changes (feedback_id, change_type, new_status, category, priority)
+            VALUES (NEW.id, 'insert', NEW.status, NEW.category, NEW.priority);
+        END
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_feedback_changes_update
+        AFTER UPDATE OF status, admin_notes ON feedback_submissions
+        WHEN OLD.status IS NOT NEW.status OR OLD.admin_notes IS NOT NEW.admin_notes
+        BEGIN
+            INSERT INTO feedback_changes (feedback_id, change_type, old_status, new_status, category, priority)
+            VALUES (NEW.id, 'update', OLD.status, NEW.status, NEW.category, NEW.priority);
+        END
+    """)
+
+def _migrate_status_transitions(cursor):
+    """Track status transitions and first-response/resolution times"""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS feedback_status_transitions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            feedback_id INTEGER NOT NULL,
+            from_status TEXT,
+            to_status TEXT NOT NULL,
+            admin_notes TEXT,
+            changed_at TEXT NOT NULL,
+            changed_ts INTEGER NOT NULL
+        )
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_transitions_feedback ON feedback_status_transitions (feedback_id, changed_ts)")
+
+    # Times are in submitted_ts units; the *_seconds columns are kept alongside
+    # so SLA percentiles can be read in order straight from an index
+    for column in ('first_response_at', 'first_response_seconds', 'resolved_at', 'resolution_seconds'):
+        cursor.execute(f"ALTER TABLE feedback_submissions ADD COLUMN {column} INTEGER")
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_feedback_resolution
+        ON feedback_submissions (category, priority, resolution_seconds)
+        WHERE resolution_seconds IS NOT NULL
+    """)
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_feedback_first_response
+        ON feedback_submissions (category, priority, first_response_seconds)
+        WHERE first_response_seconds IS NOT NULL
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_feedback_status_ts ON feedback_submissions (status, submitted_ts)")
+
+def _migrate_row_version(cursor):
+    """Add a row version used for compare-and-swap updates"""
+    cursor.execute("ALTER TABLE feedback_submissions ADD COLUMN version INTEGER NOT NULL DEFAULT 0")
+
+def _triage_key_sql(priority, submitted_ts):
+    """SQL expression ordering pending items by priority boost plus age"""
+    boosts = " ".join(f"WHEN '{name}' THEN {seconds}" for name, seconds in PRIORITY_BOOST_SECONDS.items())
+    return f"({submitted_ts}) - (CASE {priority} {boosts} ELSE 0 END)"
+
+def _migrate_triage_key(cursor):
+    """Add an index-ordered triage key for the pending work queue"""
+    # score = boost + (now - submitted_ts), so ordering by submitted_ts - boost ranks
+    # items the same at any moment and the key never needs recomputing as items age
+    cursor.execute("ALTER TABLE feedback_submissions ADD COLUMN triage_key INTEGER")
+    cursor.execute(f"UPDATE feedback_submissions SET triage_key = {_triage_key_sql('priority', 'submitted_ts')}")
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_feedback_triage
+        ON feedback_submissions (triage_key)
+        WHERE status = 'Pending'
+    """)
+    new_submitted_ts = "COALESCE(NEW.submitted_ts, CAST(strftime('%s', NEW.submission_date) AS INTEGER))"
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_feedback_triage_insert
+        AFTER INSERT ON feedback_submissions
+        WHEN NEW.triage_key IS NULL
+        BEGIN
+            UPDATE feedback_submissions
+            SET triage_key = {_triage_key_sql('NEW.priority', new_submitted_ts)}
+            WHERE id = NEW.id;
+        END
+    """)
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_feedback_triage_update
+        AFTER UPDATE OF priority, submitted_ts ON feedback_submissions
+        BEGIN
+            UPDATE feedback_submissions
+            SET triage_key = {_triage_key_sql('NEW.priority', new_submitted_ts)}
+            WHERE id = NEW.id;
+        END
+    """)
+
+def _migrate_student_stats(cursor):
+    """Index submissions by student and keep per-student counters"""
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_feedback_student ON feedback_submissions (student_id, submitted_ts)")
+    # Anonymous submissions are counted separately and never linked back in lookups
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS student_submission_stats (
+            student_id TEXT PRIMARY KEY,
+            named_count INTEGER NOT NULL DEFAULT 0,
+            anonymous_count INTEGER NOT NULL DEFAULT 0,
+            first_submitted_ts INTEGER,
+            last_submitted_ts INTEGER
+        )
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_student_stats_named ON student_submission_stats (named_count)")
+    cursor.execute("""
+        INSERT OR REPLACE INTO student_submission_stats
+            (student_id, named_count, anonymous_count, first_submitted_ts, last_submitted_ts)
+        SELECT student_id,
+               SUM(CASE WHEN is_anonymous THEN 0 ELSE 1 END),
+               SUM(CASE WHEN is_anonymous THEN 1 ELSE 0 END),
+               MIN(submitted_ts), MAX(submitted_ts)
+        FROM feedback_submissions
+        GROUP BY student_id
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_student_stats_insert
+        AFTER INSERT ON feedback_submissions
+        BEGIN
+            INSERT INTO student_submission_stats
+                (student_id, named_count, anonymous_count, first_submitted_ts, last_submitted_ts)
+            VALUES (
+                NEW.student_id,
+                CASE WHEN NEW.is_anonymous THEN 0 ELSE 1 END,
+                CASE WHEN NEW.is_anonymous THEN 1 ELSE 0 END,
+                COALESCE(NEW.submitted_ts, CAST(strftime('%s', NEW.submission_date) AS INTEGER)),
+                COALESCE(NEW.submitted_ts, CAST(strftime('%s', NEW.submission_date) AS INTEGER))
+            )
+            ON CONFLICT (student_id) DO UPDATE SET
+                named_count = named_count + excluded.named_count,
+                anonymous_count = anonymous_count + excluded.anonymous_count,
+                first_submitted_ts = MIN(first_submitted_ts, excluded.first_submitted_ts),
+                last_submitted_ts = MAX(last_submitted_ts, excluded.last_submitted_ts);
+        END
+    """)
+
+def _migrate_lookup_tables(cursor):
+    """Store category, status and priority as integer keys into lookup tables
+
+    The rows move to feedback_submissions_base and feedback_submissions becomes
+    a view joining the names back in. INSTEAD OF triggers on the view keep
+    existing inserts, updates and deletes working; names not yet in a lookup
+    table are added on first use.
+    """
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS feedback_categories (
+            id INTEGER PRIMARY KEY,
+            name TEXT NOT NULL UNIQUE
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS feedback_statuses (
+            id INTEGER PRIMARY KEY,
+            name TEXT NOT NULL UNIQUE,
+            is_resolved INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+    # Unknown priorities rank with Low, as the old CASE-based priority score did
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS feedback_priorities (
+            id INTEGER PRIMARY KEY,
+            name TEXT NOT NULL UNIQUE,
+            priority_rank INTEGER NOT NULL DEFAULT 1,
+            boost_seconds INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+    cursor.executemany("INSERT OR IGNORE INTO feedback_categories (id, name) VALUES (?, ?)",
+                       list(enumerate(CATEGORIES, 1)))
+    cursor.executemany("INSERT OR IGNORE INTO feedback_statuses (id, name, is_resolved) VALUES (?, ?, ?)",
+                       [(status_id, name, name in RESOLVED_STATUSES) for status_id, name in enumerate(STATUSES, 1)])
+    cursor.executemany("""
+        INSERT OR IGNORE INTO feedback_priorities (id, name, priority_rank, boost_seconds) VALUES (?, ?, ?, ?)
+    """, [(rank, name, rank, PRIORITY_BOOST_SECONDS.get(name, 0)) for rank, name in enumerate(PRIORITIES, 1)])
+    for column, table in LOOKUP_TABLES.items():
+        cursor.execute(f"""
+            INSERT OR IGNORE INTO {table} (name)
+            SELECT DISTINCT {column} FROM feedback_submissions WHERE {column} IS NOT NULL
+        """)
+
+    cursor.execute(f"""
+        CREATE TABLE {SUBMISSIONS_TABLE} (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            student_id TEXT NOT NULL,
+            student_name TEXT,
+            email TEXT,
+            category_id INTEGER NOT NULL REFERENCES feedback_categories (id),
+            subject TEXT,
+            feedback_text TEXT NOT NULL,
+            priority_id INTEGER REFERENCES feedback_priorities (id),
+            is_anonymous INTEGER,
+            submission_date TEXT NOT NULL,
+            status_id INTEGER REFERENCES feedback_statuses (id),
+            admin_notes TEXT,
+            submitted_ts INTEGER,
+            first_response_at INTEGER,
+            first_response_seconds INTEGER,
+            resolved_at INTEGER,
+            resolution_seconds INTEGER,
+            version INTEGER NOT NULL DEFAULT 0,
+            triage_key INTEGER
+        )
+    """)
+    cursor.execute(f"""
+        INSERT INTO {SUBMISSIONS_TABLE}
+        SELECT f.id, f.student_id, f.student_name, f.email, c.id, f.subject, f.feedback_text, p.id,
+               f.is_anonymous, f.submission_date, s.id, f.admin_notes, f.submitted_ts,
+               f.first_response_at, f.first_response_seconds, f.resolved_at, f.resolution_seconds,
+               f.version, f.triage_key
+        FROM feedback_submissions f
+        JOIN feedback_categories c ON c.name = f.category
+        LEFT JOIN feedback_priorities p ON p.name = f.priority
+        LEFT JOIN feedback_statuses s ON s.name = f.status
+    """)
+    # Carry the AUTOINCREMENT counter over so ids of archived rows are never reused
+    cursor.execute(f"DELETE FROM sqlite_sequence WHERE name = '{SUBMISSIONS_TABLE}'")
+    cursor.execute(f"""
+        INSERT INTO sqlite_sequence (name, seq)
+        SELECT '{SUBMISSIONS_TABLE}', seq FROM sqlite_sequence WHERE name = 'feedback_submissions'
+    """)
+    # Dropping the table drops its indexes and triggers; they are recreated on the integer columns below
+    cursor.execute("DROP TABLE feedback_submissions")
+
+    # LEFT JOINs on primary keys let SQLite skip the lookups a query does not reference
+    cursor.execute(f"""
+        CREATE VIEW feedback_submissions AS
+        SELECT {SUBMISSIONS_TABLE}.id AS id, student_id, student_name, email, c.name AS category, subject,
+               feedback_text, p.name AS priority, is_anonymous, submission_date, s.name AS status, admin_notes,
+               submitted_ts, first_response_at, first_response_seconds, resolved_at, resolution_seconds,
+               version, triage_key
+        FROM {SUBMISSIONS_TABLE}
+        LEFT JOIN feedback_categories c ON c.id = {SUBMISSIONS_TABLE}.category_id
+        LEFT JOIN feedback_priorities p ON p.id = {SUBMISSIONS_TABLE}.priority_id
+        LEFT JOIN feedback_statuses s ON s.id = {SUBMISSIONS_TABLE}.status_id
+    """)
+
+    add_names = "\n".join(
+        f"INSERT OR IGNORE INTO {table} (name) SELECT NEW.{column} WHERE NEW.{column} IS NOT NULL;"
+        for column, table in LOOKUP_TABLES.items()
+    )
+    new_ids = {column: f"(SELECT id FROM {table} WHERE name = NEW.{column})"
+               for column, table in LOOKUP_TABLES.items()}
+    cursor.execute(f"""
+        CREATE TRIGGER trg_feedback_view_insert
+        INSTEAD OF INSERT ON feedback_submissions
+        BEGIN
+            {add_names}
+            INSERT INTO {SUBMISSIONS_TABLE} (
+                id, student_id, student_name, email, category_id, subject, feedback_text, priority_id,
+                is_anonymous, submission_date, status_id, admin_notes, submitted_ts, first_response_at,
+                first_response_seconds, resolved_at, resolution_seconds, version, triage_key
+            ) VALUES (
+                NEW.id, NEW.student_id, NEW.student_name, NEW.email, {new_ids['category']}, NEW.subject,
+                NEW.feedback_text, {new_ids['priority']}, NEW.is_anonymous, NEW.submission_date,
+                {new_ids['status']}, NEW.admin_notes, NEW.submitted_ts, NEW.first_response_at,
+                NEW.first_response_seconds, NEW.resolved_at, NEW.resolution_seconds,
+                COALESCE(NEW.version, 0), NEW.triage_key
+            );
+        END
+    """)
+    cursor.execute(f"""
+        CREATE TRIGGER trg_feedback_view_update
+        INSTEAD OF UPDATE ON feedback_submissions
+        BEGIN
+            {add_names}
+            UPDATE {SUBMISSIONS_TABLE}
+            SET id = NEW.id, student_id = NEW.student_id, student_name = NEW.student_name, email = NEW.email,
+                category_id = {new_ids['category']}, subject = NEW.subject, feedback_text = NEW.feedback_text,
+                priority_id = {new_ids['priority']}, is_anonymous = NEW.is_anonymous,
+                submission_date = NEW.submission_date, status_id = {new_ids['status']},
+                admin_notes = NEW.admin_notes, submitted_ts = NEW.submitted_ts,
+                first_response_at = NEW.first_response_at, first_response_seconds = NEW.first_response_seconds,
+                resolved_at = NEW.resolved_at, resolution_seconds = NEW.resolution_seconds,
+                version = NEW.version, triage_key = NEW.triage_key
+            WHERE id = OLD.id;
+        END
+    """)
+    cursor.execute(f"""
+        CREATE TRIGGER trg_feedback_view_delete
+        INSTEAD OF DELETE ON feedback_submissions
+        BEGIN
+            DELETE FROM {SUBMISSIONS_TABLE} WHERE id = OLD.id;
+        END
+    """)
+
+    # The earlier triggers, now on the base table; the change log keeps recording names
+    names = {column: {row: f"(SELECT name FROM {table} WHERE id = {row}.{column}_id)" for row in ('OLD', 'NEW')}
+             for column, table in LOOKUP_TABLES.items()}
+    new_submitted_ts = "COALESCE(NEW.submitted_ts, CAST(strftime('%s', NEW.submission_date) AS INTEGER))"
+    new_triage_key = (f"{new_submitted_ts} - COALESCE("
+                      f"(SELECT boost_seconds FROM feedback_priorities WHERE id = NEW.priority_id), 0)")
+    cursor.execute(f"""
+        CREATE TRIGGER trg_feedback_submitted_ts
+        AFTER INSERT ON {SUBMISSIONS_TABLE}
+        WHEN NEW.submitted_ts IS NULL
+        BEGIN
+            UPDATE {SUBMISSIONS_TABLE}
+            SET submitted_ts = CAST(strftime('%s', NEW.submission_date) AS INTEGER)
+            WHERE id = NEW.id;
+        END
+    """)
+    cursor.execute(f"""
+        CREATE TRIGGER trg_feedback_changes_insert
+        AFTER INSERT ON {SUBMISSIONS_TABLE}
+        BEGIN
+            INSERT INTO feedback_changes (feedback_id, change_type, new_status, category, priority)
+            VALUES (NEW.id, 'insert', {names['status']['NEW']}, {names['category']['NEW']},
+                    {names['priority']['NEW']});
+        END
+    """)
+    cursor.execute(f"""
+        CREATE TRIGGER trg_feedback_changes_update
+        AFTER UPDATE OF status_id, admin_notes ON {SUBMISSIONS_TABLE}
+        WHEN OLD.status_id IS NOT NEW.status_id OR OLD.admin_notes IS NOT NEW.admin_notes
+        BEGIN
+            INSERT INTO feedback_changes (feedback_id, change_type, old_status, new_status, category, priority)
+            VALUES (NEW.id, 'update', {names['status']['OLD']}, {names['status']['NEW']},
+                    {names['category']['NEW']}, {names['priority']['NEW']});
+        END
+    """)
+    cursor.execute(f"""
+        CREATE TRIGGER trg_feedback_triage_insert
+        AFTER INSERT ON {SUBMISSIONS_TABLE}
+        WHEN NEW.triage_key IS NULL
+        BEGIN
+            UPDATE {SUBMISSIONS_TABLE} SET triage_key = {new_triage_key} WHERE id = NEW.id;
+        END
+    """)
+    # The view rewrites every column on update, so only real changes recompute the key
+    cursor.execute(f"""
+        CREATE TRIGGER trg_feedback_triage_update
+        AFTER UPDATE OF priority_id, submitted_ts ON {SUBMISSIONS_TABLE}
+        WHEN OLD.priority_id IS NOT NEW.priority_id OR OLD.submitted_ts IS NOT NEW.submitted_ts
+        BEGIN
+            UPDATE {SUBMISSIONS_TABLE} SET triage_key = {new_triage_key} WHERE id = NEW.id;
+        END
+    """)
+    cursor.execute(f"""
+        CREATE TRIGGER trg_student_stats_insert
+        AFTER INSERT ON {SUBMISSIONS_TABLE}
+        BEGIN
+            INSERT INTO student_submission_stats
+                (student_id, named_count, anonymous_count, first_submitted_ts, last_submitted_ts)
+            VALUES (
+                NEW.student_id,
+                CASE WHEN NEW.is_anonymous THEN 0 ELSE 1 END,
+                CASE WHEN NEW.is_anonymous THEN 1 ELSE 0 END,
+                {new_submitted_ts},
+                {new_submitted_ts}
+            )
+            ON CONFLICT (student_id) DO UPDATE SET
+                named_count = named_count + excluded.named_count,
+                anonymous_count = anonymous_count + excluded.anonymous_count,
+                first_submitted_ts = MIN(first_submitted_ts, excluded.first_submitted_ts),
+                last_submitted_ts = MAX(last_submitted_ts, excluded.last_submitted_ts);
+        END
+    """)
+
+    for name, columns in (
+        ('idx_feedback_status', 'status_id, submission_date'),
+        ('idx_feedback_category', 'category_id, submission_date'),
+        ('idx_feedback_priority', 'priority_id, submission_date'),
+        ('idx_feedback_submission_date', 'submission_date'),
+        ('idx_feedback_submitted_ts', 'submitted_ts'),
+        ('idx_feedback_status_ts', 'status_id, submitted_ts'),
+        ('idx_feedback_student', 'student_id, submitted_ts'),
+        # Covers the category x priority breakdowns without touching the rows
+        ('idx_feedback_category_priority', 'category_id, priority_id'),
+    ):
+        cursor.execute(f"CREATE INDEX {name} ON {SUBMISSIONS_TABLE} ({columns})")
+    cursor.execute(f"""
+        CREATE INDEX idx_feedback_resolution
+        ON {SUBMISSIONS_TABLE} (category_id, priority_id, resolution_seconds)
+        WHERE resolution_seconds IS NOT NULL
+    """)
+    cursor.execute(f"""
+        CREATE INDEX idx_feedback_first_response
+        ON {SUBMISSIONS_TABLE} (category_id, priority_id, first_response_seconds)
+        WHERE first_response_seconds IS NOT NULL
+    """)
+    cursor.execute(f"""
+        CREATE INDEX idx_feedback_triage
+        ON {SUBMISSIONS_TABLE} (triage_key)
+        WHERE status_id = {PENDING_STATUS_ID}
+    """)
+
+def _migrate_delete_log(cursor):
+    """Record deletes, e.g. by archival, in the change log"""
+    names = {column: f"(SELECT name FROM {table} WHERE id = OLD.{column}_id)"
+             for column, table in LOOKUP_TABLES.items()}
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_feedback_changes_delete
+        AFTER DELETE ON {SUBMISSIONS_TABLE}
+        BEGIN
+            INSERT INTO feedback_changes (feedback_id, change_type, old_status, category, priority)
+            VALUES (OLD.id, 'delete', {names['status']}, {names['category']}, {names['priority']});
+        END
+    """)
+
+def _build_student_sketches(cursor):
+    """Recompute every (day, category) sketch of distinct students from the submissions"""
+    cursor.execute(f"""
+        SELECT submitted_ts / 86400, category_id, student_id FROM {SUBMISSIONS_TABLE}
+        WHERE submitted_ts IS NOT NULL
+    """)
+    sketches = {}
+    for day, category_id, student_id in cursor:
+        sketch = sketches.get((day, category_id))
+        if sketch is None:
+            sketch = sketches[(day, category_id)] = HyperLogLog()
+        sketch.add(student_id)
+
+    cursor.execute("DELETE FROM student_sketches")
+    cursor.executemany("INSERT INTO student_sketches (day, category_id, registers) VALUES (?, ?, ?)",
+                       [(day, category_id, sketch.to_blob()) for (day, category_id), sketch in sketches.items()])
+
+def _migrate_student_sketches(cursor):
+    """Keep a HyperLogLog sketch of the distinct students per day and category"""
+    # Days are submitted_ts days; sketches are only ever merged, so archived rows stay counted
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS student_sketches (
+            day INTEGER NOT NULL,
+            category_id INTEGER NOT NULL REFERENCES feedback_categories (id),
+            registers BLOB NOT NULL,
+            PRIMARY KEY (day, category_id)
+        )
+    """)
+    _build_student_sketches(cursor)
+
+# Schema migrations as (user_version, migration) pairs, applied in order
+MIGRATIONS = [
+    (1, _migrate_submitted_ts),
+    (2, _migrate_change_log),
+    (3, _migrate_status_transitions),
+    (4, _migrate_row_version),
+    (5, _migrate_triage_key),
+    (6, _migrate_student_stats),
+    (7, _migrate_lookup_tables),
+    (8, _migrate_delete_log),
+    (9, _migrate_student_sketches),
+]
+
+def apply_migrations(conn):
+    """Apply schema migrations newer than the database's user_version"""
+    cursor = conn.cursor()
+    cursor.execute("PRAGMA user_version")
+    if cursor.fetchone()[0] >= MIGRATIONS[-1][0]:
+        return
+
+    # Take the write lock first so concurrent processes migrate only once
+    cursor.execute("BEGIN IMMEDIATE")
+    try:
+        cursor.execute("PRAGMA user_version")
+        current_version = cursor.fetchone()[0]
+        for version, migration in MIGRATIONS:
+            if version > current_version:
+                migration(cursor)
+                cursor.execute(f"PRAGMA user_version = {version}")
+        conn.commit()
+    except sqlite3.Error:
+        conn.rollback()
+        raise
+
+def _create_base_schema(cursor):
+    """Create the original feedback_submissions table and its indexes"""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS feedback_submissions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            student_id TEXT NOT NULL,
+            student_name TEXT,
+            email TEXT,
+            category TEXT NOT NULL,
+            subject TEXT,
+            feedback_text TEXT NOT NULL,
+            priority TEXT,
+            is_anonymous INTEGER,
+            submission_date TEXT NOT NULL,
+            status TEXT,
+            admin_notes TEXT
+        );
+    """)
+    # Indexes backing the dashboard filters, ordering and DISTINCT lookups
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_feedback_status ON feedback_submissions (status, submission_date)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_feedback_category ON feedback_submissions (category, submission_date)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_feedback_priority ON feedback_submissions (priority, submission_date)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_feedback_submission_date ON feedback_submissions (submission_date)")
+
+def initialize_schema(conn):
+    """Create the base tables and indexes, then apply pending migrations"""
+    cursor = conn.cursor()
+    cursor.execute("PRAGMA user_version")
+    if cursor.fetchone()[0] == 0:
+        # Migrated databases already have these; feedback_submissions is a view from version 7 on
+        _create_base_schema(cursor)
+        conn.commit()
+    apply_migrations(conn)
+
+@timed()
 def create_tables():
     """Create tables in the database"""
     conn = create_connection()
     if conn:
         try:
-            cursor = conn.cursor()
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS feedback_submissions (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    student_id TEXT NOT NULL,
-                    student_name TEXT,
-                    email TEXT,
-                    category TEXT NOT NULL,
-                    subject TEXT,
-                    feedback_text TEXT NOT NULL,
-                    priority TEXT,
-                    is_anonymous INTEGER,
-                    submission_date TEXT NOT NULL,
-                    status TEXT,
-                    admin_notes TEXT
-                );
-            """)
-            conn.commit()
+            initialize_schema(conn)
             print("Tables created successfully.")
         except sqlite3.Error as e:
             print(e)
         finally:
             conn.close()
 
-def insert_feedback(student_id, student_name, email, category, subject, feedback_text, priority, is_anonymous):
-    """Insert a new feedback submission into the database"""
+@timed()
+def try_insert_feedback(student_id, student_name, email, category, subject, feedback_text, priority, is_anonymous):
+    """Insert a new feedback submission, reporting why it failed
+
+    Returns a dict with the outcome ('inserted' or 'failed') and, for a
+    database error, its SQLite error name in 'error' (e.g. 'SQLITE_BUSY'),
+    so callers can tell lock contention apart from other failures.
+    """
+    result = {'outcome': 'failed', 'error': None}
     conn = create_connection()
     if conn:
         try:
             cursor = conn.cursor()
-            submission_date = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            moment = datetime.now()
+            submission_date = moment.strftime('%Y-%m-%d %H:%M:%S')
             status = 'Pending'
             cursor.execute("""
                 INSERT INTO feedback_submissions (
-                    student_id, student_name, email, category, subject, feedback_text, priority, is_anonymous, submission_date, status
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?);
-            """, (student_id, student_name, email, category, subject, feedback_text, priority, is_anonymous, submission_date, status))
+                    student_id, student_name, email, category, subject, feedback_text, priority, is_anonymous,
+                    submission_date, submitted_ts, status
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, CAST(strftime('%s', ?) AS INTEGER), ?);
+            """, (student_id, student_name, email, category, subject, feedback_text, priority, is_anonymous,
+                  submission_date, submission_date, status))
+            _record_student_sketch(cursor, category, _local_timestamp(moment) // 86400, student_id)
             conn.commit()
-            print("Feedback submitted successfully.")
-            return True
+            result['outcome'] = 'inserted'
         except sqlite3.Error as e:
             print(e)
-            return False
+            result['error'] = _sqlite_error_name(e)
         finally:
             conn.close()
+    return result
+
+@timed()
+def insert_feedback(student_id, student_name, email, category, subject, feedback_text, priority, is_anonymous):
+    """Insert a new feedback submission into the database"""
+    result = try_insert_feedback(student_id, student_name, email, category, subject, feedback_text,
+                                 priority, is_anonymous)
+    if result['outcome'] == 'inserted':
+        print("Feedback submitted successfully.")
+        return True
     return False
 
+def get_lookup_values(conn):
+    """Get the names in each lookup table, priorities from lowest to highest rank"""
+    values = {}
+    for column, table in LOOKUP_TABLES.items():
+        order = "priority_rank, id" if column == 'priority' else "id"
+        values[column] = [row[0] for row in conn.execute(f"SELECT name FROM {table} ORDER BY {order}").fetchall()]
+    return values
+
+def apply_lookup_categories(df, conn):
+    """Convert the category, status and priority columns of df to pandas categoricals
+
+    Each row then holds a small integer code instead of its own string object.
+    Priority is an ordered categorical, so it sorts and compares by rank.
+    """
+    for column, categories in get_lookup_values(conn).items():
+        if column in df.columns:
+            df[column] = pd.Categorical(df[column], categories=categories, ordered=(column == 'priority'))
+    return df
+
+@timed()
 def get_all_feedback():
     """Retrieve all feedback submissions"""
     conn = create_connection()
     if conn:
         try:
             df = pd.read_sql_query("SELECT * FROM feedback_submissions", conn)
-            return df
+            return apply_lookup_categories(df, conn)
         except sqlite3.Error as e:
             print(e)
             return pd.DataFrame()
@@ -80,28 +668,314 @@ def get_all_feedback():
             conn.close()
     return pd.DataFrame()
 
-def update_feedback_status(feedback_id, new_status, admin_notes=None):
-    """Update the status and admin notes of a feedback submission"""
+def _record_student_sketch(cursor, category, day, student_id):
+    """Add a student to the sketch of its day and category inside the caller's transaction"""
+    cursor.execute("SELECT id FROM feedback_categories WHERE name = ?", (category,))
+    category_id = cursor.fetchone()[0]
+    cursor.execute("SELECT registers FROM student_sketches WHERE day = ? AND category_id = ?", (day, category_id))
+    row = cursor.fetchone()
+    sketch = HyperLogLog.from_blob(row[0]) if row else HyperLogLog()
+    # A student already counted that day rarely changes a register, so usually nothing is written
+    if sketch.add(student_id):
+        cursor.execute("INSERT OR REPLACE INTO student_sketches (day, category_id, registers) VALUES (?, ?, ?)",
+                       (day, category_id, sketch.to_blob()))
+
+@timed()
+def rebuild_student_sketches():
+    """Recompute the distinct-student sketches, e.g. after rows were bulk-loaded without insert_feedback"""
     conn = create_connection()
     if conn:
         try:
             cursor = conn.cursor()
-            if admin_notes:
-                cursor.execute("UPDATE feedback_submissions SET status = ?, admin_notes = ? WHERE id = ?",
-                               (new_status, admin_notes, feedback_id))
-            else:
-                cursor.execute("UPDATE feedback_submissions SET status = ? WHERE id = ?",
-                               (new_status, feedback_id))
+            cursor.execute("BEGIN IMMEDIATE")
+            _build_student_sketches(cursor)
             conn.commit()
-            print(f"Feedback {feedback_id} status updated to {new_status}.")
             return True
         except sqlite3.Error as e:
+            conn.rollback()
             print(e)
             return False
         finally:
             conn.close()
     return False
 
+def _sqlite_error_name(error):
+    """SQLite's name for the result code of an error, e.g. 'SQLITE_BUSY', or its class name"""
+    return getattr(error, 'sqlite_errorname', None) or type(error).__name__
+
+def _local_timestamp(moment):
+    """Convert a local datetime to integer seconds in the same form as submitted_ts"""
+    return calendar.timegm(moment.timetuple())
+
+def _apply_status_update(cursor, feedback_id, new_status, admin_notes, moment, expected_version=None):
+    """Update one submission's status inside the caller's transaction
+
+    Maintains first_response_at/resolved_at, bumps the row version and records
+    the transition. When expected_version is given the update only happens if
+    the row is still at that version. Returns (previous_status, outcome) where
+    outcome is 'updated', 'unchanged', 'conflict' or 'not_found'.
+    """
+    cursor.execute("SELECT status, version FROM feedback_submissions WHERE id = ?", (feedback_id,))
+    row = cursor.fetchone()
+    if row is None:
+        return None, 'not_found'
+
+    old_status, current_version = row
+    if expected_version is not None and current_version != expected_version:
+        return old_status, 'conflict'
+
+    if old_status == new_status and not admin_notes:
+        return old_status, 'unchanged'
+
+    changed_at = moment.strftime('%Y-%m-%d %H:%M:%S')
+    changed_ts = _local_timestamp(moment)
+    responded = new_status != 'Pending'
+    resolved = new_status in RESOLVED_STATUSES
+
+    # Right-hand sides see the pre-update row, so first_response_at IS NULL means "not yet responded"
+    cursor.execute("""
+        UPDATE feedback_submissions
+        SET status = ?,
+            admin_notes = COALESCE(?, admin_notes),
+            version = version + 1,
+            first_response_at = CASE WHEN first_response_at IS NULL AND ? THEN ? ELSE first_response_at END,
+            first_response_seconds = CASE WHEN first_response_at IS NULL AND ?
+                                          THEN ? - submitted_ts ELSE first_response_seconds END,
+            resolved_at = CASE WHEN ? THEN COALESCE(resolved_at, ?) ELSE NULL END,
+            resolution_seconds = CASE WHEN ? THEN COALESCE(resolution_seconds, ? - submitted_ts) ELSE NULL END
+        WHERE id = ? AND version = ?
+    """, (new_status, admin_notes or None, responded, changed_ts, responded, changed_ts,
+          resolved, changed_ts, resolved, changed_ts, feedback_id, current_version))
+
+    if old_status != new_status:
+        cursor.execute("""
+            INSERT INTO feedback_status_transitions
+                (feedback_id, from_status, to_status, admin_notes, changed_at, changed_ts)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, (feedback_id, old_status, new_status, admin_notes or None, changed_at, changed_ts))
+
+    return old_status, 'updated'
+
+@timed()
+def try_update_feedback_status(feedback_id, new_status, admin_notes=None, expected_version=None):
+    """Update a submission's status, failing with a conflict if it changed since expected_version
+
+    Returns a dict with the outcome ('updated', 'unchanged', 'conflict',
+    'not_found' or 'failed') and the row's status, admin_notes and version after the attempt,
+    so a conflicting edit can be shown to the admin. A failed update's SQLite
+    error name is in 'error'.
+    """
+    result = {'outcome': 'failed', 'status': None, 'admin_notes': None, 'version': None, 'error': None}
+    conn = create_connection()
+    if conn:
+        try:
+            cursor = conn.cursor()
+            cursor.execute("BEGIN IMMEDIATE")
+            _, outcome = _apply_status_update(cursor, feedback_id, new_status, admin_notes,
+                                              datetime.now(), expected_version)
+            cursor.execute("SELECT status, admin_notes, version FROM feedback_submissions WHERE id = ?",
+                           (feedback_id,))
+            row = cursor.fetchone()
+            conn.commit()
+
+            result['outcome'] = outcome
+            if row:
+                result['status'], result['admin_notes'], result['version'] = row
+        except sqlite3.Error as e:
+            conn.rollback()
+            print(e)
+            result['error'] = _sqlite_error_name(e)
+        finally:
+            conn.close()
+    return result
+
+@timed()
+def update_feedback_status(feedback_id, new_status, admin_notes=None, expected_version=None):
+    """Update the status and admin notes of a feedback submission"""
+    result = try_update_feedback_status(feedback_id, new_status, admin_notes, expected_version)
+    if result['outcome'] in ('updated', 'unchanged'):
+        print(f"Feedback {feedback_id} status updated to {new_status}.")
+        return True
+    print(f"Feedback {feedback_id} not updated: {result['outcome']}.")
+    return False
+
+def build_filter_clause(status=None, category=None, priority=None):
+    """Build a WHERE clause and parameters for the status/category/priority filters"""
+    clause = " WHERE 1=1"
+    params = []
+
+    if status:
+        clause += " AND status = ?"
+        params.append(status)
+
+    if category:
+        clause += " AND category = ?"
+        params.append(category)
+
+    if priority:
+        clause += " AND priority = ?"
+        params.append(priority)
+
+    return clause, params
+
+def build_id_filter_clause(status=None, category=None, priority=None):
+    """Build the same filters as build_filter_clause against the integer keys of feedback_submissions_base"""
+    clause = " WHERE 1=1"
+    params = []
+
+    for column, value in (('status', status), ('category', category), ('priority', priority)):
+        if value:
+            clause += f" AND {column}_id = (SELECT id FROM {LOOKUP_TABLES[column]} WHERE name = ?)"
+            params.append(value)
+
+    return clause, params
+
+@timed()
+def bulk_update_feedback_status(new_status, admin_notes=None, feedback_ids=None, filters=None,
+                                expected_versions=None):
+    """Update many submissions to one status in a single transaction
+
+    Targets either an explicit list of feedback_ids or every submission matching
+    filters (a dict of status/category/priority). expected_versions optionally
+    maps ids to the version the admin saw; rows changed since then are skipped
+    as conflicts. Returns a DataFrame with one row per targeted id: its
+    previous status and an outcome of 'updated', 'unchanged', 'conflict' or
+    'not_found'. If the transaction fails nothing is changed and every outcome
+    is 'failed'.
+    """
+    conn = create_connection()
+    if not conn:
+        return pd.DataFrame(columns=['id', 'previous_status', 'outcome'])
+
+    outcomes = []
+    try:
+        cursor = conn.cursor()
+        cursor.execute("BEGIN IMMEDIATE")
+
+        if feedback_ids is None:
+            where, params = build_filter_clause(**(filters or {}))
+            cursor.execute(f"SELECT id FROM feedback_submissions{where} ORDER BY id", params)
+            feedback_ids = [row[0] for row in cursor.fetchall()]
+
+        moment = datetime.now()
+        for feedback_id in feedback_ids:
+            feedback_id = int(feedback_id)
+            expected_version = (expected_versions or {}).get(feedback_id)
+            old_status, outcome = _apply_status_update(cursor, feedback_id, new_status, admin_notes,
+                                                       moment, expected_version)
+            outcomes.append((feedback_id, old_status, outcome))
+
+        conn.commit()
+        print(f"Bulk updated {sum(1 for row in outcomes if row[2] == 'updated')} submissions to {new_status}.")
+    except sqlite3.Error as e:
+        conn.rollback()
+        print(e)
+        outcomes = [(int(feedback_id), None, 'failed') for feedback_id in (feedback_ids or [])]
+    finally:
+        conn.close()
+
+    return pd.DataFrame(outcomes, columns=['id', 'previous_status', 'outcome'])
+
+@timed()
+def get_status_history(feedback_id):
+    """Get the recorded status transitions of a feedback submission, oldest first"""
+    conn = create_connection()
+    if conn:
+        try:
+            df = pd.read_sql_query("""
+                SELECT from_status, to_status, admin_notes, changed_at
+                FROM feedback_status_transitions
+                WHERE feedback_id = ?
+                ORDER BY changed_ts, id
+            """, conn, params=(feedback_id,))
+            return df
+        except sqlite3.Error as e:
+            print(e)
+            return pd.DataFrame()
+        finally:
+            conn.close()
+    return pd.DataFrame()
+
+@timed()
+def changes_since(seq=0, limit=1000):
+    """Get change log entries with a sequence number greater than seq, oldest first
+
+    Consumers keep the largest seq they have processed and pass it back in
+    to receive only the changes made since then.
+    """
+    conn = create_connection()
+    if conn:
+        try:
+            df = pd.read_sql_query(
+                "SELECT * FROM feedback_changes WHERE seq > ? ORDER BY seq LIMIT ?",
+                conn, params=(seq, limit)
+            )
+            return df
+        except sqlite3.Error as e:
+            print(e)
+            return pd.DataFrame()
+        finally:
+            conn.close()
+    return pd.DataFrame()
+
+@timed()
+def count_changes_since(seq=0, until_seq=None):
+    """Count change log entries after seq, up to and including until_seq, by change type
+
+    Returns a dict such as {'insert': 12, 'update': 3}; counted in SQL, so
+    any number of changes costs one range scan of the log's primary key.
+    """
+    conn = create_connection()
+    if conn:
+        try:
+            query = "SELECT change_type, COUNT(*) FROM feedback_changes WHERE seq > ?"
+            params = [seq]
+            if until_seq is not None:
+                query += " AND seq <= ?"
+                params.append(until_seq)
+            cursor = conn.cursor()
+            cursor.execute(query + " GROUP BY change_type", params)
+            return dict(cursor.fetchall())
+        except sqlite3.Error as e:
+            print(e)
+            return {}
+        finally:
+            conn.close()
+    return {}
+
+@timed()
+def get_latest_change_seq():
+    """Get the sequence number of the most recent change, or 0 if there are none"""
+    conn = create_connection()
+    if conn:
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT COALESCE(MAX(seq), 0) FROM feedback_changes")
+            return cursor.fetchone()[0]
+        except sqlite3.Error as e:
+            print(e)
+            return 0
+        finally:
+            conn.close()
+    return 0
+
+@timed()
+def prune_changes(before_seq):
+    """Delete change log entries up to and including before_seq once all consumers have read them"""
+    conn = create_connection()
+    if conn:
+        try:
+            cursor = conn.cursor()
+            cursor.execute("DELETE FROM feedback_changes WHERE seq <= ?", (before_seq,))
+            conn.commit()
+            return cursor.rowcount
+        except sqlite3.Error as e:
+            print(e)
+            return 0
+        finally:
+            conn.close()
+    return 0
+
 if __name__ == '__main__':
     create_tables()
     # Example usage:
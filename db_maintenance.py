@@ -0,0 +1,118 @@
+import os
+import sqlite3
+import pandas as pd
+from utils import database
+from utils.database import create_connection, SUBMISSIONS_TABLE
+from utils.metrics import timed
+
+# Thresholds used when recommending maintenance
+VACUUM_FREELIST_RATIO = 0.20
+WAL_CHECKPOINT_BYTES = 64 * 1024 * 1024
+ARCHIVE_ROW_THRESHOLD = 500000
+
+def _pragma(cursor, name):
+    """Read a single-valued PRAGMA"""
+    cursor.execute(f"PRAGMA {name}")
+    return cursor.fetchone()[0]
+
+def _get_object_sizes(cursor):
+    """Get per-table and per-index sizes from the dbstat virtual table"""
+    try:
+        cursor.execute("""
+            SELECT s.name, COALESCE(m.type, 'internal') as type, m.tbl_name as table_name,
+                   COUNT(*) as pages, SUM(s.pgsize) as size_bytes,
+                   SUM(s.unused) as unused_bytes
+            FROM dbstat s
+            LEFT JOIN sqlite_master m ON m.name = s.name
+            GROUP BY s.name
+            ORDER BY size_bytes DESC
+        """)
+    except sqlite3.OperationalError:
+        # SQLite was built without SQLITE_ENABLE_DBSTAT_VTAB
+        return None
+
+    columns = [column[0] for column in cursor.description]
+    return pd.DataFrame(cursor.fetchall(), columns=columns)
+
+def _get_row_counts(cursor):
+    """Count the rows of every user table"""
+    cursor.execute("""
+        SELECT name FROM sqlite_master
+        WHERE type = 'table' AND name NOT LIKE 'sqlite_%'
+        ORDER BY name
+    """)
+    tables = [row[0] for row in cursor.fetchall()]
+
+    row_counts = {}
+    for table in tables:
+        cursor.execute(f'SELECT COUNT(*) FROM "{table}"')
+        row_counts[table] = cursor.fetchone()[0]
+    return row_counts
+
+def _get_recommendations(stats):
+    """Suggest maintenance based on the collected storage statistics"""
+    recommendations = []
+
+    if stats['freelist_ratio'] >= VACUUM_FREELIST_RATIO:
+        recommendations.append(
+            f"{stats['freelist_ratio'] * 100:.1f}% of pages are free. "
+            f"Run VACUUM to reclaim {stats['free_bytes'] / 1024:.1f} KB."
+        )
+
+    if stats['wal_size_bytes'] >= WAL_CHECKPOINT_BYTES:
+        recommendations.append(
+            f"The WAL file is {stats['wal_size_bytes'] / (1024 * 1024):.1f} MB. "
+            "Run PRAGMA wal_checkpoint(TRUNCATE) during a quiet period."
+        )
+
+    # feedback_submissions is a view; its rows live in the base table
+    feedback_rows = stats['row_counts'].get(SUBMISSIONS_TABLE, 0)
+    if feedback_rows >= ARCHIVE_ROW_THRESHOLD:
+        recommendations.append(
+            f"feedback_submissions holds {feedback_rows} rows. "
+            "Consider archiving resolved and closed submissions."
+        )
+
+    return recommendations
+
+@timed()
+def get_storage_stats():
+    """Get storage statistics for the database without reading the feedback rows"""
+    conn = create_connection()
+    if not conn:
+        return {}
+
+    try:
+        cursor = conn.cursor()
+        page_size = _pragma(cursor, 'page_size')
+        page_count = _pragma(cursor, 'page_count')
+        freelist_count = _pragma(cursor, 'freelist_count')
+
+        wal_path = f"{database.DATABASE_NAME}-wal"
+        stats = {
+            'page_size': page_size,
+            'page_count': page_count,
+            'freelist_count': freelist_count,
+            'database_size_bytes': page_size * page_count,
+            'free_bytes': page_size * freelist_count,
+            'freelist_ratio': freelist_count / page_count if page_count else 0,
+            'journal_mode': _pragma(cursor, 'journal_mode'),
+            'wal_size_bytes': os.path.getsize(wal_path) if os.path.exists(wal_path) else 0,
+            'row_counts': _get_row_counts(cursor),
+            'object_sizes': _get_object_sizes(cursor)
+        }
+        stats['recommendations'] = _get_recommendations(stats)
+        return stats
+    except sqlite3.Error as e:
+        print(f"Error getting storage stats: {e}")
+        return {}
+    finally:
+        conn.close()
+
+if __name__ == '__main__':
+    stats = get_storage_stats()
+    for key, value in stats.items():
+        if key != 'object_sizes':
+            print(f"{key}: {value}")
+    if stats.get('object_sizes') is not None:
+        print(stats['object_sizes'])
@@ -0,0 +1,144 @@
+import argparse
+import ast
+import glob
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+DEFAULT_RESULTS_FILE = 'import_times.json'
+DEFAULT_BASELINE_FILE = 'import_times_baseline.json'
+# A page is a regression when its imports get this much slower than the baseline
+REGRESSION_TOLERANCE = 0.20
+# Libraries the pages now load on first use; their cost is reported for reference. Plotly is
+# not among them: the pages that import it draw charts with it on every render.
+DEFERRED_MODULES = ['nltk', 'wordcloud', 'matplotlib.pyplot', 'seaborn']
+TOP_MODULES_SHOWN = 5
+
+def default_pages():
+    """The entry point and page scripts, in the pages/ layout or alongside app.py"""
+    pages = sorted(glob.glob(os.path.join('pages', '*.py'))) or sorted(glob.glob('[0-9]_*.py'))
+    return ['app.py'] + pages
+
+def page_imports(path):
+    """Get the module-level import statements of a page as source code"""
+    with open(path, encoding='utf-8') as handle:
+        source = handle.read()
+    tree = ast.parse(source)
+    return "\n".join(
+        ast.get_source_segment(source, node)
+        for node in tree.body
+        if isinstance(node, (ast.Import, ast.ImportFrom))
+    )
+
+def parse_importtime(stderr):
+    """Sum the cumulative time of top-level imports from -X importtime output
+
+    Returns the total in milliseconds and the top-level modules with their
+    cumulative milliseconds, most expensive first.
+    """
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or '|' not in line:
+            continue
+        _, cumulative, name = line.split('|', 2)
+        # Nested imports are indented under the module that triggered them
+        if name.startswith('  ') or not cumulative.strip().isdigit():
+            continue
+        modules.append((name.strip(), int(cumulative) / 1000))
+    modules.sort(key=lambda module: module[1], reverse=True)
+    return sum(ms for _, ms in modules), modules
+
+def measure_imports(code, repeats):
+    """Time code in fresh interpreters and return the median total and its heaviest modules"""
+    runs = []
+    for _ in range(repeats):
+        completed = subprocess.run([sys.executable, '-X', 'importtime', '-c', code],
+                                   capture_output=True, text=True)
+        if completed.returncode != 0:
+            error = completed.stderr.strip().splitlines()
+            return {'error': error[-1] if error else f"exit code {completed.returncode}"}
+        runs.append(parse_importtime(completed.stderr))
+
+    runs.sort(key=lambda run: run[0])
+    total_ms, modules = runs[len(runs) // 2]
+    return {
+        'import_ms': total_ms,
+        'runs_ms': [run[0] for run in runs],
+        'stdev_ms': statistics.stdev([run[0] for run in runs]) if len(runs) > 1 else 0.0,
+        'top_modules': [{'module': name, 'ms': ms} for name, ms in modules[:TOP_MODULES_SHOWN]]
+    }
+
+def compare_to_baseline(results, baseline, tolerance=REGRESSION_TOLERANCE):
+    """List pages whose import time regressed beyond tolerance"""
+    regressions = []
+    for page, metrics in results['pages'].items():
+        previous = baseline.get('pages', {}).get(page, {})
+        if 'import_ms' not in metrics or not previous.get('import_ms'):
+            continue
+        change = metrics['import_ms'] / previous['import_ms'] - 1
+        if change > tolerance:
+            regressions.append(f"{page}: {previous['import_ms']:.0f} ms -> {metrics['import_ms']:.0f} ms "
+                               f"(+{change * 100:.0f}%)")
+    return regressions
+
+def main():
+    """Command line entry point for the cold-start import benchmark"""
+    parser = argparse.ArgumentParser(description="Measure the cold-start import cost of each page")
+    parser.add_argument('pages', nargs='*', help="Page scripts (default: app.py and every page)")
+    parser.add_argument('--repeats', type=int, default=5, help="Fresh interpreters per page")
+    parser.add_argument('--output', default=DEFAULT_RESULTS_FILE, help="Results JSON file")
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE_FILE, help="Baseline JSON file to compare against")
+    parser.add_argument('--save-baseline', action='store_true', help="Store these results as the new baseline")
+    parser.add_argument('--check', action='store_true',
+                        help="Fail when there is no baseline to compare against, as well as on regressions")
+    args = parser.parse_args()
+
+    # Baselines are machine-specific, so none ships with the repo; fail before the slow runs
+    if args.check and not args.save_baseline and not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --save-baseline on this machine first.")
+        raise SystemExit(1)
+
+    results = {'python': sys.version.split()[0], 'pages': {}, 'deferred_modules': {}}
+
+    for page in args.pages or default_pages():
+        metrics = measure_imports(page_imports(page), args.repeats)
+        results['pages'][page] = metrics
+        if 'error' in metrics:
+            print(f"{page:32s} failed: {metrics['error']}")
+            continue
+        heaviest = ", ".join(f"{module['module']} {module['ms']:.0f}" for module in metrics['top_modules'][:3])
+        print(f"{page:32s} {metrics['import_ms']:8.0f} ms  ({heaviest})")
+
+    print("Deferred libraries, loaded on first use:")
+    for module in DEFERRED_MODULES:
+        metrics = measure_imports(f"import {module}", args.repeats)
+        results['deferred_modules'][module] = metrics
+        if 'error' in metrics:
+            print(f"  {module:30s} not available")
+        else:
+            print(f"  {module:30s} {metrics['import_ms']:8.0f} ms")
+
+    with open(args.output, 'w') as handle:
+        json.dump(results, handle, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as handle:
+            json.dump(results, handle, indent=2)
+        print(f"Baseline saved to {args.baseline}")
+    elif os.path.exists(args.baseline):
+        with open(args.baseline) as handle:
+            regressions = compare_to_baseline(results, json.load(handle))
+        if regressions:
+            print("Regressions against baseline:")
+            for regression in regressions:
+                print(f"  {regression}")
+            raise SystemExit(1)
+        print("No regressions against baseline.")
+    else:
+        print(f"No baseline at {args.baseline}, nothing compared; run with --save-baseline to create one.")
+
+if __name__ == '__main__':
+    main()
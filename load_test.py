@@ -0,0 +1,197 @@
+import argparse
+import json
+import math
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from utils.database import set_database_path, create_connection, try_insert_feedback, try_update_feedback_status
+from utils.benchmark import FeedbackGenerator
+
+DEFAULT_LEVELS = [1, 2, 4, 8, 16, 32]
+DEFAULT_DURATION = 10
+DEFAULT_SEED_ROWS = 5000
+# Share of operations that are admin status updates; the rest are new submissions
+DEFAULT_UPDATE_RATIO = 0.2
+# Mean pause between a worker's operations, in seconds
+DEFAULT_THINK_TIME = 0.05
+# Application-level retries after a lock error, with exponential backoff
+DEFAULT_MAX_RETRIES = 5
+RETRY_BASE_DELAY = 0.01
+STATUSES = ["Pending", "In Progress", "Resolved", "Closed"]
+
+def _classify_failure(result):
+    """Map a failed call's result to an error kind: 'busy', 'locked' or what else went wrong"""
+    error = result.get('error')
+    if error and error.startswith('SQLITE_BUSY'):
+        return 'busy'
+    if error and error.startswith('SQLITE_LOCKED'):
+        return 'locked'
+    return error or result['outcome']
+
+def _call_with_retries(operation, max_retries, rng):
+    """Run operation until it succeeds, fails for a reason other than a lock, or the retries run out
+
+    Returns (succeeded, lock retries, kind of the last error).
+    """
+    for attempt in range(max_retries + 1):
+        result = operation()
+        if result['outcome'] in ('inserted', 'updated', 'unchanged'):
+            return True, attempt, None
+        error = _classify_failure(result)
+        if error not in ('busy', 'locked') or attempt == max_retries:
+            return False, attempt, error
+        time.sleep(RETRY_BASE_DELAY * (2 ** attempt) * (0.5 + rng.random()))
+
+def _worker(worker_id, stop_at, generator, max_id, update_ratio, think_time, max_retries, samples):
+    """Issue a mix of submissions and status updates until stop_at"""
+    rng = random.Random(worker_id)
+    yesterday = datetime.now() - timedelta(days=1)
+    while time.time() < stop_at:
+        if rng.random() < update_ratio:
+            kind = 'update'
+            feedback_id = rng.randint(1, max_id)
+            new_status = rng.choice(STATUSES)
+            operation = lambda: try_update_feedback_status(feedback_id, new_status, "Load test update")
+        else:
+            kind = 'insert'
+            row = generator.row(yesterday, 1)
+            operation = lambda: try_insert_feedback(*row[:8])
+
+        started = time.perf_counter()
+        succeeded, retries, error = _call_with_retries(operation, max_retries, rng)
+        samples.append((kind, time.perf_counter() - started, succeeded, retries, error))
+
+        if think_time > 0:
+            time.sleep(rng.expovariate(1 / think_time))
+
+def _run_process(database_path, process_index, threads, duration, update_ratio, think_time, max_retries, max_id):
+    """Run `threads` workers in this process and return their samples"""
+    set_database_path(database_path)
+    # The database layer prints every error; failures are classified from the returned results instead
+    sys.stdout = open(os.devnull, 'w')
+
+    generator = FeedbackGenerator(seed=process_index)
+    samples = []
+    stop_at = time.time() + duration
+    workers = [
+        threading.Thread(
+            target=_worker,
+            args=(process_index * 1000 + i, stop_at, generator, max_id, update_ratio,
+                  think_time, max_retries, samples)
+        )
+        for i in range(threads)
+    ]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return samples
+
+def _percentile(values, fraction):
+    """Nearest-rank percentile"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+def summarize(samples, duration, concurrency):
+    """Aggregate worker samples into throughput, latency, retry and error figures"""
+    succeeded = [sample for sample in samples if sample[2]]
+    latencies = [sample[1] for sample in succeeded]
+    errors = {}
+    for sample in samples:
+        if not sample[2]:
+            errors[sample[4]] = errors.get(sample[4], 0) + 1
+
+    return {
+        'concurrency': concurrency,
+        'operations': len(samples),
+        'inserts': sum(1 for sample in samples if sample[0] == 'insert'),
+        'updates': sum(1 for sample in samples if sample[0] == 'update'),
+        'throughput_per_sec': len(succeeded) / duration,
+        'p50_ms': _percentile(latencies, 0.50) * 1000 if latencies else None,
+        'p95_ms': _percentile(latencies, 0.95) * 1000 if latencies else None,
+        'p99_ms': _percentile(latencies, 0.99) * 1000 if latencies else None,
+        'lock_retries': sum(sample[3] for sample in samples),
+        'retried_operations': sum(1 for sample in samples if sample[3]),
+        'error_rate': (len(samples) - len(succeeded)) / len(samples) if samples else 0,
+        'errors': errors
+    }
+
+def run_level(database_path, concurrency, processes, duration, update_ratio, think_time, max_retries, max_id):
+    """Run `concurrency` workers spread over up to `processes` processes"""
+    processes = max(1, min(processes, concurrency))
+    base, extra = divmod(concurrency, processes)
+    samples = []
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        futures = [
+            executor.submit(_run_process, database_path, index, base + (1 if index < extra else 0),
+                            duration, update_ratio, think_time, max_retries, max_id)
+            for index in range(processes)
+        ]
+        for future in futures:
+            samples.extend(future.result())
+    return summarize(samples, duration, concurrency)
+
+def prepare_database(database_path, seed_rows):
+    """Create a fresh database with seed_rows submissions and return the highest id"""
+    if os.path.exists(database_path):
+        os.remove(database_path)
+    set_database_path(database_path)
+    FeedbackGenerator().populate(seed_rows)
+
+    conn = create_connection()
+    try:
+        return conn.execute("SELECT COALESCE(MAX(id), 0) FROM feedback_submissions").fetchone()[0]
+    finally:
+        conn.close()
+
+def main():
+    """Command line entry point for the concurrent submission load test"""
+    parser = argparse.ArgumentParser(description="Load test concurrent submissions and status updates")
+    parser.add_argument('--levels', type=int, nargs='+', default=DEFAULT_LEVELS,
+                        help="Concurrent workers at each step")
+    parser.add_argument('--processes', type=int, default=os.cpu_count() or 1,
+                        help="Maximum processes the workers are spread over")
+    parser.add_argument('--duration', type=float, default=DEFAULT_DURATION, help="Seconds per step")
+    parser.add_argument('--update-ratio', type=float, default=DEFAULT_UPDATE_RATIO,
+                        help="Share of operations that are status updates")
+    parser.add_argument('--think-time', type=float, default=DEFAULT_THINK_TIME,
+                        help="Mean pause between a worker's operations in seconds")
+    parser.add_argument('--max-retries', type=int, default=DEFAULT_MAX_RETRIES,
+                        help="Retries after a failed call")
+    parser.add_argument('--seed-rows', type=int, default=DEFAULT_SEED_ROWS, help="Rows loaded before the test")
+    parser.add_argument('--database', default=os.path.join(tempfile.gettempdir(), 'feedback_load_test.db'),
+                        help="Scratch database file; it is recreated")
+    parser.add_argument('--output', help="Write the results to this JSON file")
+    args = parser.parse_args()
+
+    max_id = prepare_database(args.database, args.seed_rows)
+    conn = create_connection()
+    journal_mode = conn.execute("PRAGMA journal_mode").fetchone()[0]
+    conn.close()
+    print(f"Seeded {max_id} rows into {args.database} (journal_mode={journal_mode})")
+    print(f"{'workers':>7} {'ops/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'retries':>8} {'errors':>7}")
+
+    results = []
+    for concurrency in args.levels:
+        summary = run_level(args.database, concurrency, args.processes, args.duration, args.update_ratio,
+                            args.think_time, args.max_retries, max_id)
+        results.append(summary)
+        p50, p95, p99 = (f"{summary[key]:9.1f}" if summary[key] is not None else f"{'-':>9}"
+                         for key in ('p50_ms', 'p95_ms', 'p99_ms'))
+        print(f"{concurrency:7d} {summary['throughput_per_sec']:9.1f} {p50} {p95} {p99} "
+              f"{summary['lock_retries']:8d} {summary['error_rate'] * 100:6.1f}%")
+
+    if args.output:
+        with open(args.output, 'w') as handle:
+            json.dump({'journal_mode': journal_mode, 'levels': results}, handle, indent=2)
+        print(f"Results written to {args.output}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,180 @@
+import atexit
+import functools
+import heapq
+import json
+import math
+import os
+import threading
+import time
+from collections import deque
+
+METRICS_FILE = 'performance_metrics.jsonl'
+# Timings kept per name for the rolling percentiles
+METRICS_WINDOW = 1000
+# Slowest individual calls kept for the Performance page
+SLOWEST_CALLS_KEPT = 50
+# Records buffered before they are appended to METRICS_FILE
+METRICS_FLUSH_EVERY = 100
+
+# Set FEEDBACK_METRICS=0 to turn instrumentation off; timed functions then cost one flag check
+_enabled = os.environ.get('FEEDBACK_METRICS', '1') != '0'
+_lock = threading.Lock()
+_stats = {}
+_slowest = []
+_pending = []
+
+def set_metrics_enabled(enabled):
+    """Turn timing collection on or off for this process"""
+    global _enabled
+    _enabled = bool(enabled)
+
+def metrics_enabled():
+    """Check whether timing collection is on"""
+    return _enabled
+
+def record(name, duration, ok=True):
+    """Add one timing to the rolling window for name and queue it for the metrics file"""
+    finished_at = time.time()
+    with _lock:
+        stats = _stats.get(name)
+        if stats is None:
+            stats = _stats[name] = {'calls': 0, 'errors': 0, 'total': 0.0, 'max': 0.0,
+                                    'window': deque(maxlen=METRICS_WINDOW)}
+        stats['calls'] += 1
+        stats['errors'] += 0 if ok else 1
+        stats['total'] += duration
+        stats['max'] = max(stats['max'], duration)
+        stats['window'].append(duration)
+
+        entry = (duration, finished_at, name)
+        if len(_slowest) < SLOWEST_CALLS_KEPT:
+            heapq.heappush(_slowest, entry)
+        elif duration > _slowest[0][0]:
+            heapq.heapreplace(_slowest, entry)
+
+        _pending.append({'ts': round(finished_at, 3), 'name': name,
+                         'ms': round(duration * 1000, 3), 'ok': ok})
+        if len(_pending) >= METRICS_FLUSH_EVERY:
+            _flush_locked()
+
+def _flush_locked():
+    """Append the pending records to METRICS_FILE; the caller holds _lock"""
+    global _pending
+    if not _pending:
+        return
+    records, _pending = _pending, []
+    try:
+        with open(METRICS_FILE, 'a') as handle:
+            handle.writelines(json.dumps(entry) + '\n' for entry in records)
+    except OSError as e:
+        print(f"Error writing metrics: {e}")
+
+def flush_metrics():
+    """Append any buffered records to METRICS_FILE"""
+    with _lock:
+        _flush_locked()
+
+atexit.register(flush_metrics)
+
+class timer:
+    """Context manager timing a block, e.g. a chart or a whole page render
+
+    Can also be started and stopped explicitly when the block does not fit a
+    with statement.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.started = None
+
+    def start(self):
+        if _enabled:
+            self.started = time.perf_counter()
+        return self
+
+    def stop(self, ok=True):
+        if self.started is not None:
+            record(self.name, time.perf_counter() - self.started, ok)
+            self.started = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop(exc_type is None)
+        return False
+
+def timed(name=None):
+    """Decorator recording the duration of every call under name (default module.qualname)"""
+    def decorator(func):
+        metric_name = name or f"{func.__module__.rsplit('.', 1)[-1]}.{func.__qualname__}"
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            started = time.perf_counter()
+            ok = False
+            try:
+                result = func(*args, **kwargs)
+                ok = True
+                return result
+            finally:
+                record(metric_name, time.perf_counter() - started, ok)
+        return wrapper
+    return decorator
+
+def _percentile(ordered, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)] if ordered else 0.0
+
+def get_metrics_summary():
+    """Get per-name call counts and rolling latency percentiles in milliseconds, slowest p95 first"""
+    with _lock:
+        snapshot = [(name, dict(stats, window=sorted(stats['window']))) for name, stats in _stats.items()]
+
+    summary = []
+    for name, stats in snapshot:
+        window = stats['window']
+        summary.append({
+            'name': name,
+            'calls': stats['calls'],
+            'errors': stats['errors'],
+            'mean_ms': stats['total'] / stats['calls'] * 1000,
+            'p50_ms': _percentile(window, 0.50) * 1000,
+            'p95_ms': _percentile(window, 0.95) * 1000,
+            'p99_ms': _percentile(window, 0.99) * 1000,
+            'max_ms': stats['max'] * 1000,
+            'total_s': stats['total']
+        })
+    return sorted(summary, key=lambda row: row['p95_ms'], reverse=True)
+
+def get_slowest_calls(limit=20):
+    """Get the slowest individual calls recorded in this process, slowest first"""
+    with _lock:
+        slowest = sorted(_slowest, reverse=True)[:limit]
+    return [{'name': name, 'duration_ms': duration * 1000,
+             'finished_at': time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(finished_at))}
+            for duration, finished_at, name in slowest]
+
+def read_metrics_file(limit=10000):
+    """Read the most recent records appended to METRICS_FILE by any process"""
+    flush_metrics()
+    if not os.path.exists(METRICS_FILE):
+        return []
+
+    records = deque(maxlen=limit)
+    with open(METRICS_FILE) as handle:
+        for line in handle:
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                continue
+    return list(records)
+
+def reset_metrics():
+    """Clear the in-memory statistics for this process"""
+    with _lock:
+        _flush_locked()
+        _stats.clear()
+        _slowest.clear()
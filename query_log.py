@@ -0,0 +1,238 @@
+import argparse
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import deque
+
+SLOW_QUERY_LOG = 'slow_queries.jsonl'
+# Statements slower than this many milliseconds are logged; FEEDBACK_SLOW_QUERY_MS=off disables the log
+DEFAULT_SLOW_QUERY_MS = 100
+# Slow statements kept in memory for this process
+RECENT_SLOW_QUERIES_KEPT = 200
+# Statements whose plans are worth capturing; transaction control, PRAGMAs and DDL are skipped
+EXPLAINABLE = ('SELECT', 'WITH', 'INSERT', 'UPDATE', 'DELETE', 'REPLACE')
+
+_threshold_setting = os.environ.get('FEEDBACK_SLOW_QUERY_MS', str(DEFAULT_SLOW_QUERY_MS))
+_threshold = None if _threshold_setting.lower() == 'off' else float(_threshold_setting) / 1000
+_lock = threading.Lock()
+_recent = deque(maxlen=RECENT_SLOW_QUERIES_KEPT)
+
+def set_slow_query_threshold(milliseconds):
+    """Log statements slower than milliseconds; None turns the slow-query log off"""
+    global _threshold
+    _threshold = None if milliseconds is None else milliseconds / 1000
+
+def get_slow_query_threshold():
+    """Get the slow-query threshold in milliseconds, or None when the log is off"""
+    return None if _threshold is None else _threshold * 1000
+
+def normalize_sql(sql):
+    """Reduce a statement to its shape so runs with different literals group together"""
+    normalized = re.sub(r"'(?:[^']|'')*'", "?", sql)
+    normalized = re.sub(r"\b\d+(?:\.\d+)?\b", "?", normalized)
+    normalized = re.sub(r"\s+", " ", normalized).strip()
+    # IN lists of any length collapse to one placeholder
+    return re.sub(r"\(\s*\?(?:\s*,\s*\?)+\s*\)", "(?, ...)", normalized)
+
+def parameter_shape(parameters):
+    """Describe the parameters by type only, so values never reach the log"""
+    if isinstance(parameters, dict):
+        return "{" + ", ".join(f"{key}: {type(value).__name__}" for key, value in parameters.items()) + "}"
+    if not parameters:
+        return "()"
+    types = [type(value).__name__ for value in parameters]
+    if len(types) > 8:
+        return f"({', '.join(types[:8])}, ... {len(types)} total)"
+    return f"({', '.join(types)})"
+
+def _capture_plan(conn, sql, parameters):
+    """Run EXPLAIN QUERY PLAN for a statement and return its plan lines"""
+    if not sql.lstrip().upper().startswith(EXPLAINABLE):
+        return []
+    try:
+        cursor = sqlite3.Connection.cursor(conn)
+        cursor.execute(f"EXPLAIN QUERY PLAN {sql}", parameters)
+        return [row[3] for row in cursor.fetchall()]
+    except (sqlite3.Error, ValueError):
+        return []
+
+def _is_table_scan(plan):
+    """True when the plan reads the feedback table without an index"""
+    return any(re.match(r"SCAN (TABLE )?feedback_submissions(_base)?\b(?!.*\bUSING\b)", line) for line in plan)
+
+def _log_slow_query(conn, sql, parameters, duration, rows):
+    """Record a statement that exceeded the threshold"""
+    plan = _capture_plan(conn, sql, parameters)
+    entry = {
+        'logged_at': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'sql': normalize_sql(sql),
+        'parameters': parameter_shape(parameters),
+        'duration_ms': round(duration * 1000, 3),
+        'rows': rows,
+        'plan': plan,
+        'table_scan': _is_table_scan(plan)
+    }
+    with _lock:
+        _recent.append(entry)
+        try:
+            with open(SLOW_QUERY_LOG, 'a') as handle:
+                handle.write(json.dumps(entry) + '\n')
+        except OSError as e:
+            print(f"Error writing slow query log: {e}")
+
+class LoggedCursor(sqlite3.Cursor):
+    """Cursor that times each statement from execute until its rows are consumed
+
+    SQLite produces rows lazily, so fetch time is part of a statement's cost;
+    the statement is checked against the threshold once it is exhausted, the
+    cursor is reused or the cursor is closed.
+    """
+
+    _statement = None
+
+    def _finish(self):
+        statement, self._statement = self._statement, None
+        if statement and _threshold is not None and statement[2] > _threshold:
+            _log_slow_query(self.connection, *statement)
+
+    def _track(self, started, rows, exhausted):
+        if self._statement:
+            self._statement[2] += time.perf_counter() - started
+            self._statement[3] += rows
+            if exhausted:
+                self._finish()
+
+    def execute(self, sql, parameters=()):
+        self._finish()
+        if _threshold is None:
+            return super().execute(sql, parameters)
+        started = time.perf_counter()
+        super().execute(sql, parameters)
+        self._statement = [sql, parameters, time.perf_counter() - started, 0]
+        if self.description is None:
+            self._finish()
+        return self
+
+    def executemany(self, sql, seq_of_parameters):
+        self._finish()
+        if _threshold is None:
+            return super().executemany(sql, seq_of_parameters)
+        started = time.perf_counter()
+        super().executemany(sql, seq_of_parameters)
+        self._statement = [sql, (), time.perf_counter() - started, self.rowcount]
+        self._finish()
+        return self
+
+    def fetchone(self):
+        started = time.perf_counter()
+        row = super().fetchone()
+        self._track(started, 0 if row is None else 1, row is None)
+        return row
+
+    def fetchmany(self, size=None):
+        size = self.arraysize if size is None else size
+        started = time.perf_counter()
+        rows = super().fetchmany(size)
+        self._track(started, len(rows), len(rows) < size)
+        return rows
+
+    def fetchall(self):
+        started = time.perf_counter()
+        rows = super().fetchall()
+        self._track(started, len(rows), True)
+        return rows
+
+    def __next__(self):
+        started = time.perf_counter()
+        try:
+            row = super().__next__()
+        except StopIteration:
+            self._track(started, 0, True)
+            raise
+        self._track(started, 1, False)
+        return row
+
+    def close(self):
+        self._finish()
+        super().close()
+
+class LoggedConnection(sqlite3.Connection):
+    """Connection whose cursors feed the slow-query log"""
+
+    def cursor(self, factory=None):
+        return super().cursor(factory or LoggedCursor)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+def get_recent_slow_queries():
+    """Get the slow statements logged by this process, newest first"""
+    with _lock:
+        return list(reversed(_recent))
+
+def read_slow_query_log(limit=10000):
+    """Read the most recent entries of the slow-query log written by any process"""
+    if not os.path.exists(SLOW_QUERY_LOG):
+        return []
+
+    entries = deque(maxlen=limit)
+    with open(SLOW_QUERY_LOG) as handle:
+        for line in handle:
+            try:
+                entries.append(json.loads(line))
+            except ValueError:
+                continue
+    return list(entries)
+
+def get_slow_query_report(entries=None):
+    """Group slow statements by normalized SQL, worst total time first
+
+    Each group carries its call count, total, mean and max duration in
+    milliseconds, the most rows returned, whether any run scanned
+    feedback_submissions without an index, and the latest captured plan.
+    """
+    if entries is None:
+        entries = read_slow_query_log()
+
+    groups = {}
+    for entry in entries:
+        group = groups.get(entry['sql'])
+        if group is None:
+            group = groups[entry['sql']] = {'sql': entry['sql'], 'count': 0, 'total_ms': 0.0, 'max_ms': 0.0,
+                                            'max_rows': 0, 'table_scan': False, 'plan': [],
+                                            'parameters': entry['parameters']}
+        group['count'] += 1
+        group['total_ms'] += entry['duration_ms']
+        group['max_ms'] = max(group['max_ms'], entry['duration_ms'])
+        group['max_rows'] = max(group['max_rows'], entry['rows'] or 0)
+        group['table_scan'] = group['table_scan'] or entry['table_scan']
+        group['plan'] = entry['plan'] or group['plan']
+
+    report = []
+    for group in groups.values():
+        group['mean_ms'] = group['total_ms'] / group['count']
+        report.append(group)
+    return sorted(report, key=lambda group: group['total_ms'], reverse=True)
+
+def main():
+    """Command line entry point printing the aggregated slow-query report"""
+    parser = argparse.ArgumentParser(description="Summarize the slow-query log by statement")
+    parser.add_argument('--top', type=int, default=20, help="Number of statements to show")
+    args = parser.parse_args()
+
+    for group in get_slow_query_report()[:args.top]:
+        flag = "  [TABLE SCAN]" if group['table_scan'] else ""
+        print(f"{group['count']:6d} runs  total {group['total_ms']:10.1f} ms  mean {group['mean_ms']:8.1f} ms  "
+              f"max {group['max_ms']:8.1f} ms  max rows {group['max_rows']}{flag}")
+        print(f"    {group['sql']}")
+        for line in group['plan']:
+            print(f"      {line}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+import argparse
+import os
+import sqlite3
+import threading
+import time
+from utils.backup import copy_database
+from utils.metrics import timed
+from utils.query_log import LoggedConnection
+
+REPLICA_NAME = 'feedback_system_analytics.db'
+# Refresh the snapshot once it is older than this many seconds
+REPLICA_MAX_STALENESS = 300
+# Pages copied per backup step; writers can take the lock between steps
+REPLICA_BACKUP_PAGES = 256
+REPLICA_BACKUP_SLEEP = 0.005
+
+_refresh_lock = threading.Lock()
+_refresher_thread = None
+_background_lock = threading.Lock()
+_background_thread = None
+
+def get_replica_refreshed_at():
+    """Get the time the replica was last refreshed, or None if there is no replica"""
+    if not os.path.exists(REPLICA_NAME):
+        return None
+    return os.path.getmtime(REPLICA_NAME)
+
+def get_replica_staleness():
+    """Get the age of the replica in seconds, or None if there is no replica"""
+    refreshed_at = get_replica_refreshed_at()
+    if refreshed_at is None:
+        return None
+    return max(0.0, time.time() - refreshed_at)
+
+@timed()
+def refresh_replica(pages=REPLICA_BACKUP_PAGES, sleep=REPLICA_BACKUP_SLEEP):
+    """Copy the live database to the analytics replica with the online backup API
+
+    The copy is made in steps of `pages` pages into a temporary file, which then
+    atomically replaces the replica so readers never see a partial snapshot.
+    Returns the refresh duration in seconds, or None if the refresh failed.
+    """
+    with _refresh_lock:
+        partial_path = f"{REPLICA_NAME}.{os.getpid()}.partial"
+        try:
+            copy_stats = copy_database(partial_path, pages, sleep)
+            os.replace(partial_path, REPLICA_NAME)
+            return copy_stats['duration']
+        except (sqlite3.Error, OSError) as e:
+            print(f"Error refreshing analytics replica: {e}")
+            if os.path.exists(partial_path):
+                os.remove(partial_path)
+            return None
+
+def refresh_replica_in_background():
+    """Start a replica refresh on a daemon thread unless one is already running; returns immediately"""
+    global _background_thread
+    with _background_lock:
+        if _refresh_lock.locked() or (_background_thread and _background_thread.is_alive()):
+            return _background_thread
+        _background_thread = threading.Thread(target=refresh_replica, name='replica-refresh', daemon=True)
+        _background_thread.start()
+        return _background_thread
+
+def create_replica_connection(max_staleness=REPLICA_MAX_STALENESS):
+    """Create a read-only connection to the analytics replica
+
+    A replica older than max_staleness seconds is still served while a
+    background refresh replaces it, so requests never wait on a copy.
+    Returns None when no replica exists yet; callers read the live database
+    until the first refresh lands.
+    """
+    staleness = get_replica_staleness()
+    if staleness is None or staleness > max_staleness:
+        refresh_replica_in_background()
+    if staleness is None:
+        return None
+
+    try:
+        replica_path = os.path.abspath(REPLICA_NAME)
+        return sqlite3.connect(f"file:{replica_path}?mode=ro", uri=True, factory=LoggedConnection)
+    except sqlite3.Error as e:
+        print(f"Error opening analytics replica: {e}")
+        return None
+
+def start_replica_refresher(interval=REPLICA_MAX_STALENESS):
+    """Refresh the replica every `interval` seconds from a daemon thread"""
+    global _refresher_thread
+    if _refresher_thread and _refresher_thread.is_alive():
+        return _refresher_thread
+
+    def refresh_loop():
+        while True:
+            refresh_replica()
+            time.sleep(interval)
+
+    _refresher_thread = threading.Thread(target=refresh_loop, name='replica-refresher', daemon=True)
+    _refresher_thread.start()
+    return _refresher_thread
+
+def main():
+    """Command line entry point for refreshing the replica once or on a schedule"""
+    parser = argparse.ArgumentParser(description="Refresh the read-only analytics replica")
+    parser.add_argument('--interval', type=int, help="Keep refreshing every INTERVAL seconds")
+    args = parser.parse_args()
+
+    while True:
+        duration = refresh_replica()
+        if duration is not None:
+            print(f"Replica refreshed in {duration:.2f}s")
+        if not args.interval:
+            break
+        time.sleep(args.interval)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+import math
+from collections import Counter, defaultdict
+import numpy as np
+import pandas as pd
+
+# Rows sampled for approximate analytics, spread over the strata in proportion to their size
+DEFAULT_SAMPLE_ROWS = 5000
+# At least two rows per stratum, so each stratum's variance can be estimated
+MIN_STRATUM_ROWS = 2
+# Standard errors either side of an estimate, for a 95% confidence interval
+CONFIDENCE_Z = 1.96
+
+def sample_fraction(population, sample_size):
+    """Fraction of each stratum to sample so the whole sample is about sample_size rows"""
+    return min(1.0, sample_size / population) if population else 1.0
+
+def stratum_sample_size(population, fraction):
+    """Rows drawn from a stratum of the given size: a proportional share, at least MIN_STRATUM_ROWS"""
+    return min(population, max(MIN_STRATUM_ROWS, math.ceil(population * fraction)))
+
+def stratified_sample(df, sample_size=DEFAULT_SAMPLE_ROWS, strata=None, seed=None):
+    """Draw a stratified random sample of a DataFrame without replacement
+
+    strata lists the columns whose value combinations form the strata; the
+    whole frame is one stratum when not given. Returns the sample with a
+    'stratum' column and the population size of each stratum.
+    """
+    if strata:
+        keys = df.groupby(strata, dropna=False, sort=False).ngroup().to_numpy()
+    else:
+        keys = np.zeros(len(df), dtype=np.int64)
+    population_sizes = dict(enumerate(np.bincount(keys).tolist()))
+    fraction = sample_fraction(len(df), sample_size)
+    sizes = np.array([stratum_sample_size(population_sizes[stratum], fraction)
+                      for stratum in range(len(population_sizes))], dtype=np.int64)
+
+    # Shuffle, then keep the first rows of each stratum in shuffled order
+    order = np.random.default_rng(seed).permutation(len(df))
+    shuffled_keys = keys[order]
+    draw = pd.Series(shuffled_keys).groupby(shuffled_keys).cumcount().to_numpy()
+    keep = draw < sizes[shuffled_keys]
+
+    sample = df.iloc[order[keep]].assign(stratum=shuffled_keys[keep])
+    return sample, population_sizes
+
+class StratifiedEstimator:
+    """Population totals and confidence intervals from a stratified sample
+
+    Each sampled row adds a Counter of values to its stratum, e.g. a word's
+    occurrences or 1 for the row's sentiment. A total is estimated as the
+    sum over strata of the stratum size times the sample mean, with the
+    stratified variance including the finite population correction, so a
+    stratum sampled in full adds no uncertainty.
+    """
+
+    def __init__(self, population_sizes):
+        self.population_sizes = population_sizes
+        self.rows = Counter()
+        self.sums = defaultdict(Counter)
+        self.squares = defaultdict(Counter)
+
+    def add(self, stratum, values):
+        """Record one sampled row's values"""
+        self.rows[stratum] += 1
+        self.sums[stratum].update(values)
+        self.squares[stratum].update({key: value * value for key, value in values.items()})
+
+    @property
+    def sample_size(self):
+        return sum(self.rows.values())
+
+    def totals(self):
+        """Estimated population total of every value seen in the sample"""
+        totals = Counter()
+        for stratum, rows in self.rows.items():
+            weight = self.population_sizes[stratum] / rows
+            for key, value in self.sums[stratum].items():
+                totals[key] += weight * value
+        return totals
+
+    def interval(self, key):
+        """Estimated total of a value with its 95% confidence interval as (estimate, low, high)"""
+        total = variance = 0.0
+        for stratum, rows in self.rows.items():
+            population = self.population_sizes[stratum]
+            mean = self.sums[stratum][key] / rows
+            total += population * mean
+            if rows > 1:
+                sample_variance = max(0.0, (self.squares[stratum][key] - rows * mean * mean) / (rows - 1))
+                variance += population * population * (1 - rows / population) * sample_variance / rows
+        margin = CONFIDENCE_Z * math.sqrt(variance)
+        return total, max(0.0, total - margin), total + margin
+
+    def estimates(self, kind, labels=(), top_n=None):
+        """Rounded estimates of one kind of value, keyed (kind, label), as {label: (estimate, low, high)}
+
+        labels are always included, even when unseen in the sample; top_n
+        keeps only the largest estimates, largest first.
+        """
+        seen = {key[1]: total for key, total in self.totals().items() if key[0] == kind}
+        ranked = sorted(seen, key=seen.get, reverse=True)
+        if top_n is not None:
+            ranked = ranked[:top_n]
+        chosen = ranked + [label for label in labels if label not in ranked]
+        estimates = {}
+        for label in chosen:
+            total, low, high = self.interval((kind, label))
+            estimates[label] = (round(total), math.floor(low), math.ceil(high))
+        return estimates
@@ -0,0 +1,107 @@
+import os
+import re
+import sqlite3
+import time
+import pandas as pd
+from utils import database
+from utils.metrics import timed
+
+DEFAULT_ROW_LIMIT = 1000
+DEFAULT_TIME_BUDGET = 5.0
+PROGRESS_HANDLER_STEPS = 10000
+ALLOWED_STATEMENTS = ('SELECT', 'WITH')
+
+def open_readonly_connection():
+    """Open a read-only connection to the database via a mode=ro URI"""
+    database_path = os.path.abspath(database.DATABASE_NAME)
+    conn = sqlite3.connect(f"file:{database_path}?mode=ro", uri=True)
+    conn.execute("PRAGMA query_only = ON")
+    return conn
+
+def validate_query(query):
+    """Return an error message if the query may not run in the sandbox, else None"""
+    statement = query.strip().rstrip(';').strip()
+    if not statement:
+        return "Query is empty."
+
+    if not statement.upper().startswith(ALLOWED_STATEMENTS):
+        return "Only SELECT queries are allowed for security reasons."
+
+    if not sqlite3.complete_statement(statement + ';') or ';' in _strip_literals(statement):
+        return "Only a single statement can be executed."
+
+    return None
+
+def _strip_literals(statement):
+    """Remove string literals and quoted identifiers so separators inside them are ignored"""
+    return re.sub(r"'(?:[^']|'')*'|\"(?:[^\"]|\"\")*\"", "", statement)
+
+def explain_query(query):
+    """Get the EXPLAIN QUERY PLAN for a query and warnings for full-table scans"""
+    conn = open_readonly_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute(f"EXPLAIN QUERY PLAN {query.strip().rstrip(';')}")
+        plan = pd.DataFrame(cursor.fetchall(), columns=['id', 'parent', 'notused', 'detail'])
+    finally:
+        conn.close()
+
+    warnings = []
+    for detail in plan['detail']:
+        # "SCAN table" without an index is a full-table scan; covering index scans are cheap
+        if detail.startswith('SCAN ') and 'INDEX' not in detail:
+            warnings.append(f"Full table scan: {detail}")
+        if 'USE TEMP B-TREE' in detail:
+            warnings.append(f"Sorting without an index: {detail}")
+
+    return plan[['id', 'parent', 'detail']], warnings
+
+@timed()
+def run_readonly_query(query, params=(), row_limit=DEFAULT_ROW_LIMIT, time_budget=DEFAULT_TIME_BUDGET):
+    """Run a query on a read-only connection with a row limit and a time budget
+
+    Returns a dict with the result DataFrame, whether it was truncated at the
+    row limit, the elapsed time and an error message (None on success).
+    """
+    result = {'data': pd.DataFrame(), 'truncated': False, 'elapsed': 0.0, 'error': None}
+
+    error = validate_query(query)
+    if error:
+        result['error'] = error
+        return result
+
+    conn = None
+    started = time.perf_counter()
+    deadline = started + time_budget
+
+    try:
+        conn = open_readonly_connection()
+        # Returning a true value from the progress handler aborts the running statement
+        conn.set_progress_handler(lambda: time.perf_counter() > deadline, PROGRESS_HANDLER_STEPS)
+
+        cursor = conn.cursor()
+        cursor.execute(query.strip().rstrip(';'), params)
+        columns = [column[0] for column in cursor.description]
+
+        rows = []
+        while len(rows) <= row_limit:
+            chunk = cursor.fetchmany(min(PROGRESS_HANDLER_STEPS, row_limit + 1 - len(rows)))
+            if not chunk:
+                break
+            rows.extend(chunk)
+
+        result['truncated'] = len(rows) > row_limit
+        result['data'] = pd.DataFrame(rows[:row_limit], columns=columns)
+    except sqlite3.OperationalError as e:
+        if 'interrupted' in str(e):
+            result['error'] = f"Query exceeded the {time_budget:.1f}s time budget and was stopped."
+        else:
+            result['error'] = f"Query error: {e}"
+    except sqlite3.Error as e:
+        result['error'] = f"Query error: {e}"
+    finally:
+        result['elapsed'] = time.perf_counter() - started
+        if conn:
+            conn.close()
+
+    return result
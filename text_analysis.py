@@ -2,34 +2,57 @@ import pandas as pd
 import numpy as np
 import re
 from collections import Counter
-import nltk
-from nltk.corpus import stopwords
-from nltk.tokenize import word_tokenize
-from nltk.stem import WordNetLemmatizer
+from utils.metrics import timed
+from utils.memory_profile import stage_context
+from utils.sampling import StratifiedEstimator
 
-# Download required NLTK data
-try:
-    nltk.data.find('tokenizers/punkt')
-except LookupError:
-    nltk.download('punkt')
+_nltk_tools = None
 
-try:
-    nltk.data.find('tokenizers/punkt_tab')
-except LookupError:
-    nltk.download('punkt_tab')
+def load_nltk():
+    """Import NLTK and fetch its data on first use
 
-try:
-    nltk.data.find('corpora/stopwords')
-except LookupError:
-    nltk.download('stopwords')
+    NLTK takes seconds to import, so pages that import this module only pay
+    for it once a TextAnalyzer is created. Returns the stopwords corpus,
+    word_tokenize and the WordNetLemmatizer class.
+    """
+    global _nltk_tools
+    if _nltk_tools is None:
+        import nltk
+        from nltk.corpus import stopwords
+        from nltk.tokenize import word_tokenize
+        from nltk.stem import WordNetLemmatizer
 
-try:
-    nltk.data.find('corpora/wordnet')
-except LookupError:
-    nltk.download('wordnet')
+        # Download required NLTK data
+        for resource, package in (('tokenizers/punkt', 'punkt'), ('tokenizers/punkt_tab', 'punkt_tab'),
+                                  ('corpora/stopwords', 'stopwords'), ('corpora/wordnet', 'wordnet')):
+            try:
+                nltk.data.find(resource)
+            except LookupError:
+                nltk.download(package)
+
+        _nltk_tools = (stopwords, word_tokenize, WordNetLemmatizer)
+    return _nltk_tools
+
+CATEGORY_KEYWORDS = {
+    'Academic Issues': ['grade', 'grading', 'exam', 'test', 'assignment', 'homework', 'difficult', 'hard', 'easy', 'content', 'material', 'lecture', 'teaching', 'explain', 'understand', 'professor', 'teacher', 'class', 'course'],
+    'Administrative Issues': ['registration', 'enroll', 'schedule', 'office', 'hour', 'response', 'email', 'communication', 'policy', 'requirement', 'staff', 'service', 'process'],
+    'Facilities': ['classroom', 'room', 'building', 'equipment', 'technology', 'computer', 'projector', 'space', 'environment', 'library', 'lab', 'facility'],
+    'Student Welfare': ['help', 'support', 'care', 'concern', 'stress', 'mental', 'health', 'safety', 'harassment', 'discrimination', 'welfare', 'counseling']
+}
+POSITIVE_WORDS = ['good', 'great', 'excellent', 'amazing', 'awesome', 'love', 'best', 'fantastic', 'wonderful', 'helpful', 'easy', 'clear', 'interesting', 'fun', 'recommend', 'satisfied', 'happy', 'pleased']
+NEGATIVE_WORDS = ['bad', 'terrible', 'awful', 'hate', 'worst', 'boring', 'difficult', 'hard', 'confusing', 'unclear', 'unhelpful', 'rude', 'unfair', 'poor', 'disappointed', 'frustrated', 'angry']
+SENTIMENTS = ['Positive', 'Negative', 'Neutral']
+
+def _distribution(df, column):
+    """Value counts of a column as a dict, leaving out categories with no rows"""
+    if column not in df.columns:
+        return {}
+    counts = df[column].value_counts()
+    return counts[counts > 0].to_dict()
 
 class TextAnalyzer:
     def __init__(self):
+        stopwords, self.word_tokenize, WordNetLemmatizer = load_nltk()
         self.stop_words = set(stopwords.words('english'))
         self.lemmatizer = WordNetLemmatizer()
         
@@ -45,7 +68,7 @@ class TextAnalyzer:
         text = re.sub(r'[^a-zA-Z\s]', '', text)
         
         # Tokenize
-        tokens = word_tokenize(text)
+        tokens = self.word_tokenize(text)
         
         # Remove stopwords and lemmatize
         tokens = [self.lemmatizer.lemmatize(token) for token in tokens 
@@ -53,6 +76,7 @@ class TextAnalyzer:
         
         return ' '.join(tokens)
     
+    @timed()
     def extract_themes(self, texts, top_n=20):
         """Extract common themes from text data"""
         # Clean all texts
@@ -67,17 +91,11 @@ class TextAnalyzer:
         
         return word_freq.most_common(top_n)
     
+    @timed()
     def categorize_feedback(self, texts):
         """Categorize feedback into predefined categories"""
-        categories = {
-            'Academic Issues': ['grade', 'grading', 'exam', 'test', 'assignment', 'homework', 'difficult', 'hard', 'easy', 'content', 'material', 'lecture', 'teaching', 'explain', 'understand', 'professor', 'teacher', 'class', 'course'],
-            'Administrative Issues': ['registration', 'enroll', 'schedule', 'office', 'hour', 'response', 'email', 'communication', 'policy', 'requirement', 'staff', 'service', 'process'],
-            'Facilities': ['classroom', 'room', 'building', 'equipment', 'technology', 'computer', 'projector', 'space', 'environment', 'library', 'lab', 'facility'],
-            'Student Welfare': ['help', 'support', 'care', 'concern', 'stress', 'mental', 'health', 'safety', 'harassment', 'discrimination', 'welfare', 'counseling']
-        }
-        
         # Initialize category counts
-        category_counts = {cat: 0 for cat in categories.keys()}
+        category_counts = {cat: 0 for cat in CATEGORY_KEYWORDS.keys()}
         
         # Analyze each text
         for text in texts:
@@ -85,56 +103,142 @@ class TextAnalyzer:
                 cleaned_text = self.clean_text(text)
                 text_words = cleaned_text.split()
                 
-                for category, keywords in categories.items():
+                for category, keywords in CATEGORY_KEYWORDS.items():
                     if any(keyword in text_words for keyword in keywords):
                         category_counts[category] += 1
         
         return category_counts
     
+    @timed()
     def sentiment_analysis_simple(self, texts):
         """Simple sentiment analysis based on positive/negative words"""
-        positive_words = ['good', 'great', 'excellent', 'amazing', 'awesome', 'love', 'best', 'fantastic', 'wonderful', 'helpful', 'easy', 'clear', 'interesting', 'fun', 'recommend', 'satisfied', 'happy', 'pleased']
-        negative_words = ['bad', 'terrible', 'awful', 'hate', 'worst', 'boring', 'difficult', 'hard', 'confusing', 'unclear', 'unhelpful', 'rude', 'unfair', 'poor', 'disappointed', 'frustrated', 'angry']
-        
         sentiments = []
         
         for text in texts:
-            if pd.notna(text):
-                cleaned_text = self.clean_text(text)
-                words = cleaned_text.split()
-                
-                positive_count = sum(1 for word in words if word in positive_words)
-                negative_count = sum(1 for word in words if word in negative_words)
-                
-                if positive_count > negative_count:
-                    sentiments.append('Positive')
-                elif negative_count > positive_count:
-                    sentiments.append('Negative')
-                else:
-                    sentiments.append('Neutral')
-            else:
-                sentiments.append('Neutral')
+            sentiments.append(self.classify_sentiment(text))
         
         return Counter(sentiments)
     
-    def analyze_feedback_data(self, df, text_column='feedback_text'):
+    def classify_sentiment(self, text):
+        """Classify one text as Positive, Negative or Neutral"""
+        if pd.isna(text):
+            return 'Neutral'
+        return self._sentiment_of(self.clean_text(text).split())
+    
+    def _sentiment_of(self, words):
+        """Classify cleaned words as Positive, Negative or Neutral"""
+        positive_count = sum(1 for word in words if word in POSITIVE_WORDS)
+        negative_count = sum(1 for word in words if word in NEGATIVE_WORDS)
+        
+        if positive_count > negative_count:
+            return 'Positive'
+        elif negative_count > positive_count:
+            return 'Negative'
+        return 'Neutral'
+    
+    @timed()
+    def analyze_feedback_data(self, df, text_column='feedback_text', profiler=None):
         """Comprehensive analysis of feedback data"""
         if df.empty or text_column not in df.columns:
             return {}
         
-        texts = df[text_column].tolist()
+        with stage_context(profiler, 'texts'):
+            texts = df[text_column].tolist()
         
-        analysis_results = {
-            'total_feedback': len(df),
-            'themes': self.extract_themes(texts),
-            'categories': self.categorize_feedback(texts),
-            'sentiment': self.sentiment_analysis_simple(texts),
-            'category_distribution': df['category'].value_counts().to_dict() if 'category' in df.columns else {},
-            'priority_distribution': df['priority'].value_counts().to_dict() if 'priority' in df.columns else {},
-            'status_distribution': df['status'].value_counts().to_dict() if 'status' in df.columns else {}
-        }
+        with stage_context(profiler, 'themes'):
+            themes = self.extract_themes(texts)
+        
+        with stage_context(profiler, 'categories'):
+            categories = self.categorize_feedback(texts)
+        
+        with stage_context(profiler, 'sentiment'):
+            sentiment = self.sentiment_analysis_simple(texts)
+        
+        with stage_context(profiler, 'distributions'):
+            analysis_results = {
+                'total_feedback': len(df),
+                'themes': themes,
+                'categories': categories,
+                'sentiment': sentiment,
+                'category_distribution': _distribution(df, 'category'),
+                'priority_distribution': _distribution(df, 'priority'),
+                'status_distribution': _distribution(df, 'status')
+            }
         
         return analysis_results
+    
+    @timed()
+    def analyze_text_chunks(self, text_chunks, top_n=20):
+        """Themes, keyword categories and sentiment over an iterable of text chunks
+        
+        Each text is cleaned once and only word counts are kept between chunks,
+        so memory stays bounded by the chunk size. The results match
+        extract_themes, categorize_feedback and sentiment_analysis_simple run
+        over all the texts at once.
+        """
+        word_freq = Counter()
+        category_counts = {cat: 0 for cat in CATEGORY_KEYWORDS.keys()}
+        sentiments = Counter()
+        
+        for texts in text_chunks:
+            for text in texts:
+                if not pd.notna(text):
+                    sentiments['Neutral'] += 1
+                    continue
+                
+                words = self.clean_text(text).split()
+                word_freq.update(words)
+                sentiments[self._sentiment_of(words)] += 1
+                for category, keywords in CATEGORY_KEYWORDS.items():
+                    if any(keyword in words for keyword in keywords):
+                        category_counts[category] += 1
+        
+        return {
+            'themes': word_freq.most_common(top_n),
+            'categories': category_counts,
+            'sentiment': sentiments
+        }
+    
+    @timed()
+    def analyze_text_sample(self, samples, population_sizes, top_n=20):
+        """Estimate themes, keyword categories and sentiment of a population from a stratified sample
+        
+        samples yields (stratum, text) pairs and population_sizes maps each
+        stratum to its row count. Counts are scaled up to the population in
+        the same shape analyze_text_chunks returns, and 'confidence_intervals'
+        holds a 95% (low, high) interval for each of them.
+        """
+        estimator = StratifiedEstimator(population_sizes)
+        
+        for stratum, text in samples:
+            values = Counter()
+            if not pd.notna(text):
+                values[('sentiment', 'Neutral')] = 1
+            else:
+                words = self.clean_text(text).split()
+                values.update(('theme', word) for word in words)
+                values[('sentiment', self._sentiment_of(words))] = 1
+                for category, keywords in CATEGORY_KEYWORDS.items():
+                    if any(keyword in words for keyword in keywords):
+                        values[('category', category)] = 1
+            estimator.add(stratum, values)
+        
+        themes = estimator.estimates('theme', top_n=top_n)
+        categories = estimator.estimates('category', labels=CATEGORY_KEYWORDS.keys())
+        sentiments = estimator.estimates('sentiment', labels=SENTIMENTS)
+        
+        return {
+            'themes': [(word, estimate) for word, (estimate, _, _) in themes.items()],
+            'categories': {category: estimate for category, (estimate, _, _) in categories.items()},
+            'sentiment': Counter({sentiment: estimate for sentiment, (estimate, _, _) in sentiments.items()
+                                  if estimate > 0}),
+            'confidence_intervals': {
+                'themes': {word: (low, high) for word, (_, low, high) in themes.items()},
+                'categories': {category: (low, high) for category, (_, low, high) in categories.items()},
+                'sentiment': {sentiment: (low, high) for sentiment, (_, low, high) in sentiments.items()}
+            },
+            'sample_size': estimator.sample_size
+        }
 
 if __name__ == '__main__':
     # Example usage